@@ -4,26 +4,121 @@ PM3 AI Analyzer - AI-assisted RFID/NFC card analysis
 Integrates with Claude/Augment for intelligent decision making
 """
 
-import subprocess
 import json
 import argparse
 import sys
-import os
+import re
 import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+from pm3_session import PM3Session, PM3SessionError, PM3Output
+from pm3_stream import PM3StreamRunner, CARD_LOST_PATTERNS
+from device_lease import DeviceLease, LeaseTimeout
+from pm3_classifier import classify
+from pm3_cache import CommandCache
+from results_store import ResultsStore, card_fingerprint
+from key_store import KeyStore
+from dump_store import DumpStore, digest_of
+from similarity_index import (
+    SimilarityIndex, dump_tokens, family_keys, family_passwords, fingerprint_tokens, key_tokens
+)
+from dict_compiler import DictionaryError, load as load_dictionary
+import mfu_pwdgen
+from mfu_sweep import PasswordSweep, SweepCheckpoint, auth_command, default_candidates, parse_auth
+from latency_model import LatencyModel
+from hw_health import DEFAULT_TTL as HEALTH_TTL, HealthCheck, describe as describe_health
+from fingerprint_index import FingerprintIndex, fingerprint_of
+import pm3_dump
+from attack_scheduler import (
+    DEFAULT_STEPS, AttackStats, Budget, detect_prng, fully_keyed, learned_key_prior, merge_keys,
+    next_step, reported_keys, sector_count, write_key_file
+)
+
+# Default key dictionary shipped with the pm3 client, found on its search path
+CLIENT_DICTIONARY = "mfc_default_keys"
+
+# Output patterns that end a long MIFARE Classic attack early
+DARKSIDE_PATTERNS = {"key_found": r"found valid key|key found", **CARD_LOST_PATTERNS}
+HARDNESTED_PATTERNS = {"key_found": r"found valid key|key found", **CARD_LOST_PATTERNS}
+AUTOPWN_PATTERNS = {
+    "all_keys_found": r"found all keys|found keys have been dumped|transferring keys to simulator",
+    **CARD_LOST_PATTERNS
+}
+
+# Dump attempt with one Ultralight password, named "password_<PWD>"
+PASSWORD_ATTACK_RE = re.compile(r"^password_(?P<password>[0-9A-F]{8})$")
+
 class PM3AIAnalyzer:
-    def __init__(self, device="/dev/ttyACM0", timeout=60, verbose=False):
+    def __init__(self, device="/dev/ttyACM0", timeout=60, verbose=False, output_dir=None,
+                 lease_timeout=600, cache_ttl=300, use_store=True, site=None, budget=None,
+                 health_ttl=HEALTH_TTL):
         self.device = device
+        self.site = site
+        self.budget = budget
         self.timeout = timeout
         self.verbose = verbose
         self.results = {}
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.output_dir = Path(f"analysis_{self.session_id}")
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir = Path(output_dir or f"analysis_{self.session_id}")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.session = PM3Session(device=device)
+        self.stream_runner = PM3StreamRunner(device=device)
+        self.lease = DeviceLease(device, timeout=lease_timeout, owner="ai_analyzer")
+        self.cache = CommandCache(ttl=cache_ttl)
+        self.results_store = ResultsStore() if use_store else None
+        self.key_store = KeyStore() if use_store else None
+        self.dump_store = DumpStore() if use_store else None
+        self.similarity = SimilarityIndex() if use_store else None
+        self.family = []
+        self.attack_stats = AttackStats() if use_store else None
+        self.latency = LatencyModel() if use_store else None
+        self.health = HealthCheck(device, ttl=health_ttl) if use_store else None
+        try:
+            self.fingerprints = FingerprintIndex.load(store=self.results_store)
+        except OSError:
+            self.fingerprints = None
+        self.card_type = None
+        self.prng = None
+        
+    @contextmanager
+    def reader_session(self):
+        """Hold the reader for one batch of device work, then give it back
         
-    def log(self, message, level="INFO"):
+        Nested uses share the outer lease. On exit the client session is
+        shut down with the lease, another analyzer may open the port next.
+        """
+        if self.lease.held:
+            yield
+            return
+        self.lease.acquire()
+        try:
+            yield
+        finally:
+            self.session.close()
+            self.lease.release()
+        
+    def close(self):
+        """Shut down the PM3 client session and give the reader back"""
+        self.session.close()
+        self.lease.release()
+        if self.results_store:
+            self.results_store.close()
+        if self.key_store:
+            self.key_store.close()
+        if self.dump_store:
+            self.dump_store.close()
+        if self.similarity:
+            self.similarity.close()
+        if self.attack_stats:
+            self.attack_stats.close()
+        if self.latency:
+            self.latency.close()
+        if self.health:
+            self.health.close()
+        
+    def log(self, message, level="INFO", output_dir=None):
         """Log message with timestamp"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         colors = {
@@ -38,132 +133,245 @@ class PM3AIAnalyzer:
         print(f"{color}[{timestamp}] {level}: {message}{reset}")
         
         # Also log to file
-        with open(self.output_dir / "analysis.log", "a") as f:
+        with open(Path(output_dir or self.output_dir) / "analysis.log", "a") as f:
             f.write(f"[{timestamp}] {level}: {message}\n")
     
+    def _adaptive_timeout(self, command, timeout):
+        """Learned timeout for this command and card type, at most the given one"""
+        if not self.latency:
+            return timeout
+        return self.latency.timeout_for(command, self.card_type, timeout, self.prng)
+    
     def run_pm3_command(self, command, timeout=None):
         """Execute PM3 command and return output"""
         if timeout is None:
             timeout = self.timeout
+        timeout = self._adaptive_timeout(command, timeout)
+            
+        cached = self.cache.get(command)
+        if cached is not None:
+            self.log(f"Cached: {command}")
+            return cached
             
         self.log(f"Executing: {command}")
         
         try:
-            result = subprocess.run(
-                ['pm3', '-c', command], 
-                capture_output=True, 
-                text=True, 
-                timeout=timeout
-            )
-            
-            output = result.stdout
-            if self.verbose:
-                print(f"Command output:\n{output}")
-                
-            # Save command output
-            cmd_file = self.output_dir / f"cmd_{command.replace(' ', '_').replace('/', '_')}.log"
-            with open(cmd_file, 'w') as f:
-                f.write(f"Command: {command}\n")
-                f.write(f"Timestamp: {datetime.now().isoformat()}\n")
-                f.write(f"Return code: {result.returncode}\n")
-                f.write(f"STDOUT:\n{result.stdout}\n")
-                f.write(f"STDERR:\n{result.stderr}\n")
-            
-            return output
-            
-        except subprocess.TimeoutExpired:
-            self.log(f"Command timeout: {command}", "WARNING")
-            return "TIMEOUT"
+            with self.reader_session():
+                output = self.session.run(command, timeout=timeout)
+        except LeaseTimeout as e:
+            self.log(f"Reader busy: {str(e)}", "ERROR")
+            return PM3Output(f"ERROR: {str(e)}", returncode=-1, command=command)
+        except PM3SessionError as e:
+            self.log(f"PM3 session error: {str(e)}", "ERROR")
+            if self.health:
+                self.health.invalidate()
+            return PM3Output(f"ERROR: {str(e)}", returncode=-1, command=command)
         except Exception as e:
             self.log(f"Command error: {str(e)}", "ERROR")
-            return f"ERROR: {str(e)}"
+            return PM3Output(f"ERROR: {str(e)}", returncode=-1, command=command)
+        
+        if output.timed_out:
+            self.log(f"Command timeout after {timeout}s, keeping partial output: {command}", "WARNING")
+        if self.latency:
+            self.latency.record_output(command, self.card_type, output, self.prng)
+        self.cache.record(command, output)
+        self._save_command_output(command, output)
+        return output
 
-    def _check_dump_success(self, output):
-        """Check if dump was successful based on PM3 output indicators"""
-        if not output or output in ["TIMEOUT", "ERROR"]:
-            return False
+    def run_pm3_batch(self, commands, timeout=None, log_name=None):
+        """Execute several PM3 commands in one round trip, return outputs by command
+        
+        With log_name all outputs go to one <log_name>.log instead of a
+        cmd_*.log per command.
+        """
+        if timeout is None:
+            timeout = self.timeout
+            
+        # Only the commands without a cached result go to the reader
+        results = {}
+        for command in commands:
+            cached = self.cache.get(command)
+            if cached is not None:
+                self.log(f"Cached: {command}")
+                results[command] = cached
+        pending = [command for command in commands if command not in results]
+        if not pending:
+            return results
+        
+        timeout = min(timeout, sum(self._adaptive_timeout(command, timeout) for command in pending))
+        self.log(f"Executing batch: {'; '.join(pending)}")
+        
+        try:
+            with self.reader_session():
+                outputs = self.session.run_batch(pending, timeout=timeout)
+        except Exception as e:
+            self.log(f"Batch error: {str(e)}", "ERROR")
+            if self.health and isinstance(e, PM3SessionError):
+                self.health.invalidate()
+            results.update({
+                command: PM3Output(f"ERROR: {str(e)}", returncode=-1, command=command)
+                for command in pending
+            })
+            return results
+        
+        for command, output in zip(pending, outputs):
+            if output.timed_out:
+                self.log(f"Command timeout, keeping partial output: {command}", "WARNING")
+            if self.latency:
+                self.latency.record_output(command, self.card_type, output, self.prng)
+            self.cache.record(command, output)
+            if not log_name:
+                self._save_command_output(command, output)
+            results[command] = output
+        if log_name:
+            self._save_batch_output(log_name, [(command, results[command]) for command in pending])
+        return results
 
-        output_lower = output.lower()
+    def run_pm3_stream(self, command, timeout=None, stop_patterns=None):
+        """Stream a long PM3 command and end it once a stop pattern matches"""
+        if timeout is None:
+            timeout = self.timeout
+        timeout = self._adaptive_timeout(command, timeout)
+            
+        # The session holds the serial port, release it for the streaming client
+        self.session.close()
+        self.log(f"Streaming: {command}")
+        
+        try:
+            with self.reader_session():
+                started = time.monotonic()
+                result = self.stream_runner.run_sync(
+                    command,
+                    timeout=timeout,
+                    stop_patterns=stop_patterns,
+                    on_line=print if self.verbose else None
+                )
+        except Exception as e:
+            self.log(f"Command error: {str(e)}", "ERROR")
+            return None
+        
+        if self.latency:
+            self.latency.record_output(command, self.card_type, PM3Output(
+                result.output, timed_out=result.timed_out, command=command,
+                duration=time.monotonic() - started
+            ), self.prng)
+        self.cache.record(command, result.output)
+        if result.matched:
+            self.log(f"Stopped early on '{result.matched}': {command}")
+        elif result.timed_out:
+            self.log(f"Command timeout, keeping partial output: {command}", "WARNING")
+        
+        self._save_command_output(command, result.output)
+        return result
 
-        # Check for MIFARE Ultralight dump success indicators
-        mfu_indicators = [
-            "mfu dump file information",
-            "reading tag memory",
-            "block#",
-            "version....."
-        ]
+    def _stream_attack(self, command, timeout, stop_patterns, success_pattern, success_text):
+        """Run an attack through the streaming runner and record its outcome"""
+        result = self.run_pm3_stream(command, timeout=timeout, stop_patterns=stop_patterns)
+        if result is None:
+            return {"output": "ERROR", "success": False, "stopped_on": None}
+        return {
+            "output": result.output,
+            "success": result.matched == success_pattern or classify(result.output).has(success_text),
+            "stopped_on": result.matched,
+            "timed_out": result.timed_out
+        }
 
-        # Check for MIFARE Classic dump success indicators
-        mfc_indicators = [
-            "dumping complete",
-            "dump file saved",
-            "blocks dumped"
-        ]
+    def _save_command_output(self, command, output):
+        """Print and save output of a single PM3 command"""
+        if self.verbose:
+            print(f"Command output:\n{output}")
+            
+        cmd_file = self.output_dir / f"cmd_{command.replace(' ', '_').replace('/', '_')}.log"
+        with open(cmd_file, 'w') as f:
+            f.write(f"Command: {command}\n")
+            f.write(f"Timestamp: {datetime.now().isoformat()}\n")
+            f.write(f"Device: {self.device}\n")
+            f.write(f"Timed out: {getattr(output, 'timed_out', False)}\n")
+            f.write(f"OUTPUT:\n{output}\n")
 
-        # Check for general success indicators
-        general_indicators = [
-            "dump successful",
-            "saved to file"
-        ]
+    def _save_batch_output(self, log_name, outputs):
+        """Append the outputs of one batch to a shared log"""
+        if self.verbose:
+            for command, output in outputs:
+                print(f"Command output ({command}):\n{output}")
+        
+        with open(self.output_dir / f"{log_name}.log", 'a') as f:
+            f.write(f"Timestamp: {datetime.now().isoformat()}\n")
+            f.write(f"Device: {self.device}\n")
+            for command, output in outputs:
+                f.write(f"Command: {command}\n")
+                f.write(f"Timed out: {getattr(output, 'timed_out', False)}\n")
+                f.write(f"OUTPUT:\n{output}\n")
 
-        all_indicators = mfu_indicators + mfc_indicators + general_indicators
+    def _check_dump_success(self, output):
+        """Check if dump was successful based on PM3 output indicators"""
+        # Timed out output is still checked, a dump may have finished before the kill
+        if not output or output.startswith("ERROR"):
+            return False
 
-        return any(indicator in output_lower for indicator in all_indicators)
+        return classify(output).dump_success
 
-    def check_pm3_connection(self):
-        """Check PM3 connection and hardware status"""
+    def check_pm3_connection(self, force=False):
+        """Check PM3 connection; the full hardware check only runs once its TTL expired"""
         self.log("Checking PM3 connection...")
         
-        # Test basic connection
-        hw_status = self.run_pm3_command("hw status", timeout=10)
-        if "ERROR" in hw_status or "TIMEOUT" in hw_status:
-            self.log("PM3 connection failed", "ERROR")
+        if not self.health:
+            hw_status = self.run_pm3_command("hw status", timeout=20)
+            if hw_status.returncode != 0 or hw_status.timed_out:
+                self.log("PM3 connection failed", "ERROR")
+                return False
+            self.log("PM3 connection OK", "SUCCESS")
+            return True
+        
+        def run_batch(commands):
+            outputs = self.run_pm3_batch(commands, timeout=20)
+            return [outputs[command] for command in commands]
+        
+        record = self.health.check(run_batch, force=force)
+        if not record["healthy"]:
+            self.log(f"PM3 connection failed - {describe_health(record)}", "ERROR")
             return False
-            
-        # Check antenna tuning
-        hw_tune = self.run_pm3_command("hw tune", timeout=10)
         
-        self.log("PM3 connection OK", "SUCCESS")
+        self.log(f"PM3 connection OK ({'full check' if record['full'] else 'ping'}) - "
+                 f"{describe_health(record)}", "SUCCESS")
+        for band in ("lf", "hf"):
+            if record[f"{band}_status"] in ("marginal", "unusable"):
+                self.log(f"{band.upper()} antenna is {record[f'{band}_status']}", "WARNING")
         return True
     
     def detect_card_type(self):
         """AI-assisted card type detection"""
         self.log("🔍 Detecting card type...")
         
-        # Try automatic detection first
-        auto_result = self.run_pm3_command("auto")
+        # One cheap hf 14a info first, the fingerprint index usually pins the card down
+        card_info = self._fingerprint_detection() if self.fingerprints else None
         
-        # AI decision logic based on output patterns
-        card_info = {
-            "detection_output": auto_result,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        if "MIFARE Classic" in auto_result:
-            card_info["type"] = "mifare_classic"
-            card_info["subtype"] = self._detect_mifare_classic_subtype(auto_result)
-        elif "MIFARE Ultralight" in auto_result:
-            card_info["type"] = "mifare_ultralight" 
-            card_info["subtype"] = self._detect_ultralight_subtype(auto_result)
-        elif "MIFARE DESFire" in auto_result:
-            card_info["type"] = "desfire"
-        elif "iClass" in auto_result:
-            card_info["type"] = "iclass"
-        elif "EM410x" in auto_result:
-            card_info["type"] = "em410x"
-        elif "HID" in auto_result:
-            card_info["type"] = "hid"
-        elif "T55" in auto_result:
-            card_info["type"] = "t55xx"
-        else:
-            card_info["type"] = "unknown"
-            # Try manual detection
-            card_info = self._fallback_detection(card_info)
-        
-        # Extract UID if available
-        uid_match = self._extract_uid(auto_result)
-        if uid_match:
-            card_info["uid"] = uid_match
+        if card_info is None:
+            # Try automatic detection
+            auto_result = self.run_pm3_command("auto")
+            
+            # AI decision logic based on output patterns
+            card_info = {
+                "detection_output": auto_result,
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            # Single classification pass over the detection output
+            record = classify(auto_result)
+            card_info["type"] = record.card_type
+            if record.subtype:
+                card_info["subtype"] = record.subtype
+            for field in ("atqa", "sak"):
+                if getattr(record, field):
+                    card_info[field] = getattr(record, field)
+            
+            if record.card_type == "unknown":
+                # Try manual detection
+                card_info = self._fallback_detection(card_info)
+            
+            # Extract UID if available
+            if record.uid:
+                card_info["uid"] = record.uid
             
         self.log(f"Card type detected: {card_info['type']}")
         
@@ -173,43 +381,31 @@ class PM3AIAnalyzer:
             
         return card_info
     
-    def _detect_mifare_classic_subtype(self, output):
-        """Detect MIFARE Classic subtype"""
-        if "1K" in output or "1024" in output:
-            return "1k"
-        elif "4K" in output or "4096" in output:
-            return "4k"
-        else:
-            return "unknown"
-    
-    def _detect_ultralight_subtype(self, output):
-        """Detect MIFARE Ultralight subtype"""
-        if "EV1" in output:
-            return "ev1"
-        elif "NTAG213" in output:
-            return "ntag213"
-        elif "NTAG215" in output:
-            return "ntag215"
-        elif "NTAG216" in output:
-            return "ntag216"
-        else:
-            return "standard"
-    
-    def _extract_uid(self, output):
-        """Extract UID from PM3 output"""
-        import re
-        # Common UID patterns
-        patterns = [
-            r"UID.*?:\s*([A-F0-9\s]+)",
-            r"Card UID:\s*([A-F0-9\s]+)",
-            r"ID:\s*([A-F0-9\s]+)"
-        ]
+    def _fingerprint_detection(self):
+        """Card info from hf 14a info and the fingerprint index, None when it is not conclusive"""
+        info = self.run_pm3_command("hf 14a info", timeout=15)
+        fingerprint = fingerprint_of(info)
+        card_type, subtype = self.fingerprints.identify(fingerprint)
+        record = classify(info)
+        if card_type == "unknown" or not record.uid:
+            return None
         
-        for pattern in patterns:
-            match = re.search(pattern, output, re.IGNORECASE)
-            if match:
-                return match.group(1).replace(" ", "")
-        return None
+        # The client's own type text is more specific than ATQA/SAK, if it agrees
+        if record.card_type == card_type and record.subtype and subtype is None:
+            subtype = record.subtype
+        self.log(f"⚡ Fingerprint {fingerprint['atqa']}/{fingerprint['sak']} -> {card_type} {subtype or ''}", "SUCCESS")
+        card_info = {
+            "detection_output": info,
+            "timestamp": datetime.now().isoformat(),
+            "type": card_type,
+            "uid": record.uid,
+            "atqa": fingerprint["atqa"],
+            "sak": fingerprint["sak"],
+            "fingerprint": fingerprint
+        }
+        if subtype:
+            card_info["subtype"] = subtype
+        return card_info
     
     def _fallback_detection(self, card_info):
         """Fallback detection for unknown cards"""
@@ -227,8 +423,12 @@ class PM3AIAnalyzer:
             
         return card_info
     
-    def test_magic_capabilities(self):
-        """Test for magic card capabilities"""
+    def test_magic_capabilities(self, card_info=None):
+        """Test for magic card capabilities
+        
+        With a fingerprint from the fast detection path only the probes that
+        can still change the answer are sent.
+        """
         self.log("🎴 Testing magic card capabilities...")
         
         magic_results = {
@@ -236,65 +436,45 @@ class PM3AIAnalyzer:
             "tests": {}
         }
         
-        # Test Gen1A
-        self.log("Testing Gen1A magic...")
-        gen1a_result = self.run_pm3_command("hf mf cgetblk 0", timeout=10)
-        magic_results["tests"]["gen1a"] = {
-            "output": gen1a_result,
-            "detected": "block data" in gen1a_result.lower()
-        }
-        
-        if magic_results["tests"]["gen1a"]["detected"]:
-            self.log("Gen1A magic card detected!", "SUCCESS")
-            magic_results["type"] = "gen1a"
-            magic_results["capabilities"] = ["uid_change", "block0_write", "chinese_magic"]
-            return magic_results
-        
-        # Test Gen2
-        self.log("Testing Gen2 magic...")
-        gen2_result = self.run_pm3_command("hf 14a info", timeout=10)
-        magic_results["tests"]["gen2"] = {
-            "output": gen2_result,
-            "detected": "magic capabilities" in gen2_result.lower() and "gen 2" in gen2_result.lower()
-        }
-        
-        if magic_results["tests"]["gen2"]["detected"]:
-            self.log("Gen2 magic card detected!", "SUCCESS")
-            magic_results["type"] = "gen2"
-            magic_results["capabilities"] = ["uid_change", "block0_write", "direct_write"]
-            return magic_results
-        
-        # Test Gen3
-        self.log("Testing Gen3 magic...")
-        gen3_result = self.run_pm3_command("hf 14a raw -a -p -c 90F0CCCC10", timeout=10)
-        magic_results["tests"]["gen3"] = {
-            "output": gen3_result,
-            "detected": "9000" in gen3_result
-        }
-        
-        if magic_results["tests"]["gen3"]["detected"]:
-            self.log("Gen3 magic card detected!", "SUCCESS")
-            magic_results["type"] = "gen3"
-            magic_results["capabilities"] = ["uid_change", "block0_write", "apdu_magic"]
-            return magic_results
-        
-        # Test UFUID
-        self.log("Testing UFUID...")
-        ufuid_result = self.run_pm3_command("hf 14a raw -a -p -c 4000", timeout=10)
-        magic_results["tests"]["ufuid"] = {
-            "output": ufuid_result,
-            "detected": "0A00" in ufuid_result
-        }
+        index = self.fingerprints or FingerprintIndex()
+        fingerprint = (card_info or {}).get("fingerprint")
+        if fingerprint:
+            names = index.probes_for(fingerprint, card_info.get("type"))
+            magic_results["fingerprint"] = fingerprint
+        else:
+            names = [probe["name"] for probe in index.probes if probe["command"]]
+        probes = [index.probe(name) for name in names]
         
-        if magic_results["tests"]["ufuid"]["detected"]:
-            self.log("UFUID card detected!", "SUCCESS")
-            magic_results["type"] = "ufuid"
-            magic_results["capabilities"] = ["uid_change"]
-            return magic_results
+        if fingerprint and fingerprint.get("magic"):
+            # The client already named the generation in hf 14a info
+            self.log(f"{fingerprint['magic']} magic reported by hf 14a info", "SUCCESS")
+            known = index.probe(fingerprint["magic"])
+            magic_results["type"] = fingerprint["magic"]
+            magic_results["capabilities"] = known["capabilities"] if known else ["uid_change"]
+        elif probes:
+            # All probes go out in one round trip, results are evaluated in order
+            self.log(f"Probing {', '.join(names)} magic...")
+            outputs = self.run_pm3_batch(list(dict.fromkeys(probe["command"] for probe in probes)), timeout=40)
+            
+            for probe in probes:
+                output = outputs[probe["command"]]
+                detected = bool(re.search(probe["pattern"], output, re.IGNORECASE | re.DOTALL))
+                magic_results["tests"][probe["name"]] = {
+                    "output": output,
+                    "detected": detected
+                }
+                if detected:
+                    self.log(f"{probe['name']} magic card detected!", "SUCCESS")
+                    magic_results["type"] = probe["name"]
+                    magic_results["capabilities"] = probe["capabilities"]
+                    break
+        else:
+            self.log("No magic probes apply to this card")
         
-        self.log("No magic capabilities detected")
-        magic_results["type"] = "none"
-        magic_results["capabilities"] = []
+        if "type" not in magic_results:
+            self.log("No magic capabilities detected")
+            magic_results["type"] = "none"
+            magic_results["capabilities"] = []
         
         # Save magic test results
         with open(self.output_dir / "magic_test.json", "w") as f:
@@ -303,7 +483,11 @@ class PM3AIAnalyzer:
         return magic_results
     
     def analyze_mifare_classic(self, card_info):
-        """AI-assisted MIFARE Classic analysis"""
+        """AI-assisted MIFARE Classic analysis
+        
+        Attack steps run in order of expected payoff per second within the
+        time budget and stop as soon as every sector is keyed.
+        """
         self.log("🎯 Analyzing MIFARE Classic card...")
         
         analysis_results = {
@@ -311,53 +495,86 @@ class PM3AIAnalyzer:
             "timestamp": datetime.now().isoformat(),
             "attacks": {}
         }
+        budget = Budget(self.budget)
+        sectors = sector_count(card_info)
+        size = "--4k" if card_info.get("subtype") == "4k" else "--1k"
         
         # Get detailed card info
         self.log("Getting card information...")
         mf_info = self.run_pm3_command("hf mf info")
         analysis_results["card_info"] = mf_info
         
-        # Test PRNG strength
-        self.log("Testing PRNG strength...")
-        prng_test = self.run_pm3_command("hf mf hardnested t 1 000000000000", timeout=30)
-        analysis_results["prng_test"] = prng_test
-        
-        # AI decision: choose attack based on PRNG
-        if "weak" in prng_test.lower():
-            self.log("Weak PRNG detected - trying Darkside attack...", "SUCCESS")
-            darkside_result = self.run_pm3_command("hf mf darkside", timeout=120)
-            analysis_results["attacks"]["darkside"] = {
-                "output": darkside_result,
-                "success": "key found" in darkside_result.lower()
-            }
+        # PRNG type decides between darkside and hardnested
+        prng = detect_prng(mf_info)
+        if prng is None:
+            self.log("Testing PRNG strength...")
+            prng_test = self.run_pm3_command("hf mf hardnested t 1 000000000000", timeout=30)
+            analysis_results["prng_test"] = prng_test
+            prng = "weak" if "weak" in prng_test.lower() else "hard"
+        self.log(f"PRNG: {prng}", "SUCCESS" if prng == "weak" else "INFO")
+        # Attack timeouts are learned per PRNG type
+        self.prng = prng
+        
+        priors = {}
+        if self.key_store:
+            priors["learned_keys"] = learned_key_prior(
+                self.key_store.hit_summary(self.site, card_fingerprint(card_info))
+            )
         else:
-            self.log("Strong PRNG detected - trying Hardnested attack...")
-            hardnested_result = self.run_pm3_command("hf mf hardnested 0 A FFFFFFFFFFFF 4 A", timeout=300)
-            analysis_results["attacks"]["hardnested"] = {
-                "output": hardnested_result,
-                "success": "key found" in hardnested_result.lower()
-            }
+            priors["learned_keys"] = 0
         
-        # Dictionary attack
-        self.log("Running dictionary attack...")
-        dict_result = self.run_pm3_command("hf mf chk *1 ? d", timeout=60)
-        analysis_results["attacks"]["dictionary"] = {
-            "output": dict_result,
-            "success": "key found" in dict_result.lower()
-        }
+        keys = {}
+        complete = False
+        self.family = []
+        while not complete:
+            step = next_step(DEFAULT_STEPS, analysis_results["attacks"], prng, bool(keys),
+                             budget, self.attack_stats, priors)
+            if step is None:
+                break
+            
+            timeout = budget.timeout_for(step)
+            self.log(f"Running {step.name} (timeout {timeout}s)...")
+            started = time.monotonic()
+            attack = self._run_classic_step(step.name, card_info, keys, size, timeout)
+            analysis_results["attacks"][step.name] = attack
+            if self.attack_stats and not attack.get("skipped"):
+                self.attack_stats.record(step.name, prng, attack["success"], time.monotonic() - started)
+            
+            if attack.get("client_dictionary"):
+                # Covered already, e.g. the compiled dictionary fell back to it
+                priors["client_dictionary"] = 0
+            merge_keys(keys, classify(attack["output"]).keys)
+            merge_keys(keys, attack.get("keys", {}))
+            complete = fully_keyed(keys, sectors) or attack.get("stopped_on") == "all_keys_found"
+            
+            if keys and not complete and self.similarity and "family_read" not in analysis_results:
+                # The sectors readable so far may identify an already broken card system
+                analysis_results["family_read"] = self._find_classic_family(card_info, keys, size, sectors)
+                if self.family:
+                    priors["family_keys"] = self.family[0].containment
         
-        # Autopwn as fallback
-        self.log("Running autopwn...")
-        autopwn_result = self.run_pm3_command("hf mf autopwn", timeout=180)
-        analysis_results["attacks"]["autopwn"] = {
-            "output": autopwn_result,
-            "success": "keys found" in autopwn_result.lower()
+        analysis_results["schedule"] = {
+            "budget": self.budget,
+            "elapsed": round(budget.elapsed, 1),
+            "prng": prng,
+            "order": list(analysis_results["attacks"]),
+            "fully_keyed": complete
         }
+        if complete:
+            self.log(f"All sectors keyed after {budget.elapsed:.0f}s", "SUCCESS")
+        elif self.budget is not None and budget.remaining < 1:
+            self.log(f"Time budget of {self.budget}s used up", "WARNING")
         
-        # Try dump if any attack succeeded
+        # Dump with the recovered keys if any attack succeeded
         if any(attack["success"] for attack in analysis_results["attacks"].values()):
             self.log("Attempting card dump...", "SUCCESS")
-            dump_result = self.run_pm3_command("hf mf dump")
+            if fully_keyed(keys, sectors):
+                key_file = write_key_file(
+                    self.output_dir / f"hf-mf-{card_info.get('uid') or 'card'}-key.bin", keys, sectors
+                )
+                dump_result = self.run_pm3_command(f"hf mf dump {size} -k {key_file}")
+            else:
+                dump_result = self.run_pm3_command("hf mf dump")
             analysis_results["dump"] = {
                 "output": dump_result,
                 "success": self._check_dump_success(dump_result)
@@ -365,6 +582,98 @@ class PM3AIAnalyzer:
         
         return analysis_results
     
+    def _find_classic_family(self, card_info, keys, size, sectors):
+        """Read the keyed sectors and look the card up in the similarity index"""
+        key_file = write_key_file(self.output_dir / "partial-key.bin", keys, sectors)
+        output = self.run_pm3_command(f"hf mf dump {size} -k {key_file}")
+        tokens = key_tokens(keys) | fingerprint_tokens(card_info)
+        saved = classify(output).saved_files
+        if saved:
+            readable = {block for sector in keys for block in pm3_dump.sector_blocks(sector)}
+            try:
+                with pm3_dump.load(saved[-1]) as dump:
+                    tokens |= dump_tokens(dump, readable)
+            except (OSError, pm3_dump.DumpError) as e:
+                self.log(f"Could not read partial dump {saved[-1]}: {e}", "WARNING")
+        
+        self.family = self.similarity.query(tokens, card_type="mifare_classic")
+        self._log_family()
+        return {"output": output, "matches": [match.to_dict() for match in self.family]}
+    
+    def _log_family(self):
+        if self.family:
+            best = self.family[0]
+            self.log(f"Card resembles {len(self.family)} archived card(s) of a known system "
+                     f"(best {best.uid or best.digest[:12]}, {best.containment:.0%} of features)", "SUCCESS")
+    
+    def _run_classic_step(self, name, card_info, keys, size, timeout):
+        """Run one scheduled MIFARE Classic attack step"""
+        if name == "family_keys":
+            # Keys of the most similar archived cards, nearest card first
+            key_file = self.output_dir / "family_keys.dic"
+            candidates = family_keys(self.family)
+            key_file.write_text("\n".join(candidates) + "\n")
+            self.log(f"Checking {len(candidates)} keys of the matched card system...")
+            output = self.run_pm3_command(f"hf mf fchk {size} -f {key_file} --dump", timeout=timeout)
+            return {"output": output, "success": classify(output).key_found}
+        
+        if name == "learned_keys":
+            # Keys learned from earlier cards, site hits first
+            key_file = self.output_dir / "learned_keys.dic"
+            count = self.key_store.write_candidates(key_file, site=self.site,
+                                                    fingerprint=card_fingerprint(card_info),
+                                                    dictionary=None)
+            self.log(f"Checking {count} learned keys...")
+            output = self.run_pm3_command(f"hf mf fchk {size} -f {key_file} --dump", timeout=timeout)
+            return {"output": output, "success": classify(output).key_found}
+        
+        if name == "dictionary":
+            try:
+                dictionary = load_dictionary()
+            except (OSError, DictionaryError) as e:
+                self.log(f"Compiled dictionary unavailable ({e}) - using client defaults", "WARNING")
+                return self._run_classic_step("client_dictionary", card_info, keys, size, timeout)
+            output = self.run_pm3_command(f"hf mf fchk {size} -f {dictionary.text_path} --dump", timeout=timeout)
+            return {"output": output, "success": classify(output).key_found}
+        
+        if name == "client_dictionary":
+            # The client's own, much larger default key dictionary
+            output = self.run_pm3_command(f"hf mf fchk {size} -f {CLIENT_DICTIONARY} --dump", timeout=timeout)
+            return {"output": output, "success": classify(output).key_found, "client_dictionary": True}
+        
+        if name == "darkside":
+            # Darkside recovers key A of block 0
+            attack = self._stream_attack("hf mf darkside", timeout, DARKSIDE_PATTERNS, "key_found", "key found")
+            attack["keys"] = reported_keys(attack["output"], 0, "A")
+            return attack
+        
+        if name == "hardnested":
+            # Nested from a known key towards the first sector still missing one
+            known = next(
+                ((sector, key_type) for sector, sector_keys in sorted(keys.items()) for key_type in sector_keys),
+                None
+            )
+            target = next(
+                ((sector, key_type) for sector in range(sector_count(card_info)) for key_type in ("A", "B")
+                 if key_type not in keys.get(sector, {})),
+                None
+            )
+            if known is None or target is None:
+                return {"output": "", "success": False, "skipped": True}
+            (known_sector, known_type), (target_sector, target_type) = known, target
+            command = (f"hf mf hardnested {self._sector_block(known_sector)} {known_type} "
+                       f"{keys[known_sector][known_type]} {self._sector_block(target_sector)} {target_type}")
+            attack = self._stream_attack(command, timeout, HARDNESTED_PATTERNS, "key_found", "key found")
+            attack["keys"] = reported_keys(attack["output"], target_sector, target_type)
+            return attack
+        
+        return self._stream_attack("hf mf autopwn", timeout, AUTOPWN_PATTERNS, "all_keys_found", "keys found")
+    
+    @staticmethod
+    def _sector_block(sector):
+        """First block of a sector, 4K sectors 32+ have 16 blocks"""
+        return sector * 4 if sector < 32 else 128 + (sector - 32) * 16
+    
     def analyze_mifare_ultralight(self, card_info):
         """AI-assisted MIFARE Ultralight analysis"""
         self.log("🎯 Analyzing MIFARE Ultralight card...")
@@ -392,12 +701,42 @@ class PM3AIAnalyzer:
             self.log("Dump successful without password!", "SUCCESS")
             return analysis_results
         
-        # Try common passwords
-        self.log("Trying common passwords...")
-        common_passwords = ["FFFFFFFF", "00000000", "12345678", "ABCDEFAB"]
+        # UID-derived passwords are computed locally and tried first
+        uid = card_info.get("uid") or classify(mfu_info).uid
+        generated = mfu_pwdgen.generate(uid)
+        analysis_results["password_generation"] = [
+            {"scheme": scheme, "password": pwd} for scheme, pwd in generated
+        ]
+        if generated:
+            self.log(f"Generated {len(generated)} UID-based passwords")
+        
+        # Passwords of similar archived cards go first
+        candidates = default_candidates(uid)
+        passwords = self._ultralight_family(card_info, dump_no_pwd)
+        if passwords:
+            analysis_results["family_passwords"] = passwords
+            candidates = passwords + [password for password in candidates if password not in passwords]
         
-        for pwd in common_passwords:
-            self.log(f"Trying password: {pwd}")
+        # Cheap PWD_AUTH per candidate, resumable per UID, full dump only with the winner
+        sweep = PasswordSweep(uid, candidates)
+        if sweep.checkpoint.tried:
+            self.log(f"Resuming password sweep after {len(sweep.checkpoint.tried)} tried candidates")
+        self.log(f"Sweeping {len(sweep.candidates)} passwords...")
+        
+        def run_batch(commands):
+            outputs = self.run_pm3_batch(commands, timeout=5 + 2 * len(commands), log_name="password_sweep")
+            return [outputs[command] for command in commands]
+        
+        sweep_result = sweep.run(run_batch)
+        analysis_results["attacks"]["password_sweep"] = {
+            "output": json.dumps(sweep_result),
+            "success": bool(sweep_result["password"]),
+            **sweep_result
+        }
+        
+        pwd = sweep_result["password"]
+        if pwd:
+            self.log(f"Password found: {pwd} (PACK {sweep_result['pack']})", "SUCCESS")
             pwd_result = self.run_pm3_command(f"hf mfu dump -k {pwd}")
             analysis_results["attacks"][f"password_{pwd}"] = {
                 "output": pwd_result,
@@ -407,22 +746,206 @@ class PM3AIAnalyzer:
             if analysis_results["attacks"][f"password_{pwd}"]["success"]:
                 self.log(f"Dump successful with password: {pwd}", "SUCCESS")
                 return analysis_results
-        
-        # Generate UID-based passwords
-        self.log("Generating UID-based passwords...")
-        pwdgen_result = self.run_pm3_command("hf mfu pwdgen -r")
-        analysis_results["password_generation"] = pwdgen_result
+            # Do not hand out this password again without a fresh sweep
+            sweep.checkpoint.clear()
+        elif sweep_result["card_lost"]:
+            self.log(f"Card lost after {sweep_result['tried']} candidates - rerun to resume", "WARNING")
+        else:
+            self.log(f"No password found in {sweep_result['tried']} candidates", "WARNING")
         
         # Try tear-off attack
         self.log("Attempting tear-off attack...")
         tearoff_result = self.run_pm3_command("hf mfu otptear", timeout=30)
         analysis_results["attacks"]["tearoff"] = {
             "output": tearoff_result,
-            "success": "success" in tearoff_result.lower()
+            "success": classify(tearoff_result).has("success")
         }
         
         return analysis_results
     
+    def _ultralight_family(self, card_info, dump_output):
+        """Passwords of archived cards whose pages match the readable ones"""
+        saved = classify(dump_output).saved_files
+        if not self.similarity or not saved:
+            return []
+        try:
+            with pm3_dump.load(saved[-1]) as dump:
+                tokens = dump_tokens(dump) | fingerprint_tokens(card_info)
+        except (OSError, pm3_dump.DumpError) as e:
+            self.log(f"Could not read partial dump {saved[-1]}: {e}", "WARNING")
+            return []
+        self.family = self.similarity.query(tokens, card_type="mifare_ultralight")
+        self._log_family()
+        return family_passwords(self.family)
+    
+    def lookup_known_card(self, card_info):
+        """Previous results for this card from the results store, if any"""
+        if not self.results_store or not card_info.get("uid"):
+            return None
+        known = self.results_store.lookup(card_info["uid"], card_fingerprint(card_info))
+        if known:
+            self.log(f"🗂️ Known card {card_info['uid']} - analysed {known['analyses']}x, "
+                     f"last status: {known['status']}", "SUCCESS")
+        return known
+    
+    def verify_known_card(self, card_info, known):
+        """Verify stored keys/password of a known card and dump it directly
+        
+        Returns None when the stored credentials no longer work, so the caller
+        can fall back to the full attack pipeline.
+        """
+        analysis_results = {
+            "card_type": card_info.get("type"),
+            "timestamp": datetime.now().isoformat(),
+            "known_card": True,
+            "attacks": {}
+        }
+        
+        if card_info.get("type") == "mifare_classic" and known.get("found_keys"):
+            self.log("Verifying stored keys...")
+            key_file = self.output_dir / "known_keys.dic"
+            key_file.write_text("\n".join(known["found_keys"]) + "\n")
+            size = "--4k" if card_info.get("subtype") == "4k" else "--1k"
+            verify = self.run_pm3_command(f"hf mf fchk {size} -f {key_file} --dump", timeout=60)
+            keys = classify(verify).keys
+            sectors = sector_count(card_info)
+            analysis_results["attacks"]["stored_keys"] = {
+                "output": verify,
+                "success": fully_keyed(keys, sectors)
+            }
+            # A partly keyed card still "dumps", it needs the attack pipeline
+            if not analysis_results["attacks"]["stored_keys"]["success"]:
+                self.log("Stored keys do not open every sector - running full analysis", "WARNING")
+                return None
+            key_file = write_key_file(self.output_dir / "known_keys.bin", keys, sectors)
+            dump_result = self.run_pm3_command(f"hf mf dump {size} -k {key_file}")
+        elif card_info.get("type") == "mifare_ultralight" and known.get("status") in ("dumped", "cracked"):
+            password = known.get("password")
+            if password:
+                # PWD_AUTH must still succeed with the PACK seen when the password was found
+                auth = self.run_pm3_command(auth_command(password), timeout=10)
+                pack = parse_auth(auth)
+                expected = SweepCheckpoint(card_info.get("uid")).pack
+                analysis_results["attacks"]["stored_password"] = {
+                    "output": auth,
+                    "success": bool(pack) and (not expected or pack == expected),
+                    "password": password
+                }
+                if not analysis_results["attacks"]["stored_password"]["success"]:
+                    self.log("Stored password rejected - running full analysis", "WARNING")
+                    return None
+            self.log("Dumping with stored password..." if password else "Dumping known open card...")
+            dump_result = self.run_pm3_command(f"hf mfu dump -k {password}" if password else "hf mfu dump")
+        else:
+            return None
+        
+        analysis_results["dump"] = {
+            "output": dump_result,
+            "success": self._check_dump_success(dump_result)
+        }
+        if not analysis_results["dump"]["success"]:
+            self.log("Dump with stored credentials failed - running full analysis", "WARNING")
+            return None
+        
+        self.log("Known card dumped with stored credentials", "SUCCESS")
+        return analysis_results
+    
+    def _dump_keys(self, path):
+        """{sector: {"A": key, "B": key}} from the trailers of a saved Classic dump"""
+        try:
+            with pm3_dump.load(path, use_mmap=True) as dump:
+                if dump.card_type != "mifare_classic":
+                    return {}
+                return {sector: dict(zip("AB", dump.keys(sector))) for sector in range(dump.sectors)}
+        except (OSError, IndexError, pm3_dump.DumpError) as e:
+            self.log(f"Could not read dump {path}: {e}", "WARNING")
+            return {}
+    
+    def _archive_dump(self, path, card_info=None, keys=None, password=None):
+        """Add a saved dump to the dump store and the similarity index"""
+        try:
+            with pm3_dump.load(path) as dump:
+                digest = digest_of(dump)
+                if self.dump_store.has(digest):
+                    self.log(f"Dump identical to stored image {digest[:12]}", "INFO")
+                self.dump_store.put(dump, source=Path(path).resolve(), session_dir=self.output_dir.resolve())
+                if self.similarity:
+                    self.similarity.add_dump(digest, dump, card_info, keys=keys, password=password)
+            return digest
+        except (OSError, pm3_dump.DumpError) as e:
+            self.log(f"Could not archive dump {path}: {e}", "WARNING")
+            return None
+    
+    def store_results(self, card_info, magic_results, analysis_results):
+        """Record the outcome of this run in the results and key stores"""
+        if not self.results_store or not card_info.get("uid"):
+            return
+        
+        keys = {}
+        found_keys = []
+        dump_files = []
+        password = None
+        dumped = False
+        for name, attack in (analysis_results or {}).get("attacks", {}).items():
+            if not attack.get("success"):
+                continue
+            record = classify(attack["output"])
+            merge_keys(keys, record.keys)
+            merge_keys(keys, attack.get("keys", {}))
+            found_keys.extend(key for key in record.found_keys if key not in found_keys)
+            dump_files.extend(record.saved_files)
+            dumped = dumped or record.dump_success
+            # The sweep and the stored password check carry theirs, dump attempts are named by it
+            match = PASSWORD_ATTACK_RE.match(name)
+            if attack.get("password"):
+                password = attack["password"]
+            elif match:
+                password = match.group("password")
+        
+        dump = (analysis_results or {}).get("dump", {})
+        if dump.get("success"):
+            dump_files.extend(classify(dump["output"]).saved_files)
+            dumped = True
+        
+        if dumped and dump_files and card_info.get("type") == "mifare_classic":
+            # Trailers in the saved image carry every key the client used
+            for sector, sector_keys in self._dump_keys(dump_files[-1]).items():
+                for key_type, key in sector_keys.items():
+                    keys.setdefault(sector, {}).setdefault(key_type, key)
+        
+        if dumped:
+            status = "dumped"
+        elif found_keys or password:
+            status = "cracked"
+        else:
+            status = "analysed"
+        
+        if self.dump_store and dumped:
+            for path in dict.fromkeys(dump_files):
+                # fchk --dump saves key files, not card images
+                if not Path(path).stem.endswith("-key"):
+                    self._archive_dump(path, card_info, keys, password)
+        
+        if self.key_store and card_info.get("type") == "mifare_classic":
+            self.key_store.record_card(keys, found_keys, site=self.site,
+                                       fingerprint=card_fingerprint(card_info))
+        
+        self.results_store.save(
+            card_info["uid"],
+            card_fingerprint(card_info),
+            card_type=card_info.get("type"),
+            subtype=card_info.get("subtype"),
+            atqa=card_info.get("atqa"),
+            sak=card_info.get("sak"),
+            magic_type=magic_results.get("type"),
+            keys=keys,
+            found_keys=found_keys,
+            password=password,
+            dump_path=dump_files[-1] if dump_files else None,
+            session_dir=self.output_dir.resolve(),
+            status=status
+        )
+    
     def generate_ai_recommendations(self, card_info, magic_results, analysis_results):
         """Generate AI recommendations based on analysis"""
         recommendations = {
@@ -465,8 +988,9 @@ class PM3AIAnalyzer:
         
         return recommendations
     
-    def generate_report(self, card_info, magic_results, analysis_results, recommendations):
+    def generate_report(self, card_info, magic_results, analysis_results, recommendations, output_dir=None):
         """Generate comprehensive analysis report"""
+        output_dir = Path(output_dir or self.output_dir)
         report = {
             "session_id": self.session_id,
             "timestamp": datetime.now().isoformat(),
@@ -474,16 +998,16 @@ class PM3AIAnalyzer:
             "magic_results": magic_results,
             "analysis_results": analysis_results,
             "ai_recommendations": recommendations,
-            "files_generated": list(str(f.name) for f in self.output_dir.iterdir())
+            "files_generated": list(str(f.name) for f in output_dir.iterdir())
         }
         
         # Save JSON report
-        report_file = self.output_dir / "analysis_report.json"
+        report_file = output_dir / "analysis_report.json"
         with open(report_file, "w") as f:
             json.dump(report, f, indent=2)
         
         # Generate human-readable summary
-        summary_file = self.output_dir / "summary.txt"
+        summary_file = output_dir / "summary.txt"
         with open(summary_file, "w") as f:
             f.write("=== PM3 AI Analysis Report ===\n")
             f.write(f"Session ID: {self.session_id}\n")
@@ -509,11 +1033,105 @@ class PM3AIAnalyzer:
             for step in recommendations.get("next_steps", []):
                 f.write(f"• {step}\n")
         
-        self.log(f"Report generated: {report_file}", "SUCCESS")
-        self.log(f"Summary generated: {summary_file}", "SUCCESS")
+        self.log(f"Report generated: {report_file}", "SUCCESS", output_dir)
+        self.log(f"Summary generated: {summary_file}", "SUCCESS", output_dir)
         
         return report
 
+    def poll_presence(self, command, timeout=5):
+        """Quiet presence read for the polling loop: no cache lookup, no command log"""
+        try:
+            with self.reader_session():
+                output = self.session.run(command, timeout=timeout)
+        except (LeaseTimeout, PM3SessionError) as e:
+            return PM3Output(f"ERROR: {str(e)}", returncode=-1, command=command)
+        # Still tracks the card on the reader, so a new card drops stale cache entries
+        self.cache.record(command, output)
+        return output
+
+    def analyze_card(self, card_type=None, detect_only=False, magic_only=False):
+        """Reader phase of run_analysis: detection, magic tests, attacks and store update
+        
+        Returns (card_info, magic_results, analysis_results); analysis_results
+        is None in magic-only and detect-only mode. The reader is leased
+        for this phase only, report_card runs without it.
+        """
+        with self.reader_session():
+            return self._analyze_card(card_type, detect_only, magic_only)
+
+    def _analyze_card(self, card_type, detect_only, magic_only):
+        # Detect card type
+        card_info = self.detect_card_type()
+        self.card_type = card_info.get("type")
+        self.prng = None
+        
+        # A card analysed before skips the magic probes and the attacks
+        known = None if magic_only else self.lookup_known_card(card_info)
+        
+        # Test magic capabilities
+        if known and known.get("magic_type"):
+            magic_results = {
+                "timestamp": datetime.now().isoformat(),
+                "type": known["magic_type"],
+                "capabilities": [],
+                "from_store": True
+            }
+        else:
+            magic_results = self.test_magic_capabilities(card_info)
+        
+        if magic_only:
+            return card_info, magic_results, None
+        
+        analysis_results = None
+        
+        if not detect_only:
+            if known:
+                analysis_results = self.verify_known_card(card_info, known)
+        
+        if not detect_only and analysis_results is None:
+            # Run appropriate analysis
+            card_type = card_type or card_info.get("type")
+            
+            if card_type == "mifare_classic":
+                analysis_results = self.analyze_mifare_classic(card_info)
+            elif card_type == "mifare_ultralight":
+                analysis_results = self.analyze_mifare_ultralight(card_info)
+            else:
+                self.log(f"No specific analysis available for: {card_type}", "WARNING")
+        
+        self.store_results(card_info, magic_results, analysis_results)
+        return card_info, magic_results, analysis_results
+
+    def report_card(self, card_info, magic_results, analysis_results, output_dir=None):
+        """Reporting phase of run_analysis, needs neither the reader nor the stores
+        
+        Safe to run in a background thread while the next card is analysed.
+        """
+        # Generate AI recommendations
+        recommendations = self.generate_ai_recommendations(
+            card_info, magic_results, analysis_results
+        )
+        
+        # Generate final report
+        self.generate_report(
+            card_info, magic_results, analysis_results, recommendations, output_dir
+        )
+        
+        return recommendations
+
+    def run_analysis(self, card_type=None, detect_only=False, magic_only=False):
+        """Run detection, magic tests and card analysis, then write the report
+        
+        Returns (card_info, magic_results, analysis_results, recommendations);
+        in magic-only mode the last two are None and no report is written.
+        """
+        card_info, magic_results, analysis_results = self.analyze_card(card_type, detect_only, magic_only)
+        if magic_only:
+            return card_info, magic_results, None, None
+        
+        recommendations = self.report_card(card_info, magic_results, analysis_results)
+        return card_info, magic_results, analysis_results, recommendations
+
 def main():
     parser = argparse.ArgumentParser(description='PM3 AI-Assisted Analyzer')
     parser.add_argument('--device', '-d', default='/dev/ttyACM0', help='PM3 device path')
@@ -522,6 +1140,11 @@ def main():
     parser.add_argument('--detect-only', action='store_true', help='Detection only, no attacks')
     parser.add_argument('--magic-only', action='store_true', help='Test magic capabilities only')
     parser.add_argument('--card-type', help='Force specific card type analysis')
+    parser.add_argument('--cache-ttl', type=int, default=300, help='Seconds to reuse read-only command results (0 = off)')
+    parser.add_argument('--no-store', action='store_true', help='Do not use the persistent results store')
+    parser.add_argument('--site', help='Site tag, keys found at the same site are tried first')
+    parser.add_argument('--budget', type=int, help='Time budget in seconds for MIFARE Classic attacks')
+    parser.add_argument('--full-check', action='store_true', help='Run the full hardware check even if the stored one is fresh')
     
     args = parser.parse_args()
     
@@ -529,47 +1152,28 @@ def main():
     analyzer = PM3AIAnalyzer(
         device=args.device,
         timeout=args.timeout,
-        verbose=args.verbose
+        verbose=args.verbose,
+        cache_ttl=args.cache_ttl,
+        use_store=not args.no_store,
+        site=args.site,
+        budget=args.budget
     )
     
     try:
         # Check PM3 connection
-        if not analyzer.check_pm3_connection():
+        if not analyzer.check_pm3_connection(force=args.full_check):
             sys.exit(1)
         
-        # Detect card type
-        card_info = analyzer.detect_card_type()
-        
-        # Test magic capabilities
-        magic_results = analyzer.test_magic_capabilities()
+        card_info, magic_results, analysis_results, recommendations = analyzer.run_analysis(
+            card_type=args.card_type,
+            detect_only=args.detect_only,
+            magic_only=args.magic_only
+        )
         
         if args.magic_only:
             analyzer.log("Magic-only mode - analysis complete")
             return
         
-        analysis_results = None
-        
-        if not args.detect_only:
-            # Run appropriate analysis
-            card_type = args.card_type or card_info.get("type")
-            
-            if card_type == "mifare_classic":
-                analysis_results = analyzer.analyze_mifare_classic(card_info)
-            elif card_type == "mifare_ultralight":
-                analysis_results = analyzer.analyze_mifare_ultralight(card_info)
-            else:
-                analyzer.log(f"No specific analysis available for: {card_type}", "WARNING")
-        
-        # Generate AI recommendations
-        recommendations = analyzer.generate_ai_recommendations(
-            card_info, magic_results, analysis_results
-        )
-        
-        # Generate final report
-        report = analyzer.generate_report(
-            card_info, magic_results, analysis_results, recommendations
-        )
-        
         analyzer.log("🎉 Analysis complete!", "SUCCESS")
         analyzer.log(f"Results saved in: {analyzer.output_dir}")
         
@@ -591,6 +1195,8 @@ def main():
     except Exception as e:
         analyzer.log(f"Analysis failed: {str(e)}", "ERROR")
         sys.exit(1)
+    finally:
+        analyzer.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+PM3 Attack Scheduler - time-budgeted MIFARE Classic attack planning
+Orders the attack steps by expected payoff per second (success probability
+over expected run time) from the PRNG type, key store hits and the success
+rates recorded on earlier cards, within a global time budget
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from pm3_classifier import classify
+from results_store import DEFAULT_DB, connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attack_stats (
+    step TEXT NOT NULL,
+    prng TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (step, prng)
+);
+"""
+
+PRNG_RE = re.compile(r"prng\W*(?P<prng>weak|hard|static)", re.IGNORECASE)
+
+# Weight of the built-in prior against recorded attempts
+PRIOR_WEIGHT = 2
+
+
+class AttackStep:
+    """One attack with its cost model
+
+    expected_seconds and prior are the defaults until real runs are
+    recorded; min_seconds is the least budget worth starting it with.
+    """
+
+    def __init__(self, name, timeout, expected_seconds, prior, min_seconds=5,
+                 prng=None, needs_key=False, streamed=False):
+        self.name = name
+        self.timeout = timeout
+        self.expected_seconds = expected_seconds
+        self.prior = prior
+        self.min_seconds = min_seconds
+        self.prng = prng
+        self.needs_key = needs_key
+        self.streamed = streamed
+
+    def applies(self, prng, have_key):
+        if self.prng and prng and self.prng != prng:
+            return False
+        return have_key or not self.needs_key
+
+
+# prior = rough share of cards each step opens on its own; family_keys only
+# runs once a similar archived card gives it a prior; client_dictionary is
+# the client's full default dictionary behind the short compiled one
+DEFAULT_STEPS = [
+    AttackStep("family_keys", 60, 5, 0.0),
+    AttackStep("learned_keys", 60, 5, 0.3),
+    AttackStep("dictionary", 60, 15, 0.5),
+    AttackStep("client_dictionary", 120, 45, 0.2),
+    AttackStep("darkside", 120, 60, 0.9, min_seconds=30, prng="weak", streamed=True),
+    AttackStep("hardnested", 300, 120, 0.8, min_seconds=60, prng="hard", needs_key=True, streamed=True),
+    AttackStep("autopwn", 180, 90, 0.6, min_seconds=30, streamed=True),
+]
+
+
+def detect_prng(output):
+    """weak, hard or static from hf mf info / PRNG test output, None if unknown"""
+    match = PRNG_RE.search(output or "")
+    if match:
+        return match.group("prng").lower()
+    if "weak" in (output or "").lower():
+        return "weak"
+    return None
+
+
+def sector_count(card_info):
+    return 40 if card_info.get("subtype") == "4k" else 16
+
+
+def fully_keyed(keys, sectors):
+    """True when both keys of every sector are known"""
+    return all(len(keys.get(sector, {})) == 2 for sector in range(sectors))
+
+
+def write_key_file(path, keys, sectors):
+    """Binary key file as written by the client: all A keys, then all B keys"""
+    blob = bytearray()
+    for key_type in ("A", "B"):
+        for sector in range(sectors):
+            blob += bytes.fromhex(keys.get(sector, {}).get(key_type, "FFFFFFFFFFFF"))
+    Path(path).write_bytes(bytes(blob))
+    return path
+
+
+def merge_keys(keys, new_keys):
+    """Add {sector: {type: key}} to keys in place"""
+    for sector, sector_keys in new_keys.items():
+        keys.setdefault(sector, {}).update(sector_keys)
+    return keys
+
+
+def reported_keys(output, sector, key_type):
+    """{sector: {type: key}} for the key a single-target attack (darkside,
+    hardnested) reports with "found valid key", which has no key table"""
+    found = classify(output or "").found_keys
+    return {sector: {key_type: found[-1]}} if found else {}
+
+
+class Budget:
+    """Wall-clock budget shared by all steps; None means unlimited"""
+
+    def __init__(self, seconds=None, clock=time.monotonic):
+        self.seconds = seconds
+        self.clock = clock
+        self.started = clock()
+
+    @property
+    def elapsed(self):
+        return self.clock() - self.started
+
+    @property
+    def remaining(self):
+        if self.seconds is None:
+            return float("inf")
+        return max(0.0, self.seconds - self.elapsed)
+
+    def timeout_for(self, step):
+        """Step timeout cut down to the remaining budget"""
+        return int(min(step.timeout, self.remaining))
+
+    def allows(self, step):
+        return self.remaining >= step.min_seconds
+
+
+class AttackStats:
+    """Recorded attempts, successes and run time per step and PRNG type"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB)
+        self.db = connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record(self, step, prng, success, seconds):
+        self.db.execute(
+            """
+            INSERT INTO attack_stats (step, prng, attempts, successes, seconds)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (step, prng) DO UPDATE SET
+                attempts = attempts + 1,
+                successes = successes + excluded.successes,
+                seconds = seconds + excluded.seconds
+            """,
+            (step, prng or "unknown", int(bool(success)), float(seconds))
+        )
+        self.db.commit()
+
+    def estimate(self, step, prng, prior=None):
+        """(success probability, expected seconds) blending prior and history"""
+        prior = step.prior if prior is None else prior
+        row = self.db.execute(
+            "SELECT attempts, successes, seconds FROM attack_stats WHERE step = ? AND prng = ?",
+            (step.name, prng or "unknown")
+        ).fetchone()
+        if not row or not row["attempts"]:
+            return prior, step.expected_seconds
+        probability = (row["successes"] + prior * PRIOR_WEIGHT) / (row["attempts"] + PRIOR_WEIGHT)
+        return probability, max(1.0, row["seconds"] / row["attempts"])
+
+    def table(self):
+        rows = self.db.execute("SELECT * FROM attack_stats ORDER BY step, prng")
+        return [dict(row) for row in rows]
+
+
+def learned_key_prior(summary):
+    """Success probability of the learned-key pass from key store hits"""
+    if not summary or not summary.get("total"):
+        return 0.0
+    if summary.get("site"):
+        return 0.8
+    if summary.get("model"):
+        return 0.5
+    return 0.15
+
+
+def next_step(steps, done, prng, have_key, budget, stats=None, priors=None):
+    """Best remaining step by payoff per second that fits the budget, or None"""
+    best = None
+    best_payoff = 0.0
+    for step in steps:
+        if step.name in done or not step.applies(prng, have_key) or not budget.allows(step):
+            continue
+        prior = (priors or {}).get(step.name, step.prior)
+        if not prior:
+            # Nothing to try, e.g. no learned keys yet
+            continue
+        probability, seconds = stats.estimate(step, prng, prior) if stats else (prior, step.expected_seconds)
+        payoff = probability / max(seconds, 1.0)
+        if payoff > best_payoff:
+            best, best_payoff = step, payoff
+    return best
+
+
+def plan(steps, prng, have_key=False, budget=None, stats=None, priors=None):
+    """Steps in the order they would run if none of them found a key"""
+    budget = budget or Budget()
+    order = []
+    done = set()
+    while True:
+        step = next_step(steps, done, prng, have_key, budget, stats, priors)
+        if step is None:
+            return order
+        order.append(step)
+        done.add(step.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Attack Scheduler - show attack order and statistics')
+    parser.add_argument('--db', default=None, help=f'Database path (default: {DEFAULT_DB})')
+    parser.add_argument('--prng', choices=['weak', 'hard', 'static'], help='Plan for this PRNG type')
+    parser.add_argument('--have-key', action='store_true', help='At least one key is already known')
+
+    args = parser.parse_args()
+
+    stats = AttackStats(args.db)
+    try:
+        if args.prng:
+            for index, step in enumerate(plan(DEFAULT_STEPS, args.prng, args.have_key, stats=stats), 1):
+                probability, seconds = stats.estimate(step, args.prng)
+                print(f"{index}. {step.name:<18} p={probability:.2f}  ~{seconds:.0f}s  "
+                      f"payoff={probability / seconds:.4f}/s")
+            return
+        for row in stats.table():
+            rate = row["successes"] / row["attempts"] if row["attempts"] else 0
+            mean = row["seconds"] / row["attempts"] if row["attempts"] else 0
+            print(f"{row['step']:<18} {row['prng']:<8} {row['successes']}/{row['attempts']} "
+                  f"({rate:.0%})  avg {mean:.0f}s")
+    finally:
+        stats.close()
+
+
+if __name__ == "__main__":
+    main()
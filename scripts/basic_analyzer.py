@@ -4,52 +4,139 @@ PM3 Basic Analyzer - Základní analýza neznámých karet podle protokolu
 Vytvoří dump odemčených karet do složky dump/
 """
 
-import subprocess
 import json
 import os
 import sys
 from datetime import datetime
 import argparse
+from contextlib import contextmanager
+
+from pm3_session import PM3Session, PM3SessionError, PM3Output
+from pm3_stream import PM3StreamRunner, CARD_LOST_PATTERNS
+from device_lease import DeviceLease, LeaseTimeout
+from pm3_classifier import classify
+from pm3_cache import CommandCache
+import mfu_pwdgen
+from lf_reader import parse_output as parse_lf_output
+from hw_health import HealthCheck, describe as describe_health
+from dump_store import DumpStore
+from pm3_dump import DumpError
+
+# Autopwn končí, jakmile jsou všechny klíče nalezené nebo karta zmizí
+AUTOPWN_PATTERNS = {
+    "all_keys_found": r"found all keys|found keys have been dumped|transferring keys to simulator",
+    **CARD_LOST_PATTERNS
+}
 
 class PM3BasicAnalyzer:
-    def __init__(self, output_dir="dump"):
+    def __init__(self, output_dir="dump", cache_ttl=300, full_check=False):
         self.output_dir = output_dir
         self.results = {}
         self.card_info = {}
+        self.session = PM3Session()
+        self.stream_runner = PM3StreamRunner()
+        self.lease = DeviceLease(owner="basic_analyzer")
+        self.cache = CommandCache(ttl=cache_ttl)
+        self.health = HealthCheck()
+        self.dump_store = DumpStore()
+        self.full_check = full_check
         
         # Vytvoření výstupní složky
         os.makedirs(self.output_dir, exist_ok=True)
         
+    @contextmanager
+    def reader_session(self):
+        """Drží čtečku po dobu jedné dávky práce se zařízením, pak ji vrátí
+        
+        Vnořená použití sdílí vnější lease. Na konci se ukončí i relace
+        klienta, aby sériový port mohl otevřít další analyzátor.
+        """
+        if self.lease.held:
+            yield
+            return
+        self.lease.acquire()
+        try:
+            yield
+        finally:
+            self.session.close()
+            self.lease.release()
+    
     def run_pm3_command(self, command, timeout=60):
-        """Spustí PM3 příkaz a vrátí výstup"""
+        """Spustí PM3 příkaz v běžící relaci klienta a vrátí výstup"""
+        # Opakované čtení stejné karty se obslouží z paměti
+        cached = self.cache.get(command)
+        if cached is not None:
+            print(f"♻️ Z cache: {command}")
+            return cached, "", 0
+        
         try:
-            print(f"🔧 Spouštím: pm3 -c \"{command}\"")
-            result = subprocess.run(['pm3', '-c', command], 
-                                  capture_output=True, text=True, timeout=timeout)
-            return result.stdout, result.stderr, result.returncode
-        except subprocess.TimeoutExpired:
-            return "TIMEOUT", "", -1
+            print(f"🔧 Spouštím: {command}")
+            with self.reader_session():
+                output = self.session.run(command, timeout=timeout)
         except FileNotFoundError:
             print("❌ CHYBA: PM3 není nainstalováno nebo není v PATH")
             return "PM3_NOT_FOUND", "", -1
+        except LeaseTimeout as e:
+            print(f"❌ Čtečka je obsazená: {str(e)}")
+            return f"ERROR: {str(e)}", "", -1
+        except PM3SessionError as e:
+            return f"ERROR: {str(e)}", "", -1
         except Exception as e:
             return f"ERROR: {str(e)}", "", -1
+        
+        # Při timeoutu vracíme částečný výstup, aby šly zpracovat už nalezené klíče
+        if output.timed_out:
+            print(f"  ⏱️ Timeout, ponechávám částečný výstup: {command}")
+        self.cache.record(command, output)
+        return output, output.stderr, output.returncode
+    
+    def run_pm3_stream(self, command, timeout=60, stop_patterns=None):
+        """Spustí dlouhý PM3 příkaz se streamovaným výstupem a předčasným ukončením"""
+        # Sériový port drží relace, uvolníme ho pro streamovaného klienta
+        self.session.close()
+        try:
+            print(f"🔧 Spouštím (stream): {command}")
+            with self.reader_session():
+                result = self.stream_runner.run_sync(command, timeout=timeout, stop_patterns=stop_patterns)
+        except FileNotFoundError:
+            print("❌ CHYBA: PM3 není nainstalováno nebo není v PATH")
+            return "PM3_NOT_FOUND", None
+        except Exception as e:
+            return f"ERROR: {str(e)}", None
+        self.cache.record(command, result.output)
+        if result.matched:
+            print(f"  ⏹️ Ukončeno předčasně: {result.matched}")
+        elif result.timed_out:
+            print(f"  ⏱️ Timeout, ponechávám částečný výstup: {command}")
+        return result.output, result.matched
+    
+    def close(self):
+        """Ukončí relaci PM3 klienta a uvolní čtečku"""
+        self.session.close()
+        self.lease.release()
+        self.health.close()
+        self.dump_store.close()
     
     def check_hardware(self):
         """Kontrola PM3 hardware"""
         print("🔍 Kontrola PM3 hardware...")
         
-        stdout, stderr, returncode = self.run_pm3_command("hw status")
-        if returncode != 0:
-            print("❌ PM3 hardware není připraven")
-            return False
-            
-        if "OK" in stdout:
-            print("✅ PM3 hardware je připraven")
-            return True
-        else:
-            print("⚠️ PM3 hardware možná není správně připojen")
+        # Plný test (hw status, version, tune) jen po vypršení TTL, jinak stačí hw ping
+        def run_batch(commands):
+            outputs = []
+            for command in commands:
+                stdout, stderr, returncode = self.run_pm3_command(command, timeout=20)
+                outputs.append(stdout if returncode == 0 else PM3Output(stdout, stderr, returncode))
+            return outputs
+        
+        record = self.health.check(run_batch, force=self.full_check)
+        if not record["healthy"]:
+            self.health.invalidate()
+            print(f"❌ PM3 hardware není připraven - {describe_health(record)}")
             return False
+        
+        print(f"✅ PM3 hardware je připraven ({'plný test' if record['full'] else 'ping'}) - {describe_health(record)}")
+        return True
     
     def detect_card(self):
         """Automatická detekce karty podle protokolu"""
@@ -59,13 +146,15 @@ class PM3BasicAnalyzer:
         stdout, stderr, returncode = self.run_pm3_command("auto")
         print(f"Auto detekce výsledek:\n{stdout}")
         
-        if "MIFARE Classic" in stdout:
+        # Jeden klasifikační průchod výstupem
+        card_type = classify(stdout).card_type
+        if card_type == "mifare_classic":
             return self.analyze_mifare_classic(stdout)
-        elif "MIFARE Ultralight" in stdout:
+        elif card_type == "mifare_ultralight":
             return self.analyze_mifare_ultralight(stdout)
-        elif "DESFire" in stdout:
+        elif card_type == "desfire":
             return self.analyze_desfire(stdout)
-        elif "EM410x" in stdout:
+        elif card_type == "em410x":
             return self.analyze_em410x(stdout)
         else:
             # Krok 2: Manuální HF detekce
@@ -103,10 +192,12 @@ class PM3BasicAnalyzer:
         
         # Autopwn útok
         print("  ⚡ Spouštím autopwn útok...")
-        autopwn_stdout, _, _ = self.run_pm3_command("hf mf autopwn", timeout=300)
+        autopwn_stdout, stopped_on = self.run_pm3_stream(
+            "hf mf autopwn", timeout=300, stop_patterns=AUTOPWN_PATTERNS
+        )
         
         # Kontrola úspěchu
-        if "found" in autopwn_stdout.lower() and "key" in autopwn_stdout.lower():
+        if stopped_on == "all_keys_found" or classify(autopwn_stdout).key_found:
             print("  ✅ Klíče nalezeny!")
             self.card_info["status"] = "cracked"
             
@@ -144,10 +235,7 @@ class PM3BasicAnalyzer:
         dump_stdout, _, _ = self.run_pm3_command("hf mfu dump")
         
         # Kontrola úspěchu dumpu - hledáme indikátory úspěšného čtení
-        if ("mfu dump file information" in dump_stdout.lower() or
-            "reading tag memory" in dump_stdout.lower() or
-            "block#" in dump_stdout.lower() or
-            "version....." in dump_stdout.lower()):
+        if classify(dump_stdout).dump_success:
             print("  ✅ Dump úspěšný!")
             self.card_info["status"] = "dumped"
 
@@ -158,29 +246,32 @@ class PM3BasicAnalyzer:
         else:
             print("  🔐 Karta je chráněna heslem, zkouším útoky...")
 
-            # Password generation útok
+            # Password generation útok - hesla odvozená z UID počítáme lokálně
             print("  🎯 Generuji hesla na základě UID...")
-            pwdgen_stdout, _, _ = self.run_pm3_command("hf mfu pwdgen -r")
+            generated = mfu_pwdgen.generate(uid)
+            pwdgen = "\n".join(f"{scheme}: {pwd}" for scheme, pwd in generated)
+            candidates = [pwd for _, pwd in generated]
+            if "FFFFFFFF" not in candidates:
+                candidates.append("FFFFFFFF")
 
             # Dictionary útok
             print("  📚 Dictionary útok...")
-            dict_stdout, _, _ = self.run_pm3_command("hf mfu dump -k FFFFFFFF")
+            for pwd in candidates:
+                dict_stdout, _, _ = self.run_pm3_command(f"hf mfu dump -k {pwd}")
 
-            # Kontrola úspěchu dictionary útoku
-            if ("mfu dump file information" in dict_stdout.lower() or
-                "reading tag memory" in dict_stdout.lower() or
-                "block#" in dict_stdout.lower()):
-                print("  ✅ Dump úspěšný s dictionary útokem!")
-                self.card_info["status"] = "cracked"
-                return self.save_results("mifare_ultralight", {
-                    "info": info_stdout,
-                    "pwdgen": pwdgen_stdout,
-                    "dump": dict_stdout
-                })
-            else:
-                print("  ❌ Nepodařilo se prolomit kartu")
-                self.card_info["status"] = "failed"
-                return None
+                # Kontrola úspěchu dictionary útoku
+                if classify(dict_stdout).dump_success:
+                    print(f"  ✅ Dump úspěšný s heslem {pwd}!")
+                    self.card_info["status"] = "cracked"
+                    return self.save_results("mifare_ultralight", {
+                        "info": info_stdout,
+                        "pwdgen": pwdgen,
+                        "dump": dict_stdout
+                    })
+
+            print("  ❌ Nepodařilo se prolomit kartu")
+            self.card_info["status"] = "failed"
+            return None
     
     def analyze_desfire(self, detection_output):
         """Analýza DESFire karty"""
@@ -202,7 +293,9 @@ class PM3BasicAnalyzer:
         self.card_info["type"] = "EM410x"
         
         read_stdout, _, _ = self.run_pm3_command("lf em 410x_read")
-        uid = self.extract_uid(read_stdout)
+        # Dekodér EM410x místo obecného hledání hex řetězce
+        reads = [read for read in parse_lf_output(read_stdout) if read.family == "em410x"]
+        uid = reads[0].id if reads else self.extract_uid(read_stdout)
         self.card_info["uid"] = uid
         self.card_info["status"] = "dumped"
         
@@ -229,15 +322,7 @@ class PM3BasicAnalyzer:
     
     def extract_uid(self, output):
         """Extrakce UID z výstupu PM3"""
-        lines = output.split('\n')
-        for line in lines:
-            if 'UID' in line or 'uid' in line:
-                # Hledání hex hodnot
-                parts = line.split()
-                for part in parts:
-                    if len(part) >= 8 and all(c in '0123456789ABCDEFabcdef' for c in part):
-                        return part.upper()
-        return "UNKNOWN"
+        return classify(output).uid or "UNKNOWN"
     
     def save_results(self, card_type, analysis_data):
         """Uložení výsledků podle protokolu"""
@@ -248,6 +333,15 @@ class PM3BasicAnalyzer:
         # Název souboru podle protokolu
         base_filename = f"{card_type}_{uid}_{timestamp}_{status}"
         
+        # Dumpy uložené klientem jdou do deduplikovaného úložiště, metadata nesou jejich otisk
+        dumps = {}
+        for output in analysis_data.values():
+            for path in classify(output).saved_files:
+                try:
+                    dumps[path] = self.dump_store.put_file(path, session_dir=os.path.abspath(self.output_dir))
+                except (OSError, DumpError):
+                    continue
+        
         # Uložení JSON metadata
         metadata = {
             "card_info": {
@@ -257,6 +351,7 @@ class PM3BasicAnalyzer:
                 "analyzer": "PM3 Basic Analyzer v1.0"
             },
             "analysis": analysis_data,
+            "dumps": dumps,
             "files": {
                 "metadata_file": f"{base_filename}_metadata.json",
                 "analysis_file": f"{base_filename}_analysis.txt"
@@ -293,22 +388,31 @@ def main():
     parser = argparse.ArgumentParser(description='PM3 Basic Analyzer - Analýza neznámých karet')
     parser.add_argument('--output-dir', default='dump', help='Výstupní složka pro dump soubory')
     parser.add_argument('--no-hardware-check', action='store_true', help='Přeskočit kontrolu hardware')
+    parser.add_argument('--full-check', action='store_true', help='Plná kontrola hardware i s platným výsledkem v cache')
     
     args = parser.parse_args()
     
     print("🚀 PM3 Basic Analyzer - Analýza neznámých karet")
     print("=" * 50)
     
-    analyzer = PM3BasicAnalyzer(args.output_dir)
+    analyzer = PM3BasicAnalyzer(args.output_dir, full_check=args.full_check)
     
     # Kontrola hardware
     if not args.no_hardware_check:
         if not analyzer.check_hardware():
             print("❌ Ukončuji kvůli problémům s hardware")
+            analyzer.close()
             sys.exit(1)
     
     # Detekce a analýza karty
-    result = analyzer.detect_card()
+    try:
+        with analyzer.reader_session():
+            result = analyzer.detect_card()
+    except LeaseTimeout as e:
+        print(f"❌ Čtečka je obsazená: {str(e)}")
+        result = None
+    finally:
+        analyzer.close()
     
     if result:
         print(f"\n✅ Analýza dokončena! Výsledky uloženy v: {result}")
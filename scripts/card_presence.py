@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+PM3 Card Presence - polling loop that notices cards arriving and leaving
+A cheap anticollision read (hf 14a reader, or lf search for LF tags) is
+repeated until the UID changes; batch mode analyses every new card on
+arrival and writes its report while the next card is being presented
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from device_lease import DeviceLease, LeaseTimeout
+from pm3_classifier import classify
+from pm3_session import PM3Session, PM3SessionError
+
+POLL_COMMANDS = {
+    "hf": "hf 14a reader",
+    "lf": "lf search",
+}
+
+# Empty reads in a row before a card counts as removed, one miss can be a bad read
+REMOVAL_MISSES = 2
+
+
+def present_uid(output):
+    """UID of the card a presence read saw, None for no card or no answer"""
+    if not output or output.startswith("ERROR") or getattr(output, "timed_out", False):
+        return None
+    return classify(output).uid
+
+
+class CardPresence:
+    """Which card is on the reader, tracked from repeated cheap reads
+
+    read(command) must return the client output for one command. poll()
+    returns ("arrived", uid), ("removed", uid) or None; a different UID
+    showing up without an empty read in between is a plain arrival.
+    """
+
+    def __init__(self, read, band="hf", interval=0.3, removal_misses=REMOVAL_MISSES,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.read = read
+        self.command = POLL_COMMANDS[band]
+        self.interval = interval
+        self.removal_misses = removal_misses
+        self.clock = clock
+        self.sleep = sleep
+        self.uid = None
+        self.misses = 0
+
+    def poll(self):
+        output = self.read(self.command)
+        uid = present_uid(output)
+        if uid:
+            self.misses = 0
+            if uid != self.uid:
+                self.uid = uid
+                return "arrived", uid
+            return None
+
+        # An error says nothing about the card, only an answered empty read counts
+        if not output or output.startswith("ERROR"):
+            return None
+        if self.uid:
+            self.misses += 1
+            if self.misses >= self.removal_misses:
+                uid, self.uid = self.uid, None
+                self.misses = 0
+                return "removed", uid
+        return None
+
+    def wait(self, accept=None, timeout=None, on_event=None):
+        """Poll until a card arrives that accept(uid) allows, return its UID
+
+        Returns None when timeout seconds pass without one.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while deadline is None or self.clock() < deadline:
+            event = self.poll()
+            if event:
+                if on_event:
+                    on_event(*event)
+                kind, uid = event
+                if kind == "arrived" and (accept is None or accept(uid)):
+                    return uid
+            self.sleep(self.interval)
+        return None
+
+
+def run_auto_batch(analyzer, output_root, count=None, band="hf", idle_timeout=None, interval=0.3):
+    """Analyse every new card presented to one reader without prompts
+
+    The reader phase (detection, attacks, store update) runs as soon as a
+    card arrives; recommendations and report files are written by a
+    background thread while the operator swaps cards. Cards already done
+    in this batch are ignored when presented again. Stops after count
+    cards, or after idle_timeout seconds without a new card.
+    """
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    presence = CardPresence(analyzer.poll_presence, band=band, interval=interval)
+    done = set()
+    records = []
+    pending = []
+
+    def on_event(kind, uid):
+        if kind == "removed":
+            analyzer.cache.card_lost()
+            analyzer.log(f"Card removed: {uid}")
+        elif uid in done:
+            analyzer.log(f"Card {uid} already processed in this batch", "WARNING")
+
+    def report(record, card_dir, card_info, magic_results, analysis_results):
+        try:
+            recommendations = analyzer.report_card(card_info, magic_results, analysis_results, card_dir)
+            record["attack_success"] = recommendations.get("attack_success", [])
+            record["status"] = "done"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["finished"] = datetime.now().isoformat()
+        return record
+
+    with ThreadPoolExecutor(max_workers=1) as reporter:
+        while count is None or len(records) < count:
+            number = len(records) + 1
+            analyzer.log(f"🎯 Present card {number}" + (f"/{count}" if count else ""))
+            # Leased per wait and per card, queued clients get the reader in between
+            try:
+                with analyzer.reader_session():
+                    uid = presence.wait(lambda uid: uid not in done, timeout=idle_timeout, on_event=on_event)
+            except LeaseTimeout as e:
+                analyzer.log(f"Reader busy: {e}", "ERROR")
+                break
+            if uid is None:
+                analyzer.log("No new card, ending batch", "WARNING")
+                break
+            done.add(uid)
+            analyzer.cache.new_card(uid)
+
+            card_dir = output_root / f"card_{number:03d}"
+            card_dir.mkdir(parents=True, exist_ok=True)
+            analyzer.output_dir = card_dir
+            record = {
+                "card": number,
+                "reader": analyzer.device,
+                "output_dir": str(card_dir),
+                "uid": uid,
+                "status": "analysing",
+                "started": datetime.now().isoformat()
+            }
+            records.append(record)
+
+            try:
+                card_info, magic_results, analysis_results = analyzer.analyze_card()
+            except Exception as e:
+                record["status"] = "error"
+                record["error"] = str(e)
+                continue
+            record.update(uid=card_info.get("uid") or uid, type=card_info.get("type"),
+                          magic_type=magic_results.get("type"))
+            pending.append(reporter.submit(report, record, card_dir, card_info, magic_results, analysis_results))
+            analyzer.log(f"✅ Card {number} read ({record['type']} {record['uid']}), remove it and present the next one",
+                         "SUCCESS")
+
+        for future in pending:
+            future.result()
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Card Presence - auto-triggered card detection and batch analysis')
+    parser.add_argument('--device', '-d', default='/dev/ttyACM0', help='PM3 device path')
+    parser.add_argument('--band', choices=sorted(POLL_COMMANDS), default='hf', help='Presence read to poll with')
+    parser.add_argument('--interval', type=float, default=0.3, help='Seconds between presence reads')
+    parser.add_argument('--wait', action='store_true', help='Only wait for a card and print its UID')
+    parser.add_argument('--uid', help='With --wait: wait for this card')
+    parser.add_argument('--not-uid', help='With --wait: wait for any card but this one')
+    parser.add_argument('--count', '-n', type=int, help='Batch: number of cards (default: until idle)')
+    parser.add_argument('--idle-timeout', type=int, default=None, help='Give up after this many seconds without a new card')
+    parser.add_argument('--output', '-o', default='batch_results', help='Batch output directory')
+    parser.add_argument('--timeout', '-t', type=int, default=60, help='Command timeout in seconds')
+    parser.add_argument('--site', help='Site tag passed to the analyzer')
+
+    args = parser.parse_args()
+
+    if args.wait:
+        session = PM3Session(device=args.device)
+        lease = DeviceLease(args.device, owner="card_presence")
+        wanted = args.uid.replace(" ", "").upper() if args.uid else None
+        unwanted = args.not_uid.replace(" ", "").upper() if args.not_uid else None
+
+        def read(command):
+            try:
+                return session.run(command, timeout=5)
+            except PM3SessionError as e:
+                return f"ERROR: {e}"
+
+        try:
+            lease.acquire()
+            presence = CardPresence(read, band=args.band, interval=args.interval)
+            uid = presence.wait(
+                lambda uid: (wanted is None or uid == wanted) and uid != unwanted,
+                timeout=args.idle_timeout
+            )
+        except LeaseTimeout as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        finally:
+            session.close()
+            lease.release()
+        if uid is None:
+            sys.exit(1)
+        print(uid)
+        return
+
+    # Imported here so --wait does not pull in the whole analyzer
+    from ai_analyzer import PM3AIAnalyzer
+    from reader_farm import write_summary
+
+    analyzer = PM3AIAnalyzer(device=args.device, timeout=args.timeout, site=args.site,
+                             output_dir=Path(args.output))
+    records = []
+    try:
+        if not analyzer.check_pm3_connection():
+            sys.exit(1)
+        records = run_auto_batch(analyzer, args.output, count=args.count, band=args.band,
+                                 idle_timeout=args.idle_timeout, interval=args.interval)
+    except KeyboardInterrupt:
+        print("\n⚠️ Batch stopped by user")
+    finally:
+        analyzer.close()
+        if records:
+            write_summary(Path(args.output), [args.device], records)
+
+    print(f"\n✅ {len(records)} card(s) processed. Results in: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+PM3 Clone Writer - delta clone of a MIFARE Classic dump onto a target card
+Reads what the target holds now, diffs it block by block against the
+source dump and writes only the blocks that differ: block 0 and data
+blocks first, sector trailers last, so every sector is still opened with
+its old keys until its data is done
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+import pm3_dump
+from device_lease import DeviceLease, LeaseTimeout
+from pm3_dump import DumpError
+from pm3_session import PM3Session, PM3SessionError
+
+# Factory keys tried after the source dump's own keys
+DEFAULT_KEYS = ["FFFFFFFFFFFF", "A0A1A2A3A4A5", "D3F7D3F7D3F7", "000000000000"]
+# Newest dump the client saved in the working directory
+DUMP_PATTERN = "hf-mf-*-dump*.*"
+
+# "[=]   4 | 00 11 22 ... FF | ................" (rdsc, rdbl, cgetsc, cgetblk)
+BLOCK_RE = re.compile(r"^\W*(?P<block>\d{1,3})\s*\|\s*(?P<data>(?:[0-9A-Fa-f]{2} ?){16})", re.MULTILINE)
+FAILURE_RE = re.compile(r"auth(?:entication)? error|\bfail|can't|cannot|error|timeout", re.IGNORECASE)
+
+MODES = ("auto", "gen1a", "keyed")
+
+
+class CloneError(Exception):
+    """Raised when a dump cannot be cloned"""
+
+
+def latest_dump(directory=".", pattern=DUMP_PATTERN):
+    """Newest client dump in directory (not recursive), .json preferred over .bin/.eml"""
+    dumps = [path for path in Path(directory).glob(pattern)
+             if path.suffix.lower() in pm3_dump.DUMP_SUFFIXES and not path.stem.endswith("-key")]
+    if not dumps:
+        raise CloneError(f"no {pattern} in {Path(directory).resolve()}")
+    return max(dumps, key=lambda path: (path.stat().st_mtime, -pm3_dump.SUFFIX_PREFERENCE[path.suffix.lower()]))
+
+
+def parse_blocks(output):
+    """{block: 16 bytes} from a client block/sector table"""
+    if output is None or output.startswith("ERROR"):
+        return {}
+    return {int(match.group("block")): bytes.fromhex(match.group("data").replace(" ", ""))
+            for match in BLOCK_RE.finditer(output)}
+
+
+def written(output):
+    return bool(output) and not output.startswith("ERROR") and not FAILURE_RE.search(output)
+
+
+class TargetImage:
+    """What was read from the target, and which key opens each sector"""
+
+    def __init__(self):
+        self.blocks = {}
+        self.auth = {}
+        self.confirmed_keys = {}
+
+    def sector_read(self, sector):
+        return all(block in self.blocks for block in pm3_dump.sector_blocks(sector))
+
+
+class CloneWriter:
+    """Delta writer for one source dump
+
+    run_batch(commands) must return one output per command, in order. In
+    keyed mode sectors are read and written with their keys (gen2/CUID and
+    ordinary cards); in gen1a mode through the magic backdoor.
+    """
+
+    def __init__(self, source, run_batch, mode="auto", keys=None):
+        if source.card_type != "mifare_classic":
+            raise CloneError(f"only MIFARE Classic dumps can be cloned, not {source.card_type}")
+        self.source = source
+        self.run_batch = run_batch
+        self.mode = mode
+        self.extra_keys = [key.upper() for key in keys or []]
+
+    @property
+    def sectors(self):
+        return range(self.source.sectors)
+
+    def detect_mode(self):
+        """gen1a if the backdoor answers, keyed otherwise"""
+        if self.mode == "auto":
+            output = self.run_batch(["hf mf cgetblk --blk 0"])[0]
+            self.mode = "gen1a" if 0 in parse_blocks(output) else "keyed"
+        return self.mode
+
+    def key_candidates(self, sector):
+        """(key, type) to try on a target sector: the source's own keys, then defaults"""
+        key_a, key_b = self.source.keys(sector)
+        candidates = [(key_a, "A"), (key_b, "B")]
+        for key in self.extra_keys + DEFAULT_KEYS:
+            candidates.extend([(key, "A"), (key, "B")])
+        return list(dict.fromkeys(candidates))
+
+    # --- reading ------------------------------------------------------------
+
+    def read_target(self, sectors=None):
+        """Read the target's sectors, trying key candidates round by round"""
+        target = TargetImage()
+        pending = list(self.sectors if sectors is None else sectors)
+        if self.mode == "gen1a":
+            outputs = self.run_batch([f"hf mf cgetsc -s {sector}" for sector in pending])
+            for output in outputs:
+                target.blocks.update(parse_blocks(output))
+            return target
+
+        attempt = 0
+        while pending:
+            batch = [(sector, self.key_candidates(sector)[attempt]) for sector in pending
+                     if attempt < len(self.key_candidates(sector))]
+            if not batch:
+                break
+            outputs = self.run_batch([
+                f"hf mf rdsc -s {sector} -k {key}{' -b' if key_type == 'B' else ''}"
+                for sector, (key, key_type) in batch
+            ])
+            for (sector, auth), output in zip(batch, outputs):
+                blocks = parse_blocks(output)
+                if all(block in blocks for block in pm3_dump.sector_blocks(sector)):
+                    target.blocks.update(blocks)
+                    target.auth[sector] = auth
+                    pending.remove(sector)
+            attempt += 1
+        self._confirm_keys(target)
+        return target
+
+    def _confirm_keys(self, target):
+        """Check the trailer key the read did not use, it reads back hidden"""
+        checks = []
+        for sector, (key, key_type) in target.auth.items():
+            source_keys = dict(zip("AB", self.source.keys(sector)))
+            target.confirmed_keys[sector] = {key_type} if source_keys[key_type] == key else set()
+            other = "B" if key_type == "A" else "A"
+            if target.confirmed_keys[sector]:
+                checks.append((sector, other, source_keys[other]))
+        if not checks:
+            return
+        outputs = self.run_batch([
+            f"hf mf rdbl --blk {pm3_dump.trailer_block(sector)} -k {key}{' -b' if key_type == 'B' else ''}"
+            for sector, key_type, key in checks
+        ])
+        for (sector, key_type, _), output in zip(checks, outputs):
+            if pm3_dump.trailer_block(sector) in parse_blocks(output):
+                target.confirmed_keys[sector].add(key_type)
+
+    # --- planning -----------------------------------------------------------
+
+    def block_matches(self, target, block):
+        data = target.blocks.get(block)
+        if data is None:
+            return False
+        wanted = bytes(self.source.block(block))
+        if not pm3_dump.is_trailer(block):
+            return data == wanted
+        if data[6:10] != wanted[6:10]:
+            return False
+        if self.mode == "gen1a":
+            # The backdoor reads the trailer as stored, keys included
+            return data == wanted
+        return target.confirmed_keys.get(pm3_dump.sector_of(block)) == {"A", "B"}
+
+    def plan(self, target):
+        """Blocks to write: block 0, data blocks, then trailers, each ascending"""
+        differ = [block for block in range(len(self.source)) if not self.block_matches(target, block)]
+        return ([block for block in differ if not pm3_dump.is_trailer(block)]
+                + [block for block in differ if pm3_dump.is_trailer(block)])
+
+    # --- writing ------------------------------------------------------------
+
+    def write_command(self, target, block):
+        data = bytes(self.source.block(block)).hex().upper()
+        if self.mode == "gen1a":
+            return f"hf mf csetblk --blk {block} -d {data}"
+        key, key_type = target.auth[pm3_dump.sector_of(block)]
+        # Block 0 needs --force; trailers keep the client's access bits check
+        force = " --force" if block == 0 else ""
+        return f"hf mf wrbl --blk {block} -k {key}{' -b' if key_type == 'B' else ''} -d {data}{force}"
+
+    def write(self, target, blocks):
+        """Write the planned blocks in order; returns (written, failed, unreachable)"""
+        reachable = [block for block in blocks
+                     if self.mode == "gen1a" or pm3_dump.sector_of(block) in target.auth]
+        unreachable = [block for block in blocks if block not in reachable]
+        if not reachable:
+            return [], [], unreachable
+        outputs = self.run_batch([self.write_command(target, block) for block in reachable])
+        done = [block for block, output in zip(reachable, outputs) if written(output)]
+        failed = [block for block in reachable if block not in done]
+        return done, failed, unreachable
+
+    def clone(self, dry_run=False, verify=True):
+        """Read, diff, write and (optionally) re-read the sectors that were written"""
+        self.detect_mode()
+        target = self.read_target()
+        blocks = self.plan(target)
+        result = {
+            "mode": self.mode,
+            "blocks": len(self.source),
+            "sectors": self.source.sectors,
+            "sectors_read": sum(1 for sector in self.sectors if target.sector_read(sector)),
+            "plan": blocks,
+            "written": [],
+            "failed": [],
+            "unreachable": [],
+            "remaining": None,
+        }
+        if not blocks:
+            result["remaining"] = []
+        if dry_run or not blocks:
+            return result
+
+        result["written"], result["failed"], result["unreachable"] = self.write(target, blocks)
+        if verify and result["written"]:
+            touched = sorted({pm3_dump.sector_of(block) for block in result["written"]})
+            check = self.read_target(touched)
+            result["remaining"] = [block for block in blocks if pm3_dump.sector_of(block) in touched
+                                   and not self.block_matches(check, block)]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Clone Writer - write only the blocks a target card lacks')
+    parser.add_argument('dump', nargs='?', default=None,
+                        help=f'Source MIFARE Classic dump (default: newest {DUMP_PATTERN} here)')
+    parser.add_argument('--device', '-d', default=None, help='PM3 device path')
+    parser.add_argument('--target', '-t', choices=MODES, default='auto',
+                        help='gen1a (backdoor), keyed (gen2/CUID or ordinary card) or auto-detect')
+    parser.add_argument('--key', '-k', action='append', default=[], help='Extra target key to try (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help='Only read the target and show the blocks to write')
+    parser.add_argument('--no-verify', action='store_true', help='Do not re-read written sectors')
+    parser.add_argument('--no-lease', action='store_true', help='Caller already holds the reader lease')
+
+    args = parser.parse_args()
+
+    try:
+        path = Path(args.dump) if args.dump else latest_dump()
+        source = pm3_dump.load(path)
+    except (OSError, DumpError, CloneError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"📄 Source: {path} ({source.subtype or '?'}, UID {source.uid or '?'})")
+    session = PM3Session(device=args.device)
+    lease = None if args.no_lease else DeviceLease(args.device, owner="clone_writer")
+    try:
+        if lease:
+            lease.acquire()
+        writer = CloneWriter(source, lambda commands: session.run_batch(commands, timeout=10 + 2 * len(commands)),
+                             mode=args.target, keys=args.key)
+        result = writer.clone(dry_run=args.dry_run, verify=not args.no_verify)
+    except (PM3SessionError, LeaseTimeout, CloneError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+        if lease:
+            lease.release()
+        source.close()
+
+    print(f"🎴 Target ({result['mode']}): {result['sectors_read']}/{result['sectors']} sectors read, "
+          f"{len(result['plan'])} of {result['blocks']} blocks differ")
+    if args.dry_run:
+        print("   " + (", ".join(map(str, result["plan"])) or "nothing to write"))
+        return
+    if not result["plan"]:
+        print("✅ Target already matches the dump")
+        return
+
+    print(f"✍️  Written: {len(result['written'])}" + (f", failed: {result['failed']}" if result["failed"] else "")
+          + (f", no key for: {result['unreachable']}" if result["unreachable"] else ""))
+    if result["remaining"] is None:
+        ok = not result["failed"] and not result["unreachable"]
+    else:
+        ok = not result["remaining"] and not result["failed"] and not result["unreachable"]
+        print(f"🔍 Verify: " + ("all written blocks match" if not result["remaining"]
+                               else f"blocks still differing: {result['remaining']}"))
+    print("✅ Clone complete" if ok else "⚠️  Clone incomplete")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
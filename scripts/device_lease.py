@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+PM3 Device Lease - lock-file lease broker for Proxmark3 serial ports
+Concurrent analyzer processes queue up for a reader instead of opening
+the same serial port at once. Waiters are served in arrival order and
+leases of crashed processes are recovered automatically.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+
+LEASE_DIR = Path(os.environ.get("PM3_LEASE_DIR", "/tmp/pm3-leases"))
+DEFAULT_DEVICE = os.environ.get("PM3_DEVICE", "/dev/ttyACM0")
+
+_ticket_ids = count(1)
+
+
+class LeaseTimeout(Exception):
+    """Raised when a device lease could not be acquired in time"""
+
+
+def resolve_device(device):
+    """Device the pm3 client will actually use when none is given"""
+    return device or DEFAULT_DEVICE
+
+
+def lease_name(device):
+    """File-system safe lease name, shared with quick_analyze.sh"""
+    return resolve_device(device).strip("/").replace("/", "_")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class DeviceLease:
+    """Exclusive, fairly queued lease on one reader
+
+    The lease is an flock() on <LEASE_DIR>/<name>.lock, released by the
+    kernel when the holder dies. Waiters register a ticket in
+    <name>.queue/ and only try the lock once every older live ticket is
+    gone, which gives first-come first-served ordering.
+    """
+
+    def __init__(self, device=None, timeout=600, owner=None, poll_interval=0.2):
+        self.device = resolve_device(device)
+        self.timeout = timeout
+        self.owner = owner or Path(sys.argv[0]).name
+        self.poll_interval = poll_interval
+        self.name = lease_name(device)
+        self.lock_path = LEASE_DIR / f"{self.name}.lock"
+        self.queue_dir = LEASE_DIR / f"{self.name}.queue"
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def acquire(self, timeout=None):
+        """Wait for the lease; a no-op when this object already holds it"""
+        if self.held:
+            return
+        if timeout is None:
+            timeout = self.timeout
+
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        ticket = self.queue_dir / f"{time.time_ns():020d}-{os.getpid()}-{next(_ticket_ids)}"
+        ticket.touch()
+
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                if self._first_in_queue(ticket) and self._try_lock():
+                    return
+                if time.monotonic() >= deadline:
+                    raise LeaseTimeout(f"{self.device} still leased after {timeout}s ({self.holder()})")
+                time.sleep(self.poll_interval)
+        finally:
+            ticket.unlink(missing_ok=True)
+
+    def try_acquire(self):
+        """Take the lease only if it is free and nobody is queued for it"""
+        if self.held:
+            return True
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        if any(self._live_tickets()):
+            return False
+        return self._try_lock()
+
+    def release(self):
+        """Give the lease back"""
+        if self._fd is None:
+            return
+        try:
+            os.ftruncate(self._fd, 0)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def holder(self):
+        """Describe the current holder as recorded in the lock file"""
+        try:
+            info = json.loads(self.lock_path.read_text() or "{}")
+        except (OSError, ValueError):
+            return "unknown holder"
+        if not info:
+            return "unknown holder"
+        return f"pid {info.get('pid')} ({info.get('owner')}) since {info.get('since')}"
+
+    def _try_lock(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps({
+            "pid": os.getpid(),
+            "owner": self.owner,
+            "device": self.device,
+            "since": datetime.now().isoformat()
+        }).encode())
+        self._fd = fd
+        return True
+
+    def _live_tickets(self):
+        """Queued tickets in arrival order, tickets of dead processes are removed"""
+        tickets = []
+        for ticket in sorted(self.queue_dir.iterdir()):
+            try:
+                pid = int(ticket.name.split("-")[1])
+            except (IndexError, ValueError):
+                continue
+            if _pid_alive(pid):
+                tickets.append(ticket)
+            else:
+                ticket.unlink(missing_ok=True)
+        return tickets
+
+    def _first_in_queue(self, ticket):
+        tickets = self._live_tickets()
+        return not tickets or tickets[0] == ticket
+
+
+def acquire_any(devices, timeout=600, owner=None, poll_interval=0.2):
+    """Lease whichever device of a pool becomes free first"""
+    leases = [DeviceLease(device, owner=owner) for device in devices]
+    deadline = time.monotonic() + timeout
+    while True:
+        for lease in leases:
+            if lease.try_acquire():
+                return lease
+        if time.monotonic() >= deadline:
+            raise LeaseTimeout(f"No device free in {', '.join(devices)} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Device Lease - show reader lease status')
+    parser.add_argument('devices', nargs='*', help='Devices to inspect (default: all known leases)')
+
+    args = parser.parse_args()
+
+    devices = args.devices or sorted(
+        "/" + path.stem.replace("_", "/") for path in LEASE_DIR.glob("*.lock")
+    )
+    if not devices:
+        print(f"No leases in {LEASE_DIR}")
+        return
+
+    for device in devices:
+        lease = DeviceLease(device)
+        if lease.try_acquire():
+            lease.release()
+            state = "free"
+        else:
+            state = f"leased by {lease.holder()}"
+        waiting = len(lease._live_tickets()) if lease.queue_dir.exists() else 0
+        print(f"{device:<16} {state}, {waiting} waiting")
+
+
+if __name__ == "__main__":
+    main()
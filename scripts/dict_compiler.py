@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+PM3 Dictionary Compiler - validated, deduplicated, hit-ranked dictionaries
+Turns the .dic text files into a clean ranked .dic for the pm3 client, a
+packed .bin in attack order and a sorted .idx for membership lookups
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import struct
+import sys
+from pathlib import Path
+
+from results_store import DEFAULT_DB
+
+DICTIONARY_DIR = Path(__file__).resolve().parent.parent / "dictionaries"
+COMPILED_DIR = DICTIONARY_DIR / "compiled"
+DEFAULT_DICTIONARY = DICTIONARY_DIR / "mfkeys.dic"
+
+# Entry width in bytes of the dictionaries this repo ships
+KNOWN_WIDTHS = {"mfkeys": 6, "mfu_passwords": 4}
+CANDIDATE_WIDTHS = (4, 6, 8, 16)
+
+# magic, format version, entry width, entry count
+HEADER = struct.Struct("<4sBBI")
+MAGIC = b"PM3D"
+VERSION = 1
+
+HEX_RE = re.compile(r"^[0-9A-F]+$")
+
+
+class DictionaryError(Exception):
+    """Raised for unreadable or corrupt compiled dictionaries"""
+
+
+def _entries(text):
+    """Uppercased, comment-free, non-empty lines with their line numbers"""
+    for number, line in enumerate(text.splitlines(), 1):
+        entry = line.split("#", 1)[0].strip().replace(" ", "").upper()
+        if entry:
+            yield number, entry
+
+
+def guess_width(path, text):
+    """Entry width of a dictionary: known name, else the most common valid width"""
+    if Path(path).stem in KNOWN_WIDTHS:
+        return KNOWN_WIDTHS[Path(path).stem]
+    lengths = {}
+    for _, entry in _entries(text):
+        if HEX_RE.match(entry) and len(entry) // 2 in CANDIDATE_WIDTHS and len(entry) % 2 == 0:
+            lengths[len(entry) // 2] = lengths.get(len(entry) // 2, 0) + 1
+    if not lengths:
+        raise DictionaryError(f"{path}: no valid hex entries")
+    return max(lengths, key=lengths.get)
+
+
+def hit_counts(width, db_path=None):
+    """Recorded hits per entry: learned Classic keys or stored Ultralight passwords"""
+    db_path = Path(db_path or DEFAULT_DB)
+    if not db_path.exists():
+        return {}
+    if width == 6:
+        query = "SELECT key, SUM(hits) FROM mf_keys GROUP BY key"
+    elif width == 4:
+        query = "SELECT password, COUNT(*) FROM cards WHERE password IS NOT NULL GROUP BY password"
+    else:
+        return {}
+    db = sqlite3.connect(db_path)
+    try:
+        return {entry.upper(): hits for entry, hits in db.execute(query)}
+    except sqlite3.OperationalError:
+        # Store exists but the table was never created
+        return {}
+    finally:
+        db.close()
+
+
+def hits_digest(hits):
+    """Digest of a hit table, a compiled dictionary is re-ranked when it changes"""
+    h = hashlib.blake2b(digest_size=16)
+    for entry, count in sorted(hits.items()):
+        h.update(f"{entry}:{count}\n".encode())
+    return h.hexdigest()
+
+
+def compile_dictionary(source, output_dir=COMPILED_DIR, width=None, hits=None):
+    """Compile one .dic file, returns a report dict"""
+    source = Path(source)
+    text = source.read_text(errors="replace")
+    width = width or guess_width(source, text)
+    hits = hit_counts(width) if hits is None else hits
+
+    entries = []
+    seen = set()
+    invalid = []
+    duplicates = []
+    for number, entry in _entries(text):
+        if len(entry) != width * 2 or not HEX_RE.match(entry):
+            invalid.append((number, entry))
+        elif entry in seen:
+            duplicates.append((number, entry))
+        else:
+            seen.add(entry)
+            entries.append(entry)
+
+    # Stable sort keeps the file order among entries with equal hits
+    ranked = sorted(entries, key=lambda entry: -hits.get(entry, 0))
+    packed = b"".join(bytes.fromhex(entry) for entry in ranked)
+    index = b"".join(sorted(bytes.fromhex(entry) for entry in ranked))
+    header = HEADER.pack(MAGIC, VERSION, width, len(ranked))
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / f"{source.stem}.dic").write_text("".join(f"{entry}\n" for entry in ranked))
+    (output_dir / f"{source.stem}.bin").write_bytes(header + packed)
+    (output_dir / f"{source.stem}.idx").write_bytes(header + index)
+    (output_dir / f"{source.stem}.hits").write_text(hits_digest(hits) + "\n")
+
+    return {
+        "source": str(source),
+        "width": width,
+        "entries": len(ranked),
+        "ranked": sum(1 for entry in ranked if hits.get(entry)),
+        "invalid": invalid,
+        "duplicates": duplicates,
+    }
+
+
+class CompiledDictionary:
+    """Packed dictionary in attack order with a sorted index for lookups"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.width, self._data = self._read(self.path)
+        self._index = None
+
+    @staticmethod
+    def _read(path):
+        data = path.read_bytes()
+        if len(data) < HEADER.size:
+            raise DictionaryError(f"{path}: truncated header")
+        magic, version, width, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise DictionaryError(f"{path}: not a compiled dictionary")
+        if len(data) != HEADER.size + width * count:
+            raise DictionaryError(f"{path}: size does not match {count} entries")
+        return width, memoryview(data)[HEADER.size:]
+
+    def __len__(self):
+        return len(self._data) // self.width
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        start = position * self.width
+        return self._data[start:start + self.width].hex().upper()
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __contains__(self, entry):
+        """Binary search in the sorted .idx form"""
+        try:
+            needle = bytes.fromhex(entry.replace(" ", ""))
+        except (AttributeError, ValueError):
+            return False
+        if len(needle) != self.width:
+            return False
+        if self._index is None:
+            _, self._index = self._read(self.path.with_suffix(".idx"))
+        low, high = 0, len(self._index) // self.width
+        while low < high:
+            middle = (low + high) // 2
+            start = middle * self.width
+            probe = self._index[start:start + self.width].tobytes()
+            if probe == needle:
+                return True
+            if probe < needle:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+    def keys(self, limit=None):
+        """Entries as hex strings in attack order"""
+        count = len(self) if limit is None else min(limit, len(self))
+        return [self[position] for position in range(count)]
+
+    @property
+    def text_path(self):
+        """Ranked .dic for the pm3 client (-f)"""
+        return self.path.with_suffix(".dic")
+
+
+def _ranked_with_current_hits(compiled):
+    """True when a compiled dictionary was ranked with the current hit table"""
+    try:
+        stored = compiled.with_suffix(".hits").read_text().strip()
+        width = HEADER.unpack_from(compiled.read_bytes(), 0)[2]
+    except (OSError, struct.error):
+        return False
+    return stored == hits_digest(hit_counts(width))
+
+
+def load(source=DEFAULT_DICTIONARY, output_dir=COMPILED_DIR, rebuild=False):
+    """Compiled form of a .dic file
+
+    (Re)compiled when missing, older than the source or ranked with a hit
+    table that has changed since, so newly learned hits move entries up.
+    """
+    source = Path(source)
+    compiled = Path(output_dir) / f"{source.stem}.bin"
+    stale = (
+        rebuild
+        or not compiled.exists()
+        or not compiled.with_suffix(".idx").exists()
+        or not compiled.with_suffix(".dic").exists()
+        or compiled.stat().st_mtime < source.stat().st_mtime
+        or not _ranked_with_current_hits(compiled)
+    )
+    if stale:
+        compile_dictionary(source, output_dir)
+    return CompiledDictionary(compiled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Dictionary Compiler - clean and rank .dic files')
+    parser.add_argument('files', nargs='*', help=f'Dictionaries to compile (default: {DICTIONARY_DIR}/*.dic)')
+    parser.add_argument('--output', '-o', default=COMPILED_DIR, help=f'Output directory (default: {COMPILED_DIR})')
+    parser.add_argument('--verbose', '-v', action='store_true', help='List every dropped entry')
+
+    args = parser.parse_args()
+
+    files = args.files or sorted(DICTIONARY_DIR.glob("*.dic"))
+    if not files:
+        print(f"No dictionaries in {DICTIONARY_DIR}")
+        sys.exit(1)
+
+    for path in files:
+        try:
+            report = compile_dictionary(path, args.output)
+        except (OSError, DictionaryError) as e:
+            print(f"❌ {path}: {e}")
+            continue
+        print(f"✅ {Path(path).name}: {report['entries']} entries ({report['width']} bytes), "
+              f"{report['ranked']} ranked by hits, {len(report['invalid'])} invalid, "
+              f"{len(report['duplicates'])} duplicates dropped")
+        if args.verbose:
+            for number, entry in report["invalid"]:
+                print(f"   line {number}: invalid {entry}")
+            for number, entry in report["duplicates"]:
+                print(f"   line {number}: duplicate {entry}")
+
+
+if __name__ == "__main__":
+    main()
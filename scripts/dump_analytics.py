@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+PM3 Dump Analytics - corpus statistics over a directory of card dumps
+Loads every dump into one NumPy block matrix per card family and computes
+per-block entropy, constant/changing regions, Classic access conditions,
+Ultralight config pages and counter/tearing statistics in vectorized passes
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: only this tool needs it
+    np = None
+
+import pm3_dump
+from pm3_dump import DumpError, find_dumps
+
+# Dumps per bincount pass, keeps the index array at a few tens of MB for 4K cards
+ENTROPY_CHUNK = 512
+
+# Ultralight EV1 / NTAG21x page counts that end in CFG0, CFG1, PWD, PACK
+CONFIG_PAGE_COUNTS = {20: "UL EV1 MF0UL11", 41: "UL EV1 MF0UL21", 45: "NTAG213", 135: "NTAG215", 231: "NTAG216"}
+# Counter value of a tearing flag that was not torn
+TEARING_OK = 0xBD
+
+ACCESS_SLOTS = ("block 0", "block 1", "block 2", "trailer")
+ACCESS_NAMES = {"FF0780": "transport"}
+
+
+class AnalyticsError(Exception):
+    """Raised when the corpus cannot be analysed"""
+
+
+def require_numpy():
+    if np is None:
+        raise AnalyticsError("NumPy is required for dump analytics (pip install numpy)")
+
+
+class Corpus:
+    """Dumps of one card family as an (n, blocks, block size) uint8 matrix
+
+    Shorter dumps are zero-padded; `present` marks the blocks each dump has.
+    """
+
+    def __init__(self, card_type, block_size, dumps):
+        require_numpy()
+        self.card_type = card_type
+        self.block_size = block_size
+        self.sources = [dump.source for dump in dumps]
+        self.meta = [dump.meta for dump in dumps]
+        self.lengths = np.array([len(dump) for dump in dumps], dtype=np.int64)
+        width = int(self.lengths.max()) if dumps else 0
+
+        self.blocks = np.zeros((len(dumps), width, block_size), dtype=np.uint8)
+        flat = self.blocks.reshape(len(dumps), -1)
+        for row, dump in enumerate(dumps):
+            image = np.frombuffer(dump.view, dtype=np.uint8)
+            flat[row, :image.size] = image
+        self.present = np.arange(width) < self.lengths[:, None]
+
+    def __len__(self):
+        return len(self.sources)
+
+    @property
+    def width(self):
+        return self.blocks.shape[1]
+
+    # --- layout -----------------------------------------------------------
+
+    def byte_histogram(self):
+        """(blocks * block size, 256) counts of each byte value per position"""
+        columns = self.width * self.block_size
+        counts = np.zeros(columns * 256, dtype=np.int64)
+        offsets = np.arange(columns, dtype=np.int64) * 256
+        flat = self.blocks.reshape(len(self), columns)
+        mask = np.repeat(self.present, self.block_size, axis=1)
+        for start in range(0, len(self), ENTROPY_CHUNK):
+            chunk = flat[start:start + ENTROPY_CHUNK].astype(np.int64) + offsets
+            counts += np.bincount(chunk[mask[start:start + ENTROPY_CHUNK]], minlength=columns * 256)
+        return counts.reshape(columns, 256)
+
+    def block_stats(self):
+        """Per block: dumps that have it, entropy (bits/byte) and varying byte positions"""
+        counts = self.byte_histogram()
+        totals = counts.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = counts / np.maximum(totals, 1)[:, None]
+            entropy = -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=1)
+        varying = (counts.max(axis=1) < totals).reshape(self.width, self.block_size)
+        return {
+            "dumps": self.present.sum(axis=0),
+            "entropy": entropy.reshape(self.width, self.block_size).mean(axis=1),
+            "varying_bytes": varying.sum(axis=1),
+        }
+
+    def regions(self, stats=None):
+        """Runs of constant / changing blocks as (first, last, state)"""
+        stats = stats or self.block_stats()
+        changing = stats["varying_bytes"] > 0
+        if not changing.size:
+            return []
+        edges = np.flatnonzero(np.diff(changing.astype(np.int8))) + 1
+        starts = np.concatenate(([0], edges))
+        ends = np.concatenate((edges, [changing.size])) - 1
+        return [(int(first), int(last), "changing" if changing[first] else "constant")
+                for first, last in zip(starts, ends)]
+
+    # --- MIFARE Classic ---------------------------------------------------
+
+    def access_conditions(self):
+        """Distribution of decoded access bits over every sector trailer"""
+        sectors = pm3_dump.sector_of(self.width - 1) + 1
+        trailers = np.array([pm3_dump.trailer_block(sector) for sector in range(sectors)])
+        trailers = trailers[trailers < self.width]
+        raw = self.blocks[:, trailers, 6:9].astype(np.int32)
+        b6, b7, b8 = raw[..., 0], raw[..., 1], raw[..., 2]
+        c1, c2, c3 = b7 >> 4, b8 & 0xF, b8 >> 4
+        # The low/high nibbles repeat C1..C3 inverted
+        valid = (((b6 & 0xF) ^ c1) == 0xF) & (((b6 >> 4) ^ c2) == 0xF) & (((b7 & 0xF) ^ c3) == 0xF)
+        present = self.present[:, trailers]
+        used = present & valid
+
+        slots = np.zeros((len(ACCESS_SLOTS), 8), dtype=np.int64)
+        for slot in range(len(ACCESS_SLOTS)):
+            code = (((c1 >> slot) & 1) << 2) | (((c2 >> slot) & 1) << 1) | ((c3 >> slot) & 1)
+            slots[slot] = np.bincount(code[used], minlength=8)
+
+        packed = (b6 << 16) | (b7 << 8) | b8
+        values, counts = np.unique(packed[present], return_counts=True)
+        order = np.argsort(counts)[::-1]
+        return {
+            "trailers": int(present.sum()),
+            "invalid": int((present & ~valid).sum()),
+            "slots": slots,
+            "patterns": [(f"{int(values[i]):06X}", int(counts[i])) for i in order],
+        }
+
+    def default_keys(self, key="FFFFFFFFFFFF"):
+        """Trailers whose key A / key B is the given key"""
+        sectors = pm3_dump.sector_of(self.width - 1) + 1
+        trailers = np.array([pm3_dump.trailer_block(sector) for sector in range(sectors)])
+        trailers = trailers[trailers < self.width]
+        present = self.present[:, trailers]
+        target = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        key_a = (self.blocks[:, trailers, 0:6] == target).all(axis=2) & present
+        key_b = (self.blocks[:, trailers, 10:16] == target).all(axis=2) & present
+        return int(key_a.sum()), int(key_b.sum())
+
+    # --- Ultralight / NTAG ------------------------------------------------
+
+    def ultralight_config(self):
+        """AUTH0, PROT, CFGLCK, AUTHLIM and PWD/PACK presence from the config pages"""
+        rows = np.flatnonzero(np.isin(self.lengths, list(CONFIG_PAGE_COUNTS)))
+        pages = self.lengths[rows]
+        cfg0 = self.blocks[rows, pages - 4]
+        access = self.blocks[rows, pages - 3, 0]
+        pwd = self.blocks[rows, pages - 2]
+        pack = self.blocks[rows, pages - 1, 0:2]
+
+        auth0 = cfg0[:, 3].astype(np.int64)
+        models, model_counts = np.unique(pages, return_counts=True)
+        values, counts = np.unique(auth0, return_counts=True)
+        return {
+            "dumps": int(rows.size),
+            "models": [(CONFIG_PAGE_COUNTS[int(m)], int(c)) for m, c in zip(models, model_counts)],
+            "auth0_active": int((auth0 < pages).sum()),
+            "prot": int(((access >> 7) & 1).sum()),
+            "cfglck": int(((access >> 6) & 1).sum()),
+            "authlim": int(((access & 0x7) > 0).sum()),
+            "pwd": int(pwd.any(axis=1).sum()),
+            "pack": int(pack.any(axis=1).sum()),
+            "auth0": [(f"{int(v):02X}", int(c)) for v, c in zip(values, counts)],
+        }
+
+    def counters(self):
+        """Per NFC counter: dumps reporting it, non-zero, min/median/max, torn"""
+        counter = np.full((len(self), 3), -1, dtype=np.int64)
+        tearing = np.full((len(self), 3), -1, dtype=np.int64)
+        for row, meta in enumerate(self.meta):
+            for i in range(3):
+                try:
+                    counter[row, i] = int.from_bytes(bytes.fromhex(meta[f"Counter{i}"]), "little")
+                    tearing[row, i] = int(meta[f"Tearing{i}"], 16)
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+        result = []
+        for i in range(3):
+            known = counter[:, i] >= 0
+            values = counter[known, i]
+            result.append({
+                "counter": i,
+                "dumps": int(known.sum()),
+                "nonzero": int((values > 0).sum()),
+                "min": int(values.min()) if values.size else None,
+                "median": float(np.median(values)) if values.size else None,
+                "max": int(values.max()) if values.size else None,
+                "torn": int(((tearing[:, i] >= 0) & (tearing[:, i] != TEARING_OK)).sum()),
+            })
+        return result
+
+
+def load_corpus(paths, on_error=None):
+    """Group loadable dumps by (card type, block size) into Corpus objects"""
+    require_numpy()
+    groups = {}
+    skipped = 0
+    for path in paths:
+        try:
+            dump = pm3_dump.load(path, use_mmap=True)
+        except (OSError, DumpError) as e:
+            skipped += 1
+            if on_error:
+                on_error(path, e)
+            continue
+        if not len(dump):
+            dump.close()
+            skipped += 1
+            continue
+        groups.setdefault((dump.card_type, dump.block_size), []).append(dump)
+
+    corpora = []
+    for (card_type, block_size), dumps in sorted(groups.items()):
+        corpora.append(Corpus(card_type, block_size, dumps))
+        for dump in dumps:
+            dump.close()
+    return corpora, skipped
+
+
+def analyse(corpus):
+    """Every statistic that applies to the corpus' card family, as plain data"""
+    stats = corpus.block_stats()
+    subtypes = Counter(pm3_dump.CLASSIC_SIZES.get(int(length) * corpus.block_size, "?")
+                       for length in corpus.lengths) if corpus.card_type == "mifare_classic" else None
+    result = {
+        "card_type": corpus.card_type,
+        "block_size": corpus.block_size,
+        "dumps": len(corpus),
+        "blocks": [
+            {"block": block, "dumps": int(stats["dumps"][block]),
+             "entropy": round(float(stats["entropy"][block]), 3),
+             "varying_bytes": int(stats["varying_bytes"][block])}
+            for block in range(corpus.width)
+        ],
+        "regions": corpus.regions(stats),
+    }
+    if corpus.card_type == "mifare_classic":
+        access = corpus.access_conditions()
+        access["slots"] = {name: access["slots"][slot].tolist() for slot, name in enumerate(ACCESS_SLOTS)}
+        key_a, key_b = corpus.default_keys()
+        result.update(subtypes=dict(subtypes), access=access, default_key_a=key_a, default_key_b=key_b)
+    else:
+        result.update(config=corpus.ultralight_config(), counters=corpus.counters())
+        result["versions"] = dict(Counter(meta.get("Version") for meta in corpus.meta if meta.get("Version")))
+    return result
+
+
+def print_report(result, show_blocks=False):
+    print(f"\n=== {result['card_type']} ({result['block_size']}-byte blocks): {result['dumps']} dump(s) ===")
+    if result.get("subtypes"):
+        print("Sizes: " + ", ".join(f"{name} {count}" for name, count in sorted(result["subtypes"].items())))
+
+    print("\nRegions:")
+    for first, last, state in result["regions"]:
+        span = f"{first}" if first == last else f"{first}-{last}"
+        print(f"  {span:<9} {state}")
+
+    if show_blocks:
+        print(f"\n{'Block':>5}  {'Dumps':>6}  {'Entropy':>7}  {'Varying':>7}")
+        for block in result["blocks"]:
+            print(f"{block['block']:>5}  {block['dumps']:>6}  {block['entropy']:>7.3f}  "
+                  f"{block['varying_bytes']:>4}/{result['block_size']:<2}")
+    else:
+        ranked = sorted(result["blocks"], key=lambda block: block["entropy"], reverse=True)[:10]
+        print("\nHighest entropy blocks (bits/byte):")
+        for block in ranked:
+            print(f"  {block['block']:>5}  {block['entropy']:.3f}")
+
+    if "access" in result:
+        access = result["access"]
+        print(f"\nAccess conditions: {access['trailers']} trailer(s), {access['invalid']} with invalid bits")
+        print(f"  {'C1C2C3':<8}" + "".join(f"{code:03b}".rjust(8) for code in range(8)))
+        for name, counts in access["slots"].items():
+            print(f"  {name:<8}" + "".join(f"{count:>8}" for count in counts))
+        print("  Most common access bytes:")
+        for pattern, count in access["patterns"][:5]:
+            label = ACCESS_NAMES.get(pattern, "")
+            print(f"    {pattern}  {count:>7}  {label}")
+        print(f"Default key FFFFFFFFFFFF: key A in {result['default_key_a']}, key B in {result['default_key_b']} trailer(s)")
+
+    if "config" in result:
+        config = result["config"]
+        print(f"\nConfig pages: {config['dumps']} dump(s) with CFG0/CFG1/PWD/PACK")
+        if config["dumps"]:
+            print("  Models: " + ", ".join(f"{name} {count}" for name, count in config["models"]))
+            print(f"  AUTH0 active {config['auth0_active']}, PROT {config['prot']}, CFGLCK {config['cfglck']}, "
+                  f"AUTHLIM set {config['authlim']}")
+            print(f"  PWD present {config['pwd']}, PACK present {config['pack']}")
+            print("  AUTH0: " + ", ".join(f"{value} x{count}" for value, count in config["auth0"]))
+        print(f"\n{'Counter':>7}  {'Dumps':>6}  {'Non-0':>6}  {'Min':>8}  {'Median':>9}  {'Max':>8}  {'Torn':>5}")
+        for counter in result["counters"]:
+            if not counter["dumps"]:
+                print(f"{counter['counter']:>7}  {0:>6}")
+                continue
+            print(f"{counter['counter']:>7}  {counter['dumps']:>6}  {counter['nonzero']:>6}  {counter['min']:>8}  "
+                  f"{counter['median']:>9.1f}  {counter['max']:>8}  {counter['torn']:>5}")
+        if result.get("versions"):
+            print("\nVersions: " + ", ".join(f"{version} x{count}" for version, count in result["versions"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Dump Analytics - statistics over a dump corpus')
+    parser.add_argument('path', nargs='+', help='Dump files or directories (searched recursively)')
+    parser.add_argument('--blocks', action='store_true', help='Print the full per-block table')
+    parser.add_argument('--json', metavar='OUTPUT', help='Also save the results as JSON')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Report files that could not be loaded')
+
+    args = parser.parse_args()
+
+    def on_error(path, error):
+        if args.verbose:
+            print(f"⚠️  {error}")
+
+    try:
+        paths = [dump for root in args.path for dump in find_dumps(root)]
+        corpora, skipped = load_corpus(paths, on_error)
+    except AnalyticsError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if not corpora:
+        print(f"❌ No dumps found ({skipped} file(s) skipped)")
+        sys.exit(1)
+
+    print(f"📊 {sum(len(corpus) for corpus in corpora)} dump(s) loaded, {skipped} file(s) skipped")
+    results = [analyse(corpus) for corpus in corpora]
+    for result in results:
+        print_report(result, args.blocks)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nSaved {args.json}")
+
+
+if __name__ == "__main__":
+    main()
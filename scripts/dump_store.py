@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+PM3 Dump Store - content-addressed dump archive with block-level dedupe
+Every distinct block is stored once, keyed by its hash; a dump is a manifest
+of block ids plus its card metadata and can be rebuilt in any format on
+demand. Two dumps are equal exactly when their digests are.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import tempfile
+import zlib
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+import pm3_dump
+from pm3_dump import DumpError, find_dumps
+from results_store import DEFAULT_DB, connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dump_blocks (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dumps (
+    digest TEXT PRIMARY KEY,
+    uid TEXT,
+    card_type TEXT,
+    subtype TEXT,
+    block_size INTEGER NOT NULL,
+    blocks INTEGER NOT NULL,
+    meta TEXT,
+    manifest BLOB NOT NULL,
+    created TEXT
+);
+CREATE INDEX IF NOT EXISTS dumps_uid ON dumps (uid);
+CREATE TABLE IF NOT EXISTS dump_sources (
+    digest TEXT NOT NULL,
+    source TEXT NOT NULL,
+    session_dir TEXT,
+    added TEXT,
+    PRIMARY KEY (digest, source)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+# Session files kept as whole compressed blobs (command logs, key files)
+BLOB_PATTERNS = ("*.log", "*-key.bin")
+# Written into an ingested directory, maps each removed file to its digest
+MANIFEST_NAME = "dump_store.json"
+# Host parameters per IN (...) query, below SQLite's oldest limit of 999
+QUERY_CHUNK = 500
+# Card fields outside the image that tell two cards apart (the MFU .bin header)
+IDENTITY_FIELDS = ("Version", "TBO_0", "TBO_1", "Signature",
+                   "Counter0", "Tearing0", "Counter1", "Tearing1", "Counter2", "Tearing2")
+
+
+def identity_meta(meta):
+    """Identifying card fields as uppercase hex; unset and all-zero fields are
+    left out, the .bin header stores zeros for fields a dump does not have"""
+    canonical = {}
+    for field in IDENTITY_FIELDS:
+        value = re.sub(r"\s", "", str((meta or {}).get(field) or "")).upper()
+        if value.strip("0"):
+            canonical[field] = value
+    return canonical
+
+
+def digest_of(dump):
+    """Content digest of a dump: image plus identifying card fields
+
+    Equal digests mean equal dumps; a clone with the same memory but another
+    GET_VERSION, signature or counters is a different dump.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{dump.card_type}:{dump.block_size}:".encode())
+    h.update(json.dumps(identity_meta(dump.meta), sort_keys=True).encode())
+    h.update(dump.view)
+    return h.hexdigest()
+
+
+def block_hash(block):
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+def _pack_ids(ids):
+    packed = array("I", ids)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_ids(data):
+    ids = array("I")
+    ids.frombytes(data)
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+
+def _chunks(items, size=QUERY_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DumpStore:
+    """Deduplicated dumps and session blobs in the shared SQLite database"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB)
+        self.db = connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # --- dumps --------------------------------------------------------------
+
+    def has(self, digest):
+        return self.db.execute("SELECT 1 FROM dumps WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def put(self, dump, source=None, session_dir=None):
+        """Store a dump (only its new blocks) and return its digest"""
+        digest = digest_of(dump)
+        if not self.has(digest):
+            blocks = [bytes(block) for block in dump]
+            hashes = [block_hash(block) for block in blocks]
+            unique = dict(zip(hashes, blocks))
+            self.db.executemany("INSERT OR IGNORE INTO dump_blocks (hash, data) VALUES (?, ?)", unique.items())
+            ids = {}
+            for chunk in _chunks(unique):
+                rows = self.db.execute(
+                    f"SELECT id, hash FROM dump_blocks WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+                )
+                ids.update((row["hash"], row["id"]) for row in rows)
+            self.db.execute(
+                """
+                INSERT INTO dumps (digest, uid, card_type, subtype, block_size, blocks, meta, manifest, created)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (digest, dump.uid, dump.card_type, dump.subtype, dump.block_size, len(dump),
+                 json.dumps(dump.meta), _pack_ids(ids[h] for h in hashes), datetime.now().isoformat())
+            )
+        if source:
+            self.db.execute(
+                "INSERT OR IGNORE INTO dump_sources (digest, source, session_dir, added) VALUES (?, ?, ?, ?)",
+                (digest, str(source), str(session_dir) if session_dir else None, datetime.now().isoformat())
+            )
+        self.db.commit()
+        return digest
+
+    def put_file(self, path, session_dir=None):
+        """Store a dump file; returns its digest"""
+        with pm3_dump.load(path) as dump:
+            return self.put(dump, source=Path(path).resolve(), session_dir=session_dir)
+
+    def get(self, digest):
+        """Rebuild a stored dump, raises KeyError if it is not in the store"""
+        row = self.db.execute("SELECT * FROM dumps WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        ids = _unpack_ids(row["manifest"])
+        data = {}
+        for chunk in _chunks(set(ids)):
+            rows = self.db.execute(
+                f"SELECT id, data FROM dump_blocks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            data.update((block["id"], block["data"]) for block in rows)
+        image = bytearray(b"".join(data[block_id] for block_id in ids))
+        return pm3_dump.Dump(image, row["block_size"], row["card_type"], row["subtype"],
+                             json.loads(row["meta"] or "{}"), source=f"store:{digest}")
+
+    def export(self, digest, path):
+        """Write a stored dump to path in the format of its extension"""
+        return self.get(digest).save(path)
+
+    def find(self, uid=None):
+        """Stored dumps (optionally of one UID), newest first, with their source files"""
+        query = "SELECT digest, uid, card_type, subtype, block_size, blocks, created FROM dumps"
+        params = ()
+        if uid:
+            query += " WHERE uid = ?"
+            params = (uid.upper(),)
+        dumps = [dict(row) for row in self.db.execute(query + " ORDER BY created DESC", params)]
+        for dump in dumps:
+            dump["sources"] = [row["source"] for row in self.db.execute(
+                "SELECT source FROM dump_sources WHERE digest = ? ORDER BY added", (dump["digest"],)
+            )]
+        return dumps
+
+    # --- blobs --------------------------------------------------------------
+
+    def put_blob(self, data):
+        """Store whole-file content (logs, key files) compressed, return its hash"""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        self.db.execute("INSERT OR IGNORE INTO blobs (hash, size, data) VALUES (?, ?, ?)",
+                        (digest, len(data), zlib.compress(data, 6)))
+        self.db.commit()
+        return digest
+
+    def get_blob(self, digest):
+        row = self.db.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return zlib.decompress(row["data"])
+
+    def stats(self):
+        """Dump and block counts with logical vs stored size in bytes"""
+        dumps = self.db.execute(
+            "SELECT COUNT(*) AS dumps, COALESCE(SUM(blocks), 0) AS blocks, "
+            "COALESCE(SUM(blocks * block_size), 0) AS logical FROM dumps"
+        ).fetchone()
+        blocks = self.db.execute(
+            "SELECT COUNT(*) AS blocks, COALESCE(SUM(LENGTH(data) + LENGTH(hash)), 0) AS stored FROM dump_blocks"
+        ).fetchone()
+        blobs = self.db.execute(
+            "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS logical, "
+            "COALESCE(SUM(LENGTH(data)), 0) AS stored FROM blobs"
+        ).fetchone()
+        sources = self.db.execute("SELECT COUNT(*) FROM dump_sources").fetchone()[0]
+        return {
+            "dumps": dumps["dumps"],
+            "sources": sources,
+            "block_refs": dumps["blocks"],
+            "unique_blocks": blocks["blocks"],
+            "dump_bytes": dumps["logical"],
+            # Unique blocks plus four bytes per manifest entry
+            "dump_stored_bytes": blocks["stored"] + 4 * dumps["blocks"],
+            "blobs": blobs["blobs"],
+            "blob_bytes": blobs["logical"],
+            "blob_stored_bytes": blobs["stored"],
+        }
+
+
+def dump_copies(path):
+    """The .json/.bin/.eml files the client saved for the same dump"""
+    copies = (Path(path).with_suffix(suffix) for suffix in pm3_dump.DUMP_SUFFIXES)
+    return [copy for copy in copies if copy.is_file()]
+
+
+def rendered(store, digest, suffix):
+    """Bytes of a stored dump as export() writes it in one format"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / f"dump{suffix}"
+        store.export(digest, path)
+        return path.read_bytes()
+
+
+def ingest(store, directory, remove=False):
+    """Store every dump and log under directory; with remove, replace them by a manifest
+
+    A dump copy the store cannot rebuild byte for byte (client JSON fields
+    it does not model, .bin headers) also keeps its original bytes as a
+    blob. Files are only removed once restore would give back the same
+    bytes. Returns {relative path: entry}.
+    """
+    directory = Path(directory)
+    manifest_path = directory / MANIFEST_NAME
+    entries = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    added = {}
+
+    for path in find_dumps(directory):
+        try:
+            digest = store.put_file(path, session_dir=directory.resolve())
+        except (OSError, DumpError):
+            continue
+        for copy in dump_copies(path):
+            entry = {"dump": digest, "format": copy.suffix.lower()}
+            data = copy.read_bytes()
+            if rendered(store, digest, entry["format"]) != data:
+                entry["blob"] = store.put_blob(data)
+            added[copy] = entry
+
+    for pattern in BLOB_PATTERNS:
+        for path in directory.rglob(pattern):
+            if path not in added and path.is_file():
+                added[path] = {"blob": store.put_blob(path.read_bytes())}
+
+    for path, entry in added.items():
+        entries[str(path.relative_to(directory))] = entry
+    if remove:
+        for path, entry in added.items():
+            if _verify(store, path, entry):
+                path.unlink()
+    if entries:
+        manifest_path.write_text(json.dumps(entries, indent=2, sort_keys=True))
+    return {str(path.relative_to(directory)): entry for path, entry in added.items()}
+
+
+def _verify(store, path, entry):
+    """True when restore() writes back exactly the bytes of path"""
+    try:
+        original = path.read_bytes()
+        if "blob" in entry:
+            return store.get_blob(entry["blob"]) == original
+        return rendered(store, entry["dump"], entry["format"]) == original
+    except (OSError, KeyError, DumpError):
+        return False
+
+
+def restore(store, directory):
+    """Write back every file of an ingested directory that is missing on disk"""
+    directory = Path(directory)
+    manifest_path = directory / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"{manifest_path} not found")
+    restored = []
+    for name, entry in json.loads(manifest_path.read_text()).items():
+        path = directory / name
+        if path.exists():
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if "blob" in entry:
+            path.write_bytes(store.get_blob(entry["blob"]))
+        else:
+            store.export(entry["dump"], path)
+        restored.append(name)
+    return restored
+
+
+def _size(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Dump Store - deduplicated dump archive')
+    parser.add_argument('--db', default=None, help=f'Database path (default: {DEFAULT_DB})')
+    parser.add_argument('--ingest', nargs='+', metavar='DIR', help='Store all dumps and logs under these directories')
+    parser.add_argument('--remove', action='store_true', help='With --ingest: delete stored files, keep a manifest')
+    parser.add_argument('--restore', nargs='+', metavar='DIR', help='Rebuild the files of ingested directories')
+    parser.add_argument('--export', nargs=2, metavar=('DIGEST', 'OUTPUT'), help='Write a stored dump (.json/.bin/.eml)')
+    parser.add_argument('--digest', nargs='+', metavar='FILE', help='Print dump digests and whether they are stored')
+    parser.add_argument('--list', nargs='?', const='', metavar='UID', help='List stored dumps (of one UID)')
+
+    args = parser.parse_args()
+
+    store = DumpStore(args.db)
+    try:
+        if args.ingest:
+            for directory in args.ingest:
+                entries = ingest(store, directory, remove=args.remove)
+                dumps = len({entry["dump"] for entry in entries.values() if "dump" in entry})
+                blobs = sum(1 for entry in entries.values() if "dump" not in entry)
+                print(f"📦 {directory}: {dumps} dump(s), {blobs} log/key file(s)"
+                      + (" stored and removed" if args.remove else " stored"))
+        elif args.restore:
+            for directory in args.restore:
+                restored = restore(store, directory)
+                print(f"♻️  {directory}: {len(restored)} file(s) restored")
+        elif args.export:
+            digest, output = args.export
+            matches = [row[0] for row in store.db.execute(
+                "SELECT digest FROM dumps WHERE digest LIKE ?", (digest.lower() + "%",))]
+            if len(matches) != 1:
+                print(f"❌ {len(matches)} stored dumps match {digest}")
+                sys.exit(1)
+            store.export(matches[0], output)
+            print(f"Saved {output}")
+        elif args.digest:
+            for path in args.digest:
+                with pm3_dump.load(path) as dump:
+                    digest = digest_of(dump)
+                print(f"{digest}  {'stored' if store.has(digest) else 'new   '}  {path}")
+        elif args.list is not None:
+            for dump in store.find(args.list or None):
+                print(f"{dump['digest'][:16]}  {dump['uid'] or '-':<16} {dump['card_type']:<18} "
+                      f"{dump['blocks']:>4} x {dump['block_size']:<2} {dump['created'][:19]}  "
+                      f"{len(dump['sources'])} source(s)")
+        else:
+            stats = store.stats()
+            ratio = stats["dump_bytes"] / max(stats["dump_stored_bytes"], 1)
+            print(f"Dumps: {stats['dumps']} ({stats['sources']} source file(s)), "
+                  f"{stats['unique_blocks']} unique of {stats['block_refs']} blocks")
+            print(f"  {_size(stats['dump_bytes'])} of images in {_size(stats['dump_stored_bytes'])} ({ratio:.1f}x)")
+            print(f"Blobs: {stats['blobs']}, {_size(stats['blob_bytes'])} in {_size(stats['blob_stored_bytes'])}")
+    except (OSError, DumpError, KeyError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+PM3 Fingerprint Index - card type and magic lookup from one hf 14a info
+Maps ATQA/SAK, ATS, GET_VERSION bytes and signature presence to card type,
+subtype and the magic probes that can still change the answer; seeded from
+magic_cards_db.md and the sample dumps in carddata/
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+from pm3_cache import is_write
+from results_store import DATA_DIR
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+MAGIC_DB = REPO_DIR / "magic_cards_db.md"
+CARDDATA_DIR = REPO_DIR / "carddata"
+INDEX_PATH = DATA_DIR / "fingerprints.json"
+
+INDEX_VERSION = 1
+
+# (ATQA, SAK, card type, subtype) per NXP AN10833; subtype None = ask the output
+BASE_FINGERPRINTS = [
+    ("0004", "08", "mifare_classic", "1k"),
+    ("0044", "08", "mifare_classic", "1k"),
+    ("0004", "88", "mifare_classic", "1k"),
+    ("0004", "28", "mifare_classic", "1k"),
+    ("0002", "18", "mifare_classic", "4k"),
+    ("0042", "18", "mifare_classic", "4k"),
+    ("0002", "38", "mifare_classic", "4k"),
+    ("0004", "09", "mifare_classic", "mini"),
+    ("0044", "00", "mifare_ultralight", None),
+    ("0344", "20", "desfire", None),
+]
+
+# GET_VERSION response -> Ultralight/NTAG subtype
+VERSION_SUBTYPES = {
+    "0004030101000B03": "ev1",
+    "0004030101000E03": "ev1",
+    "0004040201000F03": "ntag213",
+    "0004040201001103": "ntag215",
+    "0004040201001303": "ntag216",
+}
+
+FILE_TYPES = {"mfc": "mifare_classic", "mfu": "mifare_ultralight", "mfdes": "desfire"}
+
+# Probe name, command, detection regex, capabilities - in the order they are evaluated.
+# gen2 is read from hf 14a info, the write test in magic_cards_db.md is never sent.
+DEFAULT_PROBES = [
+    ("gen1a", "hf mf cgetblk 0", r"block data", ["uid_change", "block0_write", "chinese_magic"]),
+    ("gen2", "hf 14a info", r"magic capabilities.*gen 2", ["uid_change", "block0_write", "direct_write"]),
+    ("gen3", "hf 14a raw -a -p -c 90F0CCCC10", r"9000", ["uid_change", "block0_write", "apdu_magic"]),
+    ("ufuid", "hf 14a raw -a -p -c 4000", r"0A00", ["uid_change"]),
+]
+
+# Magic generations whose probes mean anything per card type; missing type = all
+TYPE_PROBES = {
+    "mifare_classic": None,
+    "mifare_ultralight": ["gen4"],
+    "desfire": [],
+}
+
+# "Magic capabilities : Gen 2 / CUID" -> gen2
+MAGIC_NAMES = [
+    ("gen 1", "gen1a"), ("gen 2", "gen2"), ("cuid", "gen2"), ("gen 3", "gen3"),
+    ("gen 4", "gen4"), ("gtu", "gen4"), ("ufuid", "ufuid"), ("ntag", "magic_ntag"),
+]
+
+ATQA_RE = re.compile(r"ATQA\s*:\s*(?P<value>[0-9A-F]{2}\s?[0-9A-F]{2})", re.IGNORECASE)
+SAK_RE = re.compile(r"SAK\s*:\s*(?P<value>[0-9A-F]{2})", re.IGNORECASE)
+ATS_RE = re.compile(r"\bATS\s*:\s*(?P<value>[0-9A-F]{2}(?: ?[0-9A-F]{2})*)", re.IGNORECASE)
+VERSION_RE = re.compile(r"(?:GET_VERSION|Raw bytes|Version)\s*\.*:?\s*(?P<value>(?:[0-9A-F]{2} ?){8})", re.IGNORECASE)
+SIGNATURE_RE = re.compile(r"signature\W+(?:[0-9A-F]{2} ?){16}", re.IGNORECASE)
+MAGIC_RE = re.compile(r"magic capabilities\W*(?P<value>[^\n]+)", re.IGNORECASE)
+
+# "# Test 3: Gen3 APDU", then pm3 -c "<command>" and grep -q "<pattern>"
+DOC_TEST_RE = re.compile(
+    r"# Test \d+: (?P<name>\w+).*?pm3 -c \"(?P<command>[^\"]+)\".*?grep -q (?:-v )?\"(?P<pattern>[^\"]+)\"",
+    re.DOTALL
+)
+# | Gen1A | ✅ | ✅ | High | Chinese Magic |
+DOC_TABLE_RE = re.compile(r"^\|\s*(?P<name>[\w ]+?)\s*\|\s*(?P<uid>\S+)\s*\|\s*(?P<block0>\S+)\s*\|[^|]*\|\s*(?P<commands>[^|]+?)\s*\|$",
+                          re.MULTILINE)
+
+
+def _hex(value):
+    return re.sub(r"\s", "", value).upper() if value else None
+
+
+def magic_name(text):
+    """Magic generation named in a client line, or None"""
+    text = (text or "").lower()
+    for needle, name in MAGIC_NAMES:
+        if needle in text:
+            return name
+    return None
+
+
+def fingerprint_of(output):
+    """ATQA, SAK, ATS, GET_VERSION, signature presence and client-reported magic of one output"""
+    output = output or ""
+    fingerprint = {}
+    for field, pattern in (("atqa", ATQA_RE), ("sak", SAK_RE), ("ats", ATS_RE), ("version", VERSION_RE)):
+        match = pattern.search(output)
+        fingerprint[field] = _hex(match.group("value")) if match else None
+    fingerprint["signature"] = bool(SIGNATURE_RE.search(output))
+    match = MAGIC_RE.search(output)
+    fingerprint["magic"] = magic_name(match.group("value")) if match else None
+    return fingerprint
+
+
+def _slug(text):
+    return re.sub(r"\W+", "_", text.strip().lower()).strip("_")
+
+
+def default_probes():
+    return [{"name": name, "command": command, "pattern": pattern, "capabilities": capabilities}
+            for name, command, pattern, capabilities in DEFAULT_PROBES]
+
+
+def load_magic_probes(path=MAGIC_DB):
+    """Probe list from the detection script and type table in magic_cards_db.md
+
+    Probes the repo already defines keep their command and capabilities;
+    new ones come in document order. Write commands are dropped.
+    """
+    probes = default_probes()
+    try:
+        text = Path(path).read_text(errors="replace")
+    except OSError:
+        return probes
+
+    capabilities = {}
+    for row in DOC_TABLE_RE.finditer(text):
+        if "✅" not in row.group("uid"):
+            continue
+        caps = ["uid_change"]
+        if "✅" in row.group("block0"):
+            caps.append("block0_write")
+        caps.append(_slug(row.group("commands")))
+        capabilities[_slug(row.group("name"))] = caps
+
+    known = {probe["name"] for probe in probes}
+    for test in DOC_TEST_RE.finditer(text):
+        name = _slug(test.group("name"))
+        if name in known or is_write(test.group("command")):
+            continue
+        known.add(name)
+        probes.append({
+            "name": name,
+            "command": test.group("command"),
+            "pattern": test.group("pattern").replace("\\|", "|"),
+            "capabilities": capabilities.get(name, ["uid_change"])
+        })
+    # Generations only reported by the client, e.g. magic NTAG
+    for name, caps in capabilities.items():
+        if name not in known:
+            probes.append({"name": name, "command": None, "pattern": None, "capabilities": caps})
+    return probes
+
+
+def load_carddata(directory=CARDDATA_DIR):
+    """Fingerprint entries from the client JSON dumps in carddata/"""
+    entries = {}
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            dump = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        card = dump.get("Card") or {}
+        card_type = FILE_TYPES.get(str(dump.get("FileType", "")).lower())
+        if not card_type:
+            continue
+        version = _hex(card.get("Version"))
+        if version:
+            signature = bool(_hex(card.get("Signature")).strip("0")) if card.get("Signature") else False
+            entries[f"version:{version}"] = {
+                "card_type": card_type,
+                "subtype": VERSION_SUBTYPES.get(version),
+                "signature": signature,
+                "source": path.name,
+            }
+        if card.get("ATQA") and card.get("SAK"):
+            atqa, sak = _hex(card["ATQA"]), _hex(card["SAK"])[:2]
+            entries.setdefault(f"{atqa}:{sak}", {"card_type": card_type, "subtype": None, "source": path.name})
+    return entries
+
+
+class FingerprintIndex:
+    """Precomputed fingerprint -> card type lookup with the magic probe plan"""
+
+    def __init__(self, entries=None, probes=None, magic_counts=None):
+        self.entries = entries or {}
+        self.probes = probes if probes is not None else default_probes()
+        self.probe_names = [probe["name"] for probe in self.probes]
+        # {"atqa:sak": {magic type: cards}} from the results store
+        self.magic_counts = magic_counts or {}
+
+    @classmethod
+    def build(cls, magic_db=MAGIC_DB, carddata=CARDDATA_DIR):
+        entries = {
+            f"{atqa}:{sak}": {"card_type": card_type, "subtype": subtype, "source": "AN10833"}
+            for atqa, sak, card_type, subtype in BASE_FINGERPRINTS
+        }
+        for version, subtype in VERSION_SUBTYPES.items():
+            entries[f"version:{version}"] = {"card_type": "mifare_ultralight", "subtype": subtype,
+                                            "source": "GET_VERSION"}
+        entries.update(load_carddata(carddata))
+        return cls(entries, load_magic_probes(magic_db))
+
+    def save(self, path=INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"version": INDEX_VERSION, "entries": self.entries, "probes": self.probes},
+                                   indent=2))
+        return path
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, rebuild=False, store=None):
+        """Saved index, rebuilt when missing or older than its sources; store adds magic statistics"""
+        path = Path(path)
+        sources = [MAGIC_DB, Path(__file__), *CARDDATA_DIR.glob("*.json")]
+        stale = rebuild or not path.exists() or any(
+            source.exists() and source.stat().st_mtime > path.stat().st_mtime for source in sources
+        )
+        index = None
+        if not stale:
+            try:
+                data = json.loads(path.read_text())
+                if data.get("version") == INDEX_VERSION:
+                    index = cls(data["entries"], data["probes"])
+            except (OSError, ValueError, KeyError):
+                index = None
+        if index is None:
+            index = cls.build()
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        if store:
+            index.magic_counts = store.magic_counts()
+        return index
+
+    def lookup(self, fingerprint):
+        """Most specific entry for a fingerprint: GET_VERSION, then ATQA/SAK, or None"""
+        if fingerprint.get("version"):
+            entry = self.entries.get(f"version:{fingerprint['version']}")
+            if entry:
+                return entry
+        if fingerprint.get("sak"):
+            return self.entries.get(f"{fingerprint.get('atqa')}:{fingerprint['sak']}")
+        return None
+
+    def probe(self, name):
+        return next((probe for probe in self.probes if probe["name"] == name), None)
+
+    def probes_for(self, fingerprint, card_type=None, info_checked=True):
+        """Names of the magic probes that can still change the answer, likeliest first
+
+        Nothing is left when the client already named the magic generation;
+        the gen2 probe is hf 14a info itself, so it adds nothing once that ran.
+        """
+        if fingerprint.get("magic"):
+            return []
+        allowed = TYPE_PROBES.get(card_type, None)
+        names = [
+            probe["name"] for probe in self.probes
+            if probe["command"] and (allowed is None or probe["name"] in allowed)
+            and not (info_checked and probe["command"] == "hf 14a info")
+        ]
+        counts = self.magic_counts.get(f"{fingerprint.get('atqa')}:{fingerprint.get('sak')}", {})
+        # Stable sort keeps the document order between equally likely generations
+        return sorted(names, key=lambda name: -counts.get(name, 0))
+
+    def identify(self, fingerprint):
+        """(card type, subtype) for a fingerprint, ("unknown", None) when not indexed"""
+        entry = self.lookup(fingerprint)
+        if not entry:
+            return "unknown", None
+        return entry["card_type"], entry.get("subtype")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Fingerprint Index - build or query the card fingerprint index')
+    parser.add_argument('files', nargs='*', help='Saved hf 14a info outputs to identify')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the index from its sources')
+    parser.add_argument('--show', action='store_true', help='Print all index entries and probes')
+
+    args = parser.parse_args()
+
+    index = FingerprintIndex.load(rebuild=args.rebuild)
+    if args.show or not args.files:
+        for key, entry in sorted(index.entries.items()):
+            print(f"{key:<26} {entry['card_type']:<18} {entry.get('subtype') or '-':<8} {entry.get('source', '')}")
+        print("\nProbes: " + ", ".join(
+            f"{probe['name']} ({probe['command'] or 'client-reported'})" for probe in index.probes
+        ))
+        return
+
+    for path in args.files:
+        output = sys.stdin.read() if path == "-" else Path(path).read_text(errors="replace")
+        fingerprint = fingerprint_of(output)
+        card_type, subtype = index.identify(fingerprint)
+        probes = index.probes_for(fingerprint, card_type)
+        print(f"{path}: {card_type} {subtype or '-'} magic={fingerprint['magic'] or '?'} "
+              f"probes={','.join(probes) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+PM3 Hardware Health - cached reader health check with a TTL
+The full check (hw status, hw version, hw tune) runs only when the stored
+result for a device is older than the TTL, was not healthy, or a quick
+hw ping fails; otherwise the ping is all a run costs
+"""
+
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+
+from device_lease import DeviceLease, LeaseTimeout, resolve_device
+from pm3_session import PM3Session, PM3SessionError
+from results_store import DEFAULT_DB, connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hw_health (
+    device TEXT PRIMARY KEY,
+    healthy INTEGER NOT NULL,
+    firmware TEXT,
+    lf_voltage REAL,
+    lf_status TEXT,
+    hf_voltage REAL,
+    hf_status TEXT,
+    checked_at REAL NOT NULL
+);
+"""
+
+DEFAULT_TTL = 3600
+
+PING_COMMAND = "hw ping"
+FULL_COMMANDS = ["hw status", "hw version", "hw tune"]
+
+FIRMWARE_RE = re.compile(r"\bos:\s*(?P<firmware>\S+)", re.IGNORECASE)
+ANTENNA_RE = re.compile(r"(?P<band>LF|HF) antenna\W+(?P<voltage>\d+(?:\.\d+)?)\s*V", re.IGNORECASE)
+VERDICT_RE = re.compile(r"(?P<band>LF|HF) antenna.*?\b(?P<status>OK|marginal|unusable)\b", re.IGNORECASE)
+
+
+def _answered(output):
+    if not output or output.startswith("ERROR") or getattr(output, "timed_out", False):
+        return False
+    return getattr(output, "returncode", 0) == 0
+
+
+def ping_ok(output):
+    """hw ping answered ("Ping response received")"""
+    return _answered(output) and "received" in output.lower() and "timeout" not in output.lower()
+
+
+def parse_full_check(status, version, tune):
+    """Health record from the hw status / hw version / hw tune outputs"""
+    record = {
+        "healthy": _answered(status) and _answered(version),
+        "firmware": None,
+        "lf_voltage": None,
+        "lf_status": None,
+        "hf_voltage": None,
+        "hf_status": None,
+    }
+    match = FIRMWARE_RE.search(version or "")
+    if match:
+        record["firmware"] = match.group("firmware")
+    for match in ANTENNA_RE.finditer(tune or ""):
+        band = match.group("band").lower()
+        if record[f"{band}_voltage"] is None:
+            record[f"{band}_voltage"] = float(match.group("voltage"))
+    for match in VERDICT_RE.finditer(tune or ""):
+        record[f"{match.group('band').lower()}_status"] = match.group("status").lower()
+    return record
+
+
+class HealthCheck:
+    """Stored health of one reader, refreshed by a full check when stale"""
+
+    def __init__(self, device=None, ttl=DEFAULT_TTL, path=None, clock=time.time):
+        self.device = resolve_device(device)
+        self.ttl = ttl
+        self.clock = clock
+        self.db = connect(path or DEFAULT_DB)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def cached(self):
+        """Last stored result for this device, or None"""
+        row = self.db.execute("SELECT * FROM hw_health WHERE device = ?", (self.device,)).fetchone()
+        return dict(row) if row else None
+
+    def fresh(self, record=None):
+        record = record or self.cached()
+        return bool(record and record["healthy"] and self.clock() - record["checked_at"] < self.ttl)
+
+    def invalidate(self):
+        """Force the next check to be a full one, e.g. after a failed command"""
+        self.db.execute("UPDATE hw_health SET checked_at = 0 WHERE device = ?", (self.device,))
+        self.db.commit()
+
+    def check(self, run_batch, force=False):
+        """Quick ping when the stored result is fresh, full check otherwise
+
+        run_batch(commands) must return one output per command, in order.
+        Returns the health record with "full" telling which check ran.
+        """
+        record = self.cached()
+        if not force and self.fresh(record):
+            if ping_ok(run_batch([PING_COMMAND])[0]):
+                return {**record, "full": False}
+
+        status, version, tune = run_batch(FULL_COMMANDS)
+        record = parse_full_check(status, version, tune)
+        self._save(record)
+        return {**self.cached(), "full": True}
+
+    def _save(self, record):
+        self.db.execute(
+            """
+            INSERT OR REPLACE INTO hw_health
+                (device, healthy, firmware, lf_voltage, lf_status, hf_voltage, hf_status, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (self.device, int(record["healthy"]), record["firmware"], record["lf_voltage"],
+             record["lf_status"], record["hf_voltage"], record["hf_status"], self.clock())
+        )
+        self.db.commit()
+
+
+def describe(record):
+    """One line summary of a health record"""
+    checked = datetime.fromtimestamp(record["checked_at"]).strftime("%Y-%m-%d %H:%M") if record["checked_at"] else "-"
+    antennas = ", ".join(
+        f"{band.upper()} {record[f'{band}_voltage']:.1f} V ({record[f'{band}_status'] or '?'})"
+        for band in ("lf", "hf") if record[f"{band}_voltage"] is not None
+    )
+    state = "OK" if record["healthy"] else "FAILED"
+    return f"{record['device']}: {state}, firmware {record['firmware'] or 'unknown'}, {antennas or 'no tune data'}, checked {checked}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Hardware Health - cached reader health check')
+    parser.add_argument('--device', '-d', default=None, help='PM3 device path')
+    parser.add_argument('--ttl', type=int, default=DEFAULT_TTL, help=f'Seconds a full check stays valid (default: {DEFAULT_TTL})')
+    parser.add_argument('--force', action='store_true', help='Run the full check now')
+    parser.add_argument('--show', action='store_true', help='Only print the stored result')
+    parser.add_argument('--no-lease', action='store_true', help='Caller already holds the reader lease')
+
+    args = parser.parse_args()
+
+    health = HealthCheck(args.device, ttl=args.ttl)
+    if args.show:
+        record = health.cached()
+        print(describe(record) if record else f"{health.device}: never checked")
+        health.close()
+        sys.exit(0 if record and record["healthy"] else 1)
+
+    session = PM3Session(device=args.device)
+    lease = None if args.no_lease else DeviceLease(args.device, owner="hw_health")
+    try:
+        if lease:
+            lease.acquire()
+        record = health.check(lambda commands: session.run_batch(commands, timeout=20), force=args.force)
+    except (PM3SessionError, LeaseTimeout) as e:
+        health.invalidate()
+        print(f"❌ {health.device}: {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+        if lease:
+            lease.release()
+        health.close()
+
+    print(f"{'🔧 full check' if record['full'] else '📡 ping'} - {describe(record)}")
+    sys.exit(0 if record["healthy"] else 1)
+
+
+if __name__ == "__main__":
+    main()
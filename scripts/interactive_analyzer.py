@@ -61,9 +61,11 @@ Enter your choice (1-9): """
 2. Test HF cards only
 3. Test LF cards only
 4. Hardware status check
-5. Back to main menu
+5. HF badge inventory (site survey)
+6. LF badge reading (EM410x/HID, continuous)
+7. Back to main menu
 
-Choose option (1-5): """
+Choose option (1-7): """
         
         choice = input(options).strip()
         
@@ -80,6 +82,12 @@ Choose option (1-5): """
             print("\n⚡ Checking hardware status...")
             self.run_command("pm3 -c 'hw status; hw tune'")
         elif choice == "5":
+            print("\n📡 Streaming UIDs, present the badges one after another (Ctrl+C to stop)...")
+            self.run_script("inventory.py")
+        elif choice == "6":
+            print("\n📡 Reading LF badges, present them one after another (Ctrl+C to stop)...")
+            self.run_script("lf_reader.py", ["-f", "em410x", "hid"])
+        elif choice == "7":
             return
         else:
             print("❌ Invalid choice!")
@@ -117,7 +125,7 @@ Choose profile (1-7): """
             self.run_script("ai_analyzer.py", ["-v"])
         elif choice == "3":
             print("\n🔥 Running aggressive analysis...")
-            self.run_script("ai_analyzer.py", ["-v", "--timeout", "300"])
+            self.run_script("ai_analyzer.py", ["-v", "--timeout", "300", "--budget", "600"])
         elif choice == "4":
             print("\n🎴 Testing magic card capabilities...")
             self.run_script("ai_analyzer.py", ["--magic-only", "-v"])
@@ -268,7 +276,7 @@ Choose (1-4): """
                 print("❌ Invalid data format!")
         elif choice == "2":
             filename = input("Dump filename: ").strip()
-            self.run_command(f"pm3 -c 'hf mf restore 1 {filename}'")
+            self.run_script("clone_writer.py", [filename, "--target", "keyed"])
         elif choice == "3":
             print("🔄 Starting clone workflow...")
             print("1. Place SOURCE card and press Enter")
@@ -276,7 +284,7 @@ Choose (1-4): """
             self.run_command("pm3 -c 'hf mf autopwn'")
             print("2. Place TARGET magic card and press Enter")
             input()
-            self.run_command("pm3 -c 'hf mf restore 1 hf-mf-*-dump.bin'")
+            self.run_script("clone_writer.py", ["--target", "keyed"])
         elif choice == "4":
             return
         
@@ -395,34 +403,30 @@ Choose (1-4): """
         
         # Step 1: Analyze source
         print("\n📋 STEP 1: Analyze Source Card")
-        print("Place the SOURCE card on the antenna and press Enter...")
-        input()
+        source_uid = self.wait_for_card("Place the SOURCE card on the antenna")
         
         print("🔍 Analyzing source card...")
         self.run_script("ai_analyzer.py", ["-v", "--detect-only"])
         
         # Step 2: Detect target
         print("\n📋 STEP 2: Detect Target Card")
-        print("Place the TARGET card on the antenna and press Enter...")
-        input()
+        target_uid = self.wait_for_card("Place the TARGET card on the antenna", not_uid=source_uid)
         
         print("🎴 Testing magic capabilities...")
         self.run_script("ai_analyzer.py", ["--magic-only", "-v"])
         
         # Step 3: Clone
         print("\n📋 STEP 3: Perform Cloning")
-        print("Place the SOURCE card back on the antenna and press Enter...")
-        input()
+        self.wait_for_card("Place the SOURCE card back on the antenna", uid=source_uid)
         
         print("⚡ Running full analysis and dump...")
         self.run_script("ai_analyzer.py", ["-v"])
         
-        print("Place the TARGET magic card on the antenna and press Enter...")
-        input()
+        self.wait_for_card("Place the TARGET magic card on the antenna", uid=target_uid)
         
-        # Simple cloning commands based on common scenarios
+        # Only the blocks the target does not already hold are written
         print("🔄 Attempting clone...")
-        self.run_command("pm3 -c 'hf mf restore 1 hf-mf-*-dump.bin' || pm3 -c 'hf mf cload hf-mf-*-dump.bin'")
+        self.run_script("clone_writer.py")
         
         # Step 4: Verify
         print("\n📋 STEP 4: Verify Clone")
@@ -448,6 +452,23 @@ Choose (1-4): """
         
         output_dir = input("Output directory (default: batch_results): ").strip() or "batch_results"
         
+        # Several readers attached - offer the parallel reader farm
+        readers = sorted(str(p) for p in Path("/dev").glob("ttyACM*"))
+        if len(readers) > 1:
+            print(f"\n📡 Found {len(readers)} readers: {', '.join(readers)}")
+            if input("Process cards in parallel on all readers? (y/n): ").strip().lower() == 'y':
+                self.run_script("reader_farm.py", ["-n", count, "-o", output_dir])
+                print(f"\n✅ Batch processing complete! Results in: {output_dir}")
+                input("Press Enter to continue...")
+                return
+        
+        # Presence polling: every new card is picked up without pressing Enter
+        if input("Detect cards automatically? (Y/n): ").strip().lower() != 'n':
+            self.run_script("card_presence.py", ["-n", count, "-o", output_dir])
+            print(f"\n✅ Batch processing complete! Results in: {output_dir}")
+            input("Press Enter to continue...")
+            return
+        
         print(f"\n📊 Processing {count} cards...")
         print("Place each card when prompted and press Enter")
         
@@ -593,6 +614,33 @@ SAFETY REMINDERS:
         except Exception as e:
             print(f"❌ Error executing command: {e}")
     
+    def wait_for_card(self, prompt, uid=None, not_uid=None, timeout=30):
+        """Wait until the wanted card is on the antenna, return its UID
+        
+        Polls with card_presence.py; falls back to an Enter prompt when
+        the reader cannot be polled or no matching card shows up within
+        timeout seconds (e.g. a clone target that already has the source UID).
+        """
+        print(f"{prompt} (detected automatically, Ctrl+C to confirm manually)...")
+        command = [sys.executable, str(self.scripts_dir / "card_presence.py"), "--wait",
+                   "--idle-timeout", str(timeout)]
+        if uid:
+            command.extend(["--uid", uid])
+        if not_uid:
+            command.extend(["--not-uid", not_uid])
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode == 0 and result.stdout.strip():
+                detected = result.stdout.strip().splitlines()[-1]
+                print(f"🎯 Card detected: {detected}")
+                return detected
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"⚠️  Card polling unavailable: {e}")
+        input("Press Enter when the card is in place...")
+        return uid
+    
     def run_script(self, script_name, args=None):
         """Run a script from the scripts directory"""
         script_path = self.scripts_dir / script_name
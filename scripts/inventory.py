@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+PM3 Inventory - high-rate HF UID inventory for site surveys
+Streams hf 14a reader in continuous mode, parses UID/ATQA/SAK lines as they
+arrive and appends every card not seen before (in this log or the results
+store) to a compact tab-separated log
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from device_lease import DeviceLease, LeaseTimeout
+from fingerprint_index import FingerprintIndex
+from pm3_stream import PM3StreamRunner
+from results_store import DATA_DIR, ResultsStore, card_fingerprint
+
+INVENTORY_COMMAND = "hf 14a reader -@"
+DEFAULT_LOG = DATA_DIR / "inventory.tsv"
+# Upper limit for a run without --duration
+MAX_DURATION = 24 * 3600
+
+# "[+]  UID: 04 EC A1 6A 7B 13 90", "[+] ATQA: 00 44", "[+]  SAK: 00 [2]"
+FIELD_RE = re.compile(r"\b(?P<field>UID|ATQA|SAK)\s*:\s*(?P<value>[0-9A-F]{2}(?: ?[0-9A-F]{2})*)", re.IGNORECASE)
+
+
+class Tag:
+    """One inventoried card"""
+
+    __slots__ = ("uid", "atqa", "sak", "card_type", "subtype", "seen_at")
+
+    def __init__(self, uid, atqa=None, sak=None, seen_at=None, index=None):
+        self.uid = uid
+        self.atqa = atqa
+        self.sak = sak
+        # ATQA and SAK together, a SAK alone is shared by several card types
+        self.card_type, self.subtype = (
+            index.identify({"atqa": atqa, "sak": sak}) if index else ("unknown", None)
+        )
+        self.seen_at = seen_at or time.time()
+
+    def card_info(self):
+        return {"uid": self.uid, "type": self.card_type, "subtype": self.subtype,
+                "atqa": self.atqa, "sak": self.sak}
+
+    def log_line(self):
+        return f"{self.seen_at:.3f}\t{self.uid}\t{self.atqa or '-'}\t{self.sak or '-'}\t{self.card_type}\n"
+
+
+class ReaderParser:
+    """Incremental parser for hf 14a reader output, one line at a time
+
+    feed() returns a finished Tag once UID, ATQA and SAK of a read are in,
+    or when the next read starts before the previous one was complete.
+    Card types come from the fingerprint index, "unknown" without one.
+    """
+
+    def __init__(self, index=None):
+        self.index = index
+        self.uid = None
+        self.atqa = None
+        self.sak = None
+
+    def feed(self, line):
+        match = FIELD_RE.search(line)
+        if not match:
+            return None
+        field = match.group("field").upper()
+        value = match.group("value").replace(" ", "").upper()
+
+        tag = None
+        if field == "UID":
+            tag = self.flush()
+            self.uid = value
+        elif field == "ATQA":
+            self.atqa = value
+        else:
+            self.sak = value[:2]
+
+        if self.uid and self.atqa and self.sak:
+            return self.flush()
+        return tag
+
+    def flush(self):
+        """Tag for the read in progress, if it has a UID"""
+        tag = Tag(self.uid, self.atqa, self.sak, index=self.index) if self.uid else None
+        self.uid = self.atqa = self.sak = None
+        return tag
+
+
+class Inventory:
+    """Deduplicated inventory backed by an append-only log and the results store"""
+
+    def __init__(self, log_path=DEFAULT_LOG, store=None):
+        self.log_path = Path(log_path)
+        self.store = store
+        self.seen = set()
+        self.known = set(store.known_uids()) if store else set()
+        self.new_tags = []
+        self.reads = 0
+        self.known_reads = 0
+        if self.log_path.exists():
+            with open(self.log_path) as f:
+                self.seen.update(line.split("\t")[1] for line in f if line.count("\t") >= 4)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        # Line buffered: every new tag is on disk as soon as it is read
+        self.log = open(self.log_path, "a", buffering=1)
+
+    def add(self, tag):
+        """Log a tag the first time it is seen, return True if it was new"""
+        self.reads += 1
+        if tag.uid in self.seen:
+            return False
+        self.seen.add(tag.uid)
+        if tag.uid in self.known:
+            # Already analysed, nothing new for the survey log
+            self.known_reads += 1
+            return False
+        self.log.write(tag.log_line())
+        self.new_tags.append(tag)
+        return True
+
+    def close(self):
+        """Close the log and record the new cards in the results store"""
+        self.log.close()
+        if self.store:
+            for tag in self.new_tags:
+                self.store.save(tag.uid, card_fingerprint(tag.card_info()), card_type=tag.card_type,
+                                subtype=tag.subtype, atqa=tag.atqa, sak=tag.sak, status="inventoried")
+        self.new_tags = []
+
+
+def run_inventory(inventory, runner, duration=None, on_tag=None, index=None):
+    """Stream the continuous reader until duration runs out or the run is interrupted"""
+    parser = ReaderParser(index)
+
+    def on_line(line):
+        tag = parser.feed(line)
+        if tag and inventory.add(tag) and on_tag:
+            on_tag(tag)
+
+    try:
+        runner.run_sync(INVENTORY_COMMAND, timeout=duration or MAX_DURATION, on_line=on_line)
+    finally:
+        tag = parser.flush()
+        if tag and inventory.add(tag) and on_tag:
+            on_tag(tag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Inventory - high-rate HF UID inventory')
+    parser.add_argument('--device', '-d', default=None, help='PM3 device path')
+    parser.add_argument('--log', '-l', default=DEFAULT_LOG, help=f'Inventory log (default: {DEFAULT_LOG})')
+    parser.add_argument('--duration', type=int, default=None, help='Seconds to run (default: until Ctrl+C)')
+    parser.add_argument('--no-store', action='store_true', help='Do not dedupe against or write to the results store')
+    parser.add_argument('--no-lease', action='store_true', help='Caller already holds the reader lease')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Do not print each new card')
+
+    args = parser.parse_args()
+
+    store = None if args.no_store else ResultsStore()
+    try:
+        index = FingerprintIndex.load()
+    except OSError:
+        index = None
+    inventory = Inventory(args.log, store)
+    lease = None if args.no_lease else DeviceLease(args.device, owner="inventory")
+    started = time.monotonic()
+    print(f"📡 Inventory running, {len(inventory.seen)} UIDs in {inventory.log_path}, "
+          f"{len(inventory.known)} in the results store - Ctrl+C to stop")
+
+    def on_tag(tag):
+        if not args.quiet:
+            print(f"  {len(inventory.new_tags):>5}  {tag.uid:<14} {tag.atqa or '-':<4} {tag.sak or '-':<2}  {tag.card_type}")
+
+    try:
+        if lease:
+            lease.acquire()
+        run_inventory(inventory, PM3StreamRunner(device=args.device), args.duration, on_tag, index)
+    except KeyboardInterrupt:
+        pass
+    except LeaseTimeout as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        new = len(inventory.new_tags)
+        inventory.close()
+        if store:
+            store.close()
+        if lease:
+            lease.release()
+
+    elapsed = max(time.monotonic() - started, 0.001)
+    print(f"\n✅ {new} new card(s), {inventory.known_reads} already in the store, "
+          f"{inventory.reads} reads in {elapsed:.0f}s ({inventory.reads / elapsed:.1f} reads/s)")
+
+
+if __name__ == "__main__":
+    main()
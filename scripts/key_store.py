@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+PM3 Key Store - learned MIFARE Classic keys with hit counts
+Every recovered key is recorded per sector, site and card fingerprint, and
+turned into a short ordered candidate list (site hits first) for a fast
+fchk pass before any expensive attack
+"""
+
+import argparse
+import re
+from datetime import datetime
+from pathlib import Path
+
+from dict_compiler import DEFAULT_DICTIONARY, DictionaryError, load as load_dictionary
+from results_store import DEFAULT_DB, connect
+
+KEY_RE = re.compile(r"^[0-9A-F]{12}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mf_keys (
+    key TEXT NOT NULL,
+    sector INTEGER NOT NULL DEFAULT -1,
+    key_type TEXT NOT NULL DEFAULT '',
+    site TEXT NOT NULL DEFAULT '',
+    fingerprint TEXT NOT NULL DEFAULT '',
+    hits INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (key, sector, key_type, site, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS mf_keys_site ON mf_keys (site);
+"""
+
+
+def normalize_key(key):
+    """Uppercase 12-digit hex key, or None if it is not a valid key"""
+    key = (key or "").strip().replace(" ", "").upper()
+    return key if KEY_RE.match(key) else None
+
+
+class KeyStore:
+    """Keys recovered from earlier cards, ranked by where and how often they hit"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB)
+        self.db = connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record(self, key, sector=None, key_type=None, site=None, fingerprint=None):
+        """Count one hit of a key"""
+        key = normalize_key(key)
+        if not key:
+            return
+        now = datetime.now().isoformat()
+        self.db.execute(
+            """
+            INSERT INTO mf_keys (key, sector, key_type, site, fingerprint, hits, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT (key, sector, key_type, site, fingerprint) DO UPDATE SET
+                hits = hits + 1,
+                last_seen = excluded.last_seen
+            """,
+            (key, -1 if sector is None else int(sector), key_type or "", site or "",
+             fingerprint or "", now, now)
+        )
+        self.db.commit()
+
+    def record_card(self, keys=None, found_keys=None, site=None, fingerprint=None):
+        """Record a card's key table ({sector: {"A": key}}) and loose found keys"""
+        recorded = set()
+        for sector, sector_keys in (keys or {}).items():
+            for key_type, key in sector_keys.items():
+                self.record(key, sector, key_type, site, fingerprint)
+                recorded.add(normalize_key(key))
+        for key in found_keys or []:
+            if normalize_key(key) not in recorded:
+                self.record(key, site=site, fingerprint=fingerprint)
+
+    def candidates(self, site=None, fingerprint=None, limit=100, dictionary=DEFAULT_DICTIONARY):
+        """Ordered candidate keys: site, then card model, then global hits, then the dictionary"""
+        rows = self.db.execute(
+            """
+            SELECT key,
+                   SUM(CASE WHEN site = ? AND site != '' THEN hits ELSE 0 END) AS site_hits,
+                   SUM(CASE WHEN fingerprint = ? AND fingerprint != '' THEN hits ELSE 0 END) AS model_hits,
+                   SUM(hits) AS total_hits
+            FROM mf_keys
+            GROUP BY key
+            ORDER BY site_hits DESC, model_hits DESC, total_hits DESC, MAX(last_seen) DESC
+            """,
+            (site or "", fingerprint or "")
+        )
+        keys = [row["key"] for row in rows]
+        seen = set(keys)
+        if dictionary:
+            try:
+                dictionary_keys = load_dictionary(dictionary)
+            except (OSError, DictionaryError):
+                dictionary_keys = []
+            for key in dictionary_keys:
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+        return keys[:limit] if limit else keys
+
+    def write_candidates(self, path, site=None, fingerprint=None, limit=100, dictionary=DEFAULT_DICTIONARY):
+        """Write the candidate list as a .dic file for hf mf fchk, returns the key count"""
+        keys = self.candidates(site, fingerprint, limit, dictionary)
+        Path(path).write_text("".join(f"{key}\n" for key in keys))
+        return len(keys)
+
+    def hit_summary(self, site=None, fingerprint=None):
+        """Total hits of learned keys at a site, on a card model and overall"""
+        row = self.db.execute(
+            """
+            SELECT COALESCE(SUM(CASE WHEN site = ? AND site != '' THEN hits END), 0) AS site,
+                   COALESCE(SUM(CASE WHEN fingerprint = ? AND fingerprint != '' THEN hits END), 0) AS model,
+                   COALESCE(SUM(hits), 0) AS total
+            FROM mf_keys
+            """,
+            (site or "", fingerprint or "")
+        ).fetchone()
+        return dict(row)
+
+    def stats(self):
+        """Learned keys with their total hits and the sites they were seen at"""
+        rows = self.db.execute(
+            """
+            SELECT key, SUM(hits) AS hits, GROUP_CONCAT(DISTINCT NULLIF(site, '')) AS sites
+            FROM mf_keys GROUP BY key ORDER BY hits DESC
+            """
+        )
+        return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Key Store - learned MIFARE Classic keys')
+    parser.add_argument('--db', default=None, help=f'Database path (default: {DEFAULT_DB})')
+    parser.add_argument('--site', help='Site tag to rank candidates for')
+    parser.add_argument('--fingerprint', help='Card fingerprint to rank candidates for')
+    parser.add_argument('--limit', type=int, default=100, help='Maximum number of candidates (0 = all)')
+    parser.add_argument('--export', metavar='FILE', help='Write the candidate list as a .dic file')
+    parser.add_argument('--no-dictionary', action='store_true', help='Only learned keys, no mfkeys.dic fill-up')
+
+    args = parser.parse_args()
+
+    store = KeyStore(args.db)
+    dictionary = None if args.no_dictionary else DEFAULT_DICTIONARY
+    try:
+        if args.export:
+            written = store.write_candidates(args.export, args.site, args.fingerprint, args.limit, dictionary)
+            print(f"Wrote {written} candidate keys to {args.export}")
+        elif args.site or args.fingerprint:
+            for key in store.candidates(args.site, args.fingerprint, args.limit, dictionary):
+                print(key)
+        else:
+            for row in store.stats():
+                print(f"{row['key']}  hits={row['hits']:<5} sites={row['sites'] or '-'}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
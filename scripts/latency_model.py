@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+PM3 Latency Model - adaptive per-command timeouts from observed run times
+Durations are recorded per command family, card type (with its PRNG type
+for MIFARE Classic) and outcome; the timeout becomes a high percentile of past successes, and probes that
+never succeed on a card type fail fast
+"""
+
+import argparse
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from pm3_classifier import classify
+from results_store import DEFAULT_DB, connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS latency (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    family TEXT NOT NULL,
+    card_type TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    recorded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS latency_family ON latency (family, card_type, outcome);
+"""
+
+# Samples kept per family, card type and outcome
+WINDOW = 200
+# Samples needed before the model overrides the default timeout
+MIN_SAMPLES = 5
+PERCENTILE = 0.95
+MARGIN = 1.5
+MIN_TIMEOUT = 3
+# Timeout for a probe that only ever timed out on this card type
+FAIL_FAST_TIMEOUT = 5
+# Exit status of timeout(1) when it interrupted the command, 137 when -k had to kill it
+TIMEOUT_STATUSES = (124, 137)
+
+ARGUMENT_RE = re.compile(r"^(?:-|\d+$|.$)|[*?/\\.]")
+
+
+def command_family(command):
+    """Command path without arguments: 'hf mfu dump -k FFFFFFFF' -> 'hf mfu dump'"""
+    words = []
+    for word in command.split():
+        if len(words) == 3 or ARGUMENT_RE.search(word):
+            break
+        words.append(word.lower())
+    return " ".join(words) or command.strip()
+
+
+def model_key(card_type, prng=None):
+    """Samples are kept apart per card type and PRNG: weak-PRNG cards crack far faster"""
+    card_type = card_type or "unknown"
+    return f"{card_type}:{prng}" if prng else card_type
+
+
+def outcome_of(output):
+    """success, failure or timeout for a PM3Output (None when nothing ran)
+
+    Any success indicator wins: fchk and autopwn logs print "timeout" or
+    "authentication failed" lines on their way to the keys.
+    """
+    if getattr(output, "timed_out", False):
+        return "timeout"
+    if output is None or output.startswith("ERROR"):
+        return None
+    if getattr(output, "returncode", 0) != 0:
+        return "failure"
+    record = classify(output)
+    if record.failures and not record.success:
+        return "failure"
+    return "success"
+
+
+def log_outcome(text, status=0):
+    """success, failure or timeout of a pm3 -c run from its log
+
+    Only keys or a saved dump count as success: the client exits 0 after a
+    run that found nothing. The exit status only tells timeouts from errors.
+    """
+    if status in TIMEOUT_STATUSES:
+        return "timeout"
+    record = classify(text)
+    if record.key_found or record.dump_success or record.saved_files:
+        return "success"
+    return "failure"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class LatencyModel:
+    """Persistent command latency samples with timeout suggestions"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB)
+        self.db = connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record(self, command, card_type, outcome, seconds, prng=None):
+        """Add one sample and trim the window for its family"""
+        if outcome is None or seconds is None:
+            return
+        family = command_family(command)
+        card_type = model_key(card_type, prng)
+        self.db.execute(
+            "INSERT INTO latency (family, card_type, outcome, seconds, recorded_at) VALUES (?, ?, ?, ?, ?)",
+            (family, card_type, outcome, float(seconds), datetime.now().isoformat())
+        )
+        self.db.execute(
+            """
+            DELETE FROM latency WHERE family = ? AND card_type = ? AND outcome = ? AND id NOT IN (
+                SELECT id FROM latency WHERE family = ? AND card_type = ? AND outcome = ?
+                ORDER BY id DESC LIMIT ?
+            )
+            """,
+            (family, card_type, outcome, family, card_type, outcome, WINDOW)
+        )
+        self.db.commit()
+
+    def record_output(self, command, card_type, output, prng=None):
+        """Record a finished PM3Output that knows its own duration"""
+        self.record(command, card_type, outcome_of(output), getattr(output, "duration", None), prng)
+
+    def samples(self, command, card_type, outcome):
+        rows = self.db.execute(
+            "SELECT seconds FROM latency WHERE family = ? AND card_type = ? AND outcome = ?",
+            (command_family(command), card_type or "unknown", outcome)
+        )
+        return [row["seconds"] for row in rows]
+
+    def recent_outcomes(self, command, card_type, count=3):
+        rows = self.db.execute(
+            "SELECT outcome FROM latency WHERE family = ? AND card_type = ? ORDER BY id DESC LIMIT ?",
+            (command_family(command), card_type or "unknown", count)
+        )
+        return [row["outcome"] for row in rows]
+
+    def timeout_for(self, command, card_type, default, prng=None):
+        """Suggested timeout, never above the caller's default"""
+        card_type = model_key(card_type, prng)
+        successes = self.samples(command, card_type, "success")
+        if len(successes) >= MIN_SAMPLES:
+            # Three timeouts in a row: the learned limit is too tight, go back to the default
+            if self.recent_outcomes(command, card_type) == ["timeout"] * 3:
+                return default
+            suggested = percentile(successes, PERCENTILE) * MARGIN
+            return int(min(default, max(MIN_TIMEOUT, suggested + 0.999)))
+
+        if successes:
+            return default
+
+        # Never succeeded on this card type: answer as fast as it usually fails
+        failures = self.samples(command, card_type, "failure")
+        timeouts = self.samples(command, card_type, "timeout")
+        if len(failures) + len(timeouts) < MIN_SAMPLES:
+            return default
+        if failures:
+            suggested = percentile(failures, PERCENTILE) * MARGIN
+            return int(min(default, max(MIN_TIMEOUT, suggested + 0.999)))
+        return min(default, FAIL_FAST_TIMEOUT)
+
+    def table(self):
+        rows = self.db.execute(
+            """
+            SELECT family, card_type, outcome, COUNT(*) AS samples, AVG(seconds) AS mean, MAX(seconds) AS worst
+            FROM latency GROUP BY family, card_type, outcome ORDER BY family, card_type, outcome
+            """
+        )
+        return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Latency Model - learned command timeouts')
+    parser.add_argument('--db', default=None, help=f'Database path (default: {DEFAULT_DB})')
+    subparsers = parser.add_subparsers(dest='action')
+
+    timeout_parser = subparsers.add_parser('timeout', help='Print the suggested timeout for a command')
+    timeout_parser.add_argument('command', help='PM3 command')
+    timeout_parser.add_argument('--card-type', default=None, help='Card type')
+    timeout_parser.add_argument('--prng', choices=['weak', 'hard', 'static'], help='MIFARE Classic PRNG type')
+    timeout_parser.add_argument('--default', type=int, default=60, help='Upper limit / default timeout')
+
+    record_parser = subparsers.add_parser('record', help='Record one command duration')
+    record_parser.add_argument('command', help='PM3 command')
+    record_parser.add_argument('--card-type', default=None, help='Card type')
+    record_parser.add_argument('--prng', choices=['weak', 'hard', 'static'], help='MIFARE Classic PRNG type')
+    record_parser.add_argument('--outcome', choices=['success', 'failure', 'timeout'], required=True)
+    record_parser.add_argument('--seconds', type=float, required=True)
+
+    outcome_parser = subparsers.add_parser('outcome', help='Print the outcome of a pm3 -c run from its log')
+    outcome_parser.add_argument('log', help='Client output log')
+    outcome_parser.add_argument('--status', type=int, default=0, help='Exit status of the run')
+
+    args = parser.parse_args()
+
+    if args.action == 'outcome':
+        with open(args.log, encoding='utf-8', errors='replace') as f:
+            print(log_outcome(f.read(), args.status))
+        return
+
+    model = LatencyModel(args.db)
+    try:
+        if args.action == 'timeout':
+            print(model.timeout_for(args.command, args.card_type, args.default, args.prng))
+        elif args.action == 'record':
+            model.record(args.command, args.card_type, args.outcome, args.seconds, args.prng)
+        else:
+            rows = model.table()
+            if not rows:
+                print("No latency samples recorded")
+                sys.exit(0)
+            for row in rows:
+                print(f"{row['family']:<20} {row['card_type']:<18} {row['outcome']:<8} "
+                      f"n={row['samples']:<4} mean={row['mean']:.1f}s worst={row['worst']:.1f}s")
+    finally:
+        model.close()
+
+
+if __name__ == "__main__":
+    main()
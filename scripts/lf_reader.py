@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+PM3 LF Reader - continuous EM410x/HID badge reading pipeline
+Streams the client's continuous LF reader, decodes EM410x and HID IDs line
+by line, drops repeat reads of a badge still in the field with a bounded
+time window and emits one timestamped record per badge presentation
+"""
+
+import argparse
+import re
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from device_lease import DeviceLease, LeaseTimeout
+from pm3_session import PM3Session, PM3SessionError
+from pm3_stream import PM3StreamRunner
+
+# Continuous readers, used when only one family is read
+READER_COMMANDS = {
+    "em410x": "lf em 410x reader -@",
+    "hid": "lf hid reader -@",
+}
+# One read per command; several families take turns in one client session
+SINGLE_READ_COMMANDS = {
+    "em410x": "lf em 410x reader",
+    "hid": "lf hid reader",
+}
+
+# "[+] EM 410x ID 0F0368568B", older clients: "EM410x ID: 0F0368568B"
+EM410X_RE = re.compile(r"EM\s?410x(?: XL)? ID\W*(?P<id>[0-9A-F]{10})\b", re.IGNORECASE)
+# "[=] raw: 000000000000002006ec0c86", older clients: "HID Prox - 2006ec0c86 (1603)"
+HID_RAW_RE = re.compile(r"(?:\braw:|HID Prox -)\s*(?P<raw>[0-9A-F]{6,})\b", re.IGNORECASE)
+# "[+] [H10301  ] HID H10301 26-bit   FC: 118  CN: 1603  parity ( ok )"
+HID_FIELDS_RE = re.compile(r"FC:\s*(?P<fc>\d+)\s+(?:CN|Card):\s*(?P<cn>\d+)", re.IGNORECASE)
+HID_FORMAT_RE = re.compile(r"\[(?P<format>[A-Za-z][\w-]*)\s*\]")
+
+# Same badge within this many seconds of its last read is the same presentation
+REPEAT_WINDOW = 2.0
+# Badges remembered by the repeat window at most
+WINDOW_SIZE = 256
+# HID format lines and their raw line arrive together; older FC/CN belong to a read without a raw line
+FIELDS_MAX_AGE = 1.0
+
+
+class LFRead:
+    """One decoded LF badge"""
+
+    __slots__ = ("family", "id", "fc", "cn", "format", "seen_at")
+
+    def __init__(self, family, id, fc=None, cn=None, format=None, seen_at=None):
+        self.family = family
+        self.id = id
+        self.fc = fc
+        self.cn = cn
+        self.format = format
+        self.seen_at = seen_at or time.time()
+
+    @property
+    def key(self):
+        return self.family, self.id
+
+    def to_dict(self):
+        return {
+            "time": datetime.fromtimestamp(self.seen_at).isoformat(),
+            "family": self.family,
+            "id": self.id,
+            "fc": self.fc,
+            "cn": self.cn,
+            "format": self.format,
+        }
+
+    def log_line(self):
+        return (f"{self.seen_at:.3f}\t{self.family}\t{self.id}\t{self.fc if self.fc is not None else '-'}\t"
+                f"{self.cn if self.cn is not None else '-'}\t{self.format or '-'}\n")
+
+
+class LFParser:
+    """Incremental EM410x/HID decoder, one client output line at a time
+
+    HID prints the decoded format lines before the raw line, so FC/CN are
+    held until the raw value arrives. They are dropped by reset() at the
+    end of each read, and when streaming also once they are older than
+    max_age, so a read without a raw line never lends them to the next badge.
+    """
+
+    def __init__(self, max_age=None, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.fc = None
+        self.cn = None
+        self.format = None
+        self.fields_at = None
+
+    def _fields_expired(self):
+        return (self.fields_at is not None and self.max_age is not None
+                and self.clock() - self.fields_at > self.max_age)
+
+    def feed(self, line):
+        if self._fields_expired():
+            self.reset()
+
+        match = EM410X_RE.search(line)
+        if match:
+            self.reset()
+            return LFRead("em410x", match.group("id").upper())
+
+        fields = HID_FIELDS_RE.search(line)
+        if fields and self.fc is None:
+            self.fc, self.cn = int(fields.group("fc")), int(fields.group("cn"))
+            fmt = HID_FORMAT_RE.search(line)
+            self.format = fmt.group("format") if fmt else None
+            self.fields_at = self.clock()
+
+        match = HID_RAW_RE.search(line)
+        if match:
+            read = LFRead("hid", match.group("raw").lstrip("0").upper() or "0",
+                          self.fc, self.cn, self.format)
+            self.reset()
+            return read
+        return None
+
+
+def parse_output(output):
+    """Every badge read in a finished client output, in order"""
+    parser = LFParser()
+    reads = []
+    for line in (output or "").splitlines():
+        read = parser.feed(line)
+        if read:
+            reads.append(read)
+    return reads
+
+
+class RepeatWindow:
+    """Bounded memory of recently read badges
+
+    A read is new when its badge was not seen within the last `seconds`;
+    every repeat refreshes the badge, so one held in the field stays quiet.
+    """
+
+    def __init__(self, seconds=REPEAT_WINDOW, size=WINDOW_SIZE, clock=time.monotonic):
+        self.seconds = seconds
+        self.size = size
+        self.clock = clock
+        self.last_seen = OrderedDict()
+
+    def is_new(self, key):
+        now = self.clock()
+        last = self.last_seen.pop(key, None)
+        self.last_seen[key] = now
+        if len(self.last_seen) > self.size:
+            self.last_seen.popitem(last=False)
+        return last is None or now - last > self.seconds
+
+
+class LFPipeline:
+    """Parse -> drop repeats -> emit, fed with streamed output lines"""
+
+    def __init__(self, window=None, on_read=None, log_path=None):
+        self.parser = LFParser(max_age=FIELDS_MAX_AGE)
+        self.window = window or RepeatWindow()
+        self.on_read = on_read
+        self.reads = 0
+        self.records = []
+        self.log = None
+        if log_path:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            self.log = open(log_path, "a", buffering=1)
+
+    def feed(self, line):
+        read = self.parser.feed(line)
+        if read is None:
+            return None
+        self.reads += 1
+        if not self.window.is_new(read.key):
+            return None
+        self.records.append(read)
+        if self.log:
+            self.log.write(read.log_line())
+        if self.on_read:
+            self.on_read(read)
+        return read
+
+    def feed_output(self, output):
+        """Feed the whole output of one single read"""
+        for line in (output or "").splitlines():
+            self.feed(line)
+        self.parser.reset()
+
+    def close(self):
+        if self.log:
+            self.log.close()
+
+
+def run_pipeline(pipeline, runner, families=("em410x",), duration=None, session=None):
+    """Read badges until duration runs out
+
+    One family streams the client's continuous reader uninterrupted through
+    runner; several families take turns as single reads, all in one round
+    trip of the already running session, so no client is restarted.
+    """
+    deadline = None if duration is None else time.monotonic() + duration
+    if len(families) == 1:
+        timeout = duration or 24 * 3600
+        runner.run_sync(READER_COMMANDS[families[0]], timeout=timeout, on_line=pipeline.feed)
+        return
+
+    commands = [SINGLE_READ_COMMANDS[family] for family in families]
+    while deadline is None or time.monotonic() < deadline:
+        for output in session.run_batch(commands, timeout=5 * len(commands)):
+            pipeline.feed_output(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 LF Reader - continuous EM410x/HID badge reading')
+    parser.add_argument('--device', '-d', default=None, help='PM3 device path')
+    parser.add_argument('--family', '-f', nargs='+', choices=sorted(READER_COMMANDS), default=['em410x'],
+                        help='Badge families to read (several take turns)')
+    parser.add_argument('--duration', type=int, default=None, help='Seconds to run (default: until Ctrl+C)')
+    parser.add_argument('--window', type=float, default=REPEAT_WINDOW,
+                        help=f'Seconds a badge must be gone before it counts again (default: {REPEAT_WINDOW})')
+    parser.add_argument('--log', '-l', default=None, help='Append records to this TSV log')
+    parser.add_argument('--parse', metavar='FILE', help='Only decode a saved client output ("-" = stdin) and print the IDs')
+    parser.add_argument('--no-lease', action='store_true', help='Caller already holds the reader lease')
+
+    args = parser.parse_args()
+
+    if args.parse:
+        output = sys.stdin.read() if args.parse == "-" else Path(args.parse).read_text(errors="replace")
+        reads = parse_output(output)
+        for read in reads:
+            details = f" FC {read.fc} CN {read.cn}" if read.fc is not None else ""
+            print(f"{read.family}\t{read.id}{details}")
+        sys.exit(0 if reads else 1)
+
+    def on_read(read):
+        details = f"  FC {read.fc} CN {read.cn} ({read.format or '?'})" if read.fc is not None else ""
+        print(f"{read.to_dict()['time']}  {read.family:<7} {read.id}{details}")
+
+    pipeline = LFPipeline(RepeatWindow(args.window), on_read, args.log)
+    lease = None if args.no_lease else DeviceLease(args.device, owner="lf_reader")
+    session = PM3Session(device=args.device) if len(args.family) > 1 else None
+    started = time.monotonic()
+    print(f"📡 Reading {', '.join(args.family)} badges - Ctrl+C to stop")
+    try:
+        if lease:
+            lease.acquire()
+        run_pipeline(pipeline, PM3StreamRunner(device=args.device), args.family, args.duration, session)
+    except KeyboardInterrupt:
+        pass
+    except (LeaseTimeout, PM3SessionError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        pipeline.close()
+        if session:
+            session.close()
+        if lease:
+            lease.release()
+
+    elapsed = max(time.monotonic() - started, 0.001)
+    badges = len({read.key for read in pipeline.records})
+    print(f"\n✅ {len(pipeline.records)} presentation(s) of {badges} badge(s), "
+          f"{pipeline.reads} reads in {elapsed:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
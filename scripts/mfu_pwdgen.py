@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+MFU Password Generator - UID-derived MIFARE Ultralight EV1/NTAG passwords
+Computes the published UID-based password schemes locally, for one UID or
+a whole batch, so the candidates go straight into the password sweep
+without a hf mfu pwdgen round trip
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+
+UID_LENGTH = 7
+
+LEGO_SALT = b"(c) Copyright LEGO 2014" + b"\xaa\xaa"
+
+
+def uid_bytes(uid):
+    """7-byte UID from a hex string (spaces allowed), ValueError otherwise"""
+    if isinstance(uid, (bytes, bytearray)):
+        data = bytes(uid)
+    else:
+        data = bytes.fromhex(re.sub(r"[\s:]", "", uid or ""))
+    if len(data) != UID_LENGTH:
+        raise ValueError(f"Expected a {UID_LENGTH}-byte UID, got {len(data)} bytes")
+    return data
+
+
+def _rotr(value, bits):
+    return ((value >> bits) | (value << (32 - bits))) & 0xFFFFFFFF
+
+
+def amiibo(uid):
+    """Nintendo Amiibo (NTAG215)"""
+    uid = uid_bytes(uid)
+    return bytes([
+        uid[1] ^ uid[3] ^ 0xAA,
+        uid[2] ^ uid[4] ^ 0x55,
+        uid[3] ^ uid[5] ^ 0xAA,
+        uid[4] ^ uid[6] ^ 0x55,
+    ]).hex().upper()
+
+
+def lego_dimensions(uid):
+    """LEGO Dimensions toy tags (NTAG213)"""
+    data = uid_bytes(uid) + LEGO_SALT
+    pwd = 0
+    for i in range(0, len(data), 4):
+        base = int.from_bytes(data[i:i + 4], "little")
+        pwd = (base + _rotr(pwd, 25) + _rotr(pwd, 10) - pwd) & 0xFFFFFFFF
+    # The client prints the byte-swapped word, i.e. the little-endian bytes
+    return pwd.to_bytes(4, "little").hex().upper()
+
+
+def xiaomi(uid):
+    """Xiaomi air purifier filter tags (NTAG213)"""
+    digest = hashlib.sha1(uid_bytes(uid)).digest()
+    return bytes([
+        digest[digest[0] % 20],
+        digest[(digest[0] + 5) % 20],
+        digest[(digest[0] + 13) % 20],
+        digest[(digest[0] + 17) % 20],
+    ]).hex().upper()
+
+
+# (name, generator) in the order the candidates are tried
+SCHEMES = [
+    ("amiibo", amiibo),
+    ("lego_dimensions", lego_dimensions),
+    ("xiaomi", xiaomi),
+]
+
+
+def generate(uid):
+    """(scheme, password) pairs for one UID, duplicates removed; empty for non 7-byte UIDs"""
+    try:
+        uid = uid_bytes(uid)
+    except ValueError:
+        return []
+    candidates = []
+    seen = set()
+    for name, generator in SCHEMES:
+        password = generator(uid)
+        if password not in seen:
+            seen.add(password)
+            candidates.append((name, password))
+    return candidates
+
+
+def generate_batch(uids):
+    """{uid: [(scheme, password), ...]} for many UIDs"""
+    return {uid: generate(uid) for uid in uids}
+
+
+def passwords(uid):
+    """Just the candidate passwords for one UID, in sweep order"""
+    return [password for _, password in generate(uid)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MFU Password Generator - UID-derived Ultralight/NTAG passwords')
+    parser.add_argument('uids', nargs='*', help='7-byte UIDs in hex')
+    parser.add_argument('--file', '-f', help='Read UIDs from a file, one per line ("-" = stdin)')
+    parser.add_argument('--dic', action='store_true', help='Print passwords only, one per line (.dic format)')
+
+    args = parser.parse_args()
+
+    uids = list(args.uids)
+    if args.file:
+        stream = sys.stdin if args.file == "-" else open(args.file)
+        with stream:
+            uids.extend(line.strip() for line in stream if line.strip())
+    if not uids:
+        parser.error("no UIDs given")
+
+    seen = set()
+    for uid, candidates in generate_batch(uids).items():
+        if not candidates:
+            print(f"# {uid}: not a 7-byte UID", file=sys.stderr)
+            continue
+        for name, password in candidates:
+            if args.dic:
+                if password not in seen:
+                    seen.add(password)
+                    print(password)
+            else:
+                print(f"{uid}  {name:<16} {password}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+MFU Password Sweep - resumable Ultralight EV1/NTAG password sweep
+Tries UID-derived passwords and the whole compiled mfu_passwords.dic with
+a cheap PWD_AUTH (hf 14a raw) per candidate in one client session, stops
+at the first hit and checkpoints progress per card UID
+"""
+
+import argparse
+import json
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import mfu_pwdgen
+from device_lease import DeviceLease, LeaseTimeout
+from dict_compiler import DICTIONARY_DIR, DictionaryError, load as load_dictionary
+from pm3_classifier import classify
+from pm3_session import PM3Session, PM3SessionError
+from pm3_stream import CARD_LOST_PATTERNS
+from results_store import DATA_DIR
+
+SWEEP_DIR = DATA_DIR / "sweeps"
+MFU_DICTIONARY = DICTIONARY_DIR / "mfu_passwords.dic"
+
+# Used when the compiled dictionary is not available
+DEFAULT_PASSWORDS = ["FFFFFFFF", "00000000", "12345678", "ABCDEFAB"]
+
+# PWD_AUTH (0x1B) in its own select, the tag answers with PACK + CRC
+AUTH_COMMAND = "hf 14a raw -s -c 1B{password}"
+# "[+] 80 80 F7 F8 [ F7 F8 ]" - at least PACK and CRC
+PACK_RE = re.compile(r"^\[\+\]\s+(?P<pack>[0-9A-F]{2} [0-9A-F]{2})(?: [0-9A-F]{2}){2}", re.MULTILINE)
+CARD_LOST_RE = re.compile("|".join(CARD_LOST_PATTERNS.values()), re.IGNORECASE)
+
+
+def auth_command(password):
+    return AUTH_COMMAND.format(password=password)
+
+
+def parse_auth(output):
+    """PACK returned for a successful PWD_AUTH, or None"""
+    match = PACK_RE.search(output or "")
+    return match.group("pack").replace(" ", "") if match else None
+
+
+def card_lost(output):
+    return bool(CARD_LOST_RE.search(output or ""))
+
+
+def answered(output):
+    """False for outputs that say nothing about the password: empty, timed out or errors"""
+    if not output or getattr(output, "timed_out", False) or output.startswith("ERROR"):
+        return False
+    return not card_lost(output)
+
+
+def default_candidates(uid, dictionary=MFU_DICTIONARY):
+    """UID-derived passwords first, then the hit-ranked compiled dictionary"""
+    candidates = mfu_pwdgen.passwords(uid) if uid else []
+    try:
+        dictionary_passwords = list(load_dictionary(dictionary))
+    except (OSError, DictionaryError):
+        dictionary_passwords = DEFAULT_PASSWORDS
+    seen = set(candidates)
+    for password in dictionary_passwords:
+        if password not in seen:
+            seen.add(password)
+            candidates.append(password)
+    return candidates
+
+
+class SweepCheckpoint:
+    """Passwords already tried on one card, kept across runs and card removals"""
+
+    def __init__(self, uid, directory=SWEEP_DIR):
+        self.uid = uid
+        self.path = Path(directory) / f"{uid}.json" if uid else None
+        self.tried = []
+        self.password = None
+        self.pack = None
+        self.load()
+
+    def load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        self.tried = data.get("tried", [])
+        self.password = data.get("password")
+        self.pack = data.get("pack")
+
+    def save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({
+            "uid": self.uid,
+            "tried": self.tried,
+            "password": self.password,
+            "pack": self.pack,
+            "updated": datetime.now().isoformat()
+        }, indent=2))
+
+    def clear(self):
+        self.tried = []
+        self.password = None
+        self.pack = None
+        if self.path:
+            self.path.unlink(missing_ok=True)
+
+
+class PasswordSweep:
+    """Chunked PWD_AUTH sweep over a candidate list for one card"""
+
+    def __init__(self, uid, candidates=None, chunk_size=16, checkpoint_dir=SWEEP_DIR):
+        self.uid = uid
+        self.candidates = candidates if candidates is not None else default_candidates(uid)
+        self.chunk_size = chunk_size
+        self.checkpoint = SweepCheckpoint(uid, checkpoint_dir)
+
+    def remaining(self):
+        tried = set(self.checkpoint.tried)
+        return [password for password in self.candidates if password not in tried]
+
+    def run(self, run_batch, on_progress=None):
+        """Sweep until the first hit, the end of the list or a lost card
+
+        run_batch(commands) must return one output per command, in order.
+        Returns a dict with password, pack, tried, remaining, card_lost and
+        resumed.
+        """
+        checkpoint = self.checkpoint
+        result = {
+            "password": checkpoint.password,
+            "pack": checkpoint.pack,
+            "tried": len(checkpoint.tried),
+            "remaining": 0,
+            "card_lost": False,
+            "resumed": bool(checkpoint.tried or checkpoint.password)
+        }
+        if checkpoint.password:
+            # The card's PWD may have changed since, re-check before trusting it
+            output = run_batch([auth_command(checkpoint.password)])[0]
+            if not answered(output):
+                result.update(password=None, pack=None, card_lost=True)
+                return result
+            if parse_auth(output) == checkpoint.pack:
+                return result
+            checkpoint.clear()
+            result.update(password=None, pack=None, tried=0)
+
+        pending = self.remaining()
+        while pending:
+            chunk = pending[:self.chunk_size]
+            outputs = run_batch([auth_command(password) for password in chunk])
+
+            for password, output in zip(chunk, outputs):
+                # Lost card or unanswered command: not tried, resume here next time
+                if not answered(output):
+                    result["card_lost"] = True
+                    break
+                pack = parse_auth(output)
+                checkpoint.tried.append(password)
+                if pack:
+                    checkpoint.password = password
+                    checkpoint.pack = pack
+                    break
+
+            checkpoint.save()
+            pending = self.remaining()
+            result.update(password=checkpoint.password, pack=checkpoint.pack, tried=len(checkpoint.tried))
+            if on_progress:
+                on_progress(len(checkpoint.tried), len(self.candidates))
+            if checkpoint.password or result["card_lost"]:
+                break
+
+        result["remaining"] = 0 if checkpoint.password else len(pending)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MFU Password Sweep - resumable Ultralight password sweep')
+    parser.add_argument('--device', '-d', default=None, help='PM3 device path')
+    parser.add_argument('--uid', help='Card UID (default: read with hf 14a info)')
+    parser.add_argument('--dictionary', default=MFU_DICTIONARY, help=f'Password dictionary (default: {MFU_DICTIONARY})')
+    parser.add_argument('--chunk', type=int, default=16, help='Candidates per client round trip')
+    parser.add_argument('--output-dir', '-o', default='.', help='Directory for sweep and dump logs')
+    parser.add_argument('--no-dump', action='store_true', help='Only find the password')
+    parser.add_argument('--no-lease', action='store_true', help='Caller already holds the reader lease')
+    parser.add_argument('--reset', action='store_true', help='Forget the checkpoint of this card first')
+
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    session = PM3Session(device=args.device)
+    lease = None if args.no_lease else DeviceLease(args.device, owner="mfu_sweep")
+
+    def run_batch(commands):
+        return session.run_batch(commands, timeout=5 + 2 * len(commands))
+
+    try:
+        if lease:
+            lease.acquire()
+
+        uid = (args.uid or classify(session.run("hf 14a info", timeout=15)).uid or "").replace(" ", "").upper()
+        if not uid:
+            print("❌ No card found")
+            sys.exit(1)
+
+        sweep = PasswordSweep(uid, default_candidates(uid, args.dictionary), args.chunk)
+        if args.reset:
+            sweep.checkpoint.clear()
+        print(f"🔑 {uid}: {len(sweep.candidates)} candidates, {len(sweep.checkpoint.tried)} already tried")
+
+        result = sweep.run(run_batch, on_progress=lambda done, total: print(f"   {done}/{total} tried"))
+        with open(output_dir / "password_sweep.json", "w") as f:
+            json.dump({"uid": uid, **result}, f, indent=2)
+
+        if not result["password"]:
+            if result["card_lost"]:
+                print(f"⚠️  Card lost after {result['tried']} candidates - present it again to resume")
+            else:
+                print(f"❌ No password found in {result['tried']} candidates")
+            sys.exit(1)
+
+        print(f"✅ Password: {result['password']} (PACK {result['pack']})")
+        if args.no_dump:
+            return
+
+        dump = session.run(f"hf mfu dump -k {result['password']}", timeout=60)
+        (output_dir / f"dump_{result['password']}.log").write_text(dump)
+        if not classify(dump).dump_success:
+            # Do not hand out this password again without a fresh sweep
+            sweep.checkpoint.clear()
+            print("❌ Dump with the found password failed")
+            sys.exit(1)
+        print("✅ Dump complete")
+    except (PM3SessionError, LeaseTimeout) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        session.close()
+        if lease:
+            lease.release()
+
+
+if __name__ == "__main__":
+    main()
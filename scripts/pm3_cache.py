@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+PM3 Command Cache - per-session memoization of read-only PM3 commands
+Results are keyed by command and the confirmed card UID, expire after a
+TTL and are dropped as soon as the card is lost, a different card shows up
+or a write command runs
+"""
+
+import time
+
+from pm3_classifier import classify
+
+# Commands that only read from the reader or the card
+READ_ONLY_COMMANDS = (
+    "auto",
+    "hf search",
+    "lf search",
+    "hf 14a info",
+    "hf mf info",
+    "hf mfu info",
+    "hf mfdes info",
+    "hf mf cgetblk",
+    "lf em 410x_read",
+    "hw status",
+    "hw version",
+    "hw tune",
+)
+
+# Reader-only commands, their output does not depend on the card
+HARDWARE_COMMANDS = ("hw status", "hw version", "hw tune")
+
+# Commands that change card contents, everything cached before is stale
+WRITE_COMMANDS = (
+    "hf mf wrbl",
+    "hf mf restore",
+    "hf mf csetblk",
+    "hf mf csetuid",
+    "hf mf cload",
+    "hf mf cwipe",
+    "hf mf gen3",
+    "hf mfu wrbl",
+    "hf mfu restore",
+    "hf mfu setuid",
+    "hf mfu otptear",
+    "lf em 410x_clone",
+    "lf em 410x clone",
+    "lf t55xx write",
+    "lf t55xx wipe",
+)
+
+# Failures that mean no card is on the reader any more
+CARD_ABSENT = ("card not found", "can't select card", "no tag found", "iso14443a card select failed")
+
+
+def _normalize(command):
+    return " ".join(command.split())
+
+
+def _matches(command, prefixes):
+    return any(command == prefix or command.startswith(prefix + " ") for prefix in prefixes)
+
+
+def is_cacheable(command):
+    return _matches(_normalize(command), READ_ONLY_COMMANDS)
+
+
+def is_write(command):
+    return _matches(_normalize(command), WRITE_COMMANDS)
+
+
+class CommandCache:
+    """TTL cache of read-only command outputs for the card currently on the reader
+
+    Card-dependent entries are only used while the card's UID is confirmed:
+    after a lost card nothing is served until an output shows a UID again.
+    """
+
+    def __init__(self, ttl=300, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.uid = None
+        self.hits = 0
+        self._entries = {}
+
+    def _key(self, command):
+        command = _normalize(command)
+        if _matches(command, HARDWARE_COMMANDS):
+            return command, None
+        if self.uid is None:
+            return None
+        return command, self.uid
+
+    def get(self, command):
+        """Cached output for a command on the current card, or None"""
+        if not self.ttl or not is_cacheable(command):
+            return None
+        key = self._key(command)
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, output = entry
+        if self.clock() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self.hits += 1
+        return output
+
+    def record(self, command, output):
+        """Learn from a finished command: track the card, invalidate, store"""
+        if is_write(command):
+            self.invalidate()
+            return
+
+        record = classify(output)
+        if record.uid:
+            if record.uid != self.uid:
+                self.new_card(record.uid)
+        elif any(failure in record.failures for failure in CARD_ABSENT):
+            self.card_lost()
+
+        if not self.ttl or not is_cacheable(command):
+            return
+        if getattr(output, "timed_out", False) or getattr(output, "returncode", 0) != 0:
+            return
+        if output.startswith("ERROR"):
+            return
+
+        key = self._key(command)
+        if key is None:
+            return
+        self._evict_expired()
+        self._entries[key] = (self.clock(), output)
+
+    def new_card(self, uid):
+        """A (possibly different) card was polled, nothing cached before applies"""
+        self.invalidate()
+        self.uid = uid
+
+    def card_lost(self):
+        """The card left the reader, serve nothing card-dependent until a UID is seen again"""
+        self.invalidate()
+        self.uid = None
+
+    def invalidate(self):
+        """Drop every card-dependent entry"""
+        self._entries = {
+            key: entry for key, entry in self._entries.items()
+            if _matches(key[0], HARDWARE_COMMANDS)
+        }
+
+    def _evict_expired(self):
+        now = self.clock()
+        self._entries = {
+            key: entry for key, entry in self._entries.items() if now - entry[0] <= self.ttl
+        }
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+PM3 Output Classifier - single-pass classification of PM3 client output
+One regex, compiled at import, walks the output once and collects card type,
+subtype, UID, ATQA/SAK, success/failure indicators and recovered keys
+"""
+
+import argparse
+import json
+import re
+import sys
+from functools import lru_cache
+
+# Card type markers in detection priority order
+CARD_TYPES = [
+    ("mifare_classic", r"MIFARE Classic"),
+    ("mifare_ultralight", r"MIFARE Ultralight"),
+    ("desfire", r"DESFire"),
+    ("iclass", r"iClass"),
+    ("em410x", r"EM410x"),
+    ("hid", r"HID"),
+    ("t55xx", r"T55"),
+]
+
+# Subtype markers: (card type, subtype, pattern), first match in this order wins
+SUBTYPES = [
+    ("mifare_classic", "1k", r"1K|1024"),
+    ("mifare_classic", "4k", r"4K|4096"),
+    ("mifare_ultralight", "ev1", r"EV1"),
+    ("mifare_ultralight", "ntag213", r"NTAG213"),
+    ("mifare_ultralight", "ntag215", r"NTAG215"),
+    ("mifare_ultralight", "ntag216", r"NTAG216"),
+]
+DEFAULT_SUBTYPES = {"mifare_classic": "unknown", "mifare_ultralight": "standard"}
+
+DUMP_INDICATORS = [
+    "mfu dump file information",
+    "reading tag memory",
+    "block#",
+    "version.....",
+    "dumping complete",
+    "dump file saved",
+    "blocks dumped",
+    "dump successful",
+    "saved to file",
+]
+KEY_INDICATORS = ["found valid key", "keys found", "key found", "found keys"]
+SUCCESS_INDICATORS = DUMP_INDICATORS + KEY_INDICATORS + ["success"]
+
+FAILURE_INDICATORS = [
+    "card not found",
+    "can't select card",
+    "no tag found",
+    "iso14443a card select failed",
+    "authentication failed",
+    "auth error",
+    "timeout",
+]
+
+HEX_BYTES = r"[0-9A-F]{2}(?: ?[0-9A-F]{2})"
+
+
+def _alternation(phrases):
+    return "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+def _build_pattern():
+    """Every token kind is one outer named group, so lastgroup tells them apart"""
+    parts = [
+        rf"(?P<uid>(?i:\bUID\b)[^:\n]*:\s*(?P<uid_value>{HEX_BYTES}{{3,9}}))",
+        rf"(?P<id>(?i:\bID\b)\s*:?\s*(?P<id_value>{HEX_BYTES}{{2,9}}))",
+        r"(?P<atqa>ATQA\s*:\s*(?P<atqa_value>[0-9A-F]{2}\s?[0-9A-F]{2}))",
+        r"(?P<sak>SAK\s*:\s*(?P<sak_value>[0-9A-F]{2}))",
+        # Key table row: | 000 | FFFFFFFFFFFF | 1 | FFFFFFFFFFFF | 1 |; newer clients add the
+        # trailer block, drop the outer bars and after autopwn give the method (D, N, H...) as result:
+        #  000 | 003 | FFFFFFFFFFFF | D | FFFFFFFFFFFF | 1
+        r"(?P<key_row>(?:\||\b)\s*(?P<row_sector>\d{3})\s*\|(?:\s*\d{3}\s*\|)?\s*(?P<row_key_a>[0-9A-Fa-f]{12}|-{12})\s*\|"
+        r"\s*(?P<row_res_a>[01A-Z])\s*\|\s*(?P<row_key_b>[0-9A-Fa-f]{12}|-{12})\s*\|\s*(?P<row_res_b>[01A-Z])\b(?:\s*\|)?)",
+        r"(?P<saved_file>(?i:saved)[^\n`]*?`?(?P<saved_file_path>[\w./\\-]+\.(?:bin|json|eml))`?)",
+        r"(?P<valid_key>(?i:found valid key)[^\[\n]*\[\s*(?P<valid_key_value>[0-9A-Fa-f]{12})\s*\])",
+        rf"(?P<success>(?i:{_alternation(SUCCESS_INDICATORS)}))",
+        rf"(?P<failure>(?i:{_alternation(FAILURE_INDICATORS)}))",
+    ]
+    for index, (_, pattern) in enumerate(CARD_TYPES):
+        parts.append(f"(?P<type_{index}>{pattern})")
+    for index, (_, _, pattern) in enumerate(SUBTYPES):
+        parts.append(f"(?P<subtype_{index}>{pattern})")
+    return re.compile("|".join(parts))
+
+
+OUTPUT_PATTERN = _build_pattern()
+
+
+class CardRecord:
+    """Everything the analyzers need to know about one PM3 output"""
+
+    def __init__(self):
+        self.card_type = "unknown"
+        self.subtype = None
+        self.uid = None
+        self.atqa = None
+        self.sak = None
+        self.success = set()
+        self.failures = set()
+        self.keys = {}
+        self.found_keys = []
+        self.saved_files = []
+
+    @property
+    def dump_success(self):
+        return any(indicator in self.success for indicator in DUMP_INDICATORS)
+
+    @property
+    def key_found(self):
+        return bool(self.found_keys) or any(indicator in self.success for indicator in KEY_INDICATORS)
+
+    def has(self, indicator):
+        """True if the lowercase success or failure phrase was seen"""
+        return indicator in self.success or indicator in self.failures
+
+    def copy(self):
+        """Independent record, the containers of the cached one are not shared"""
+        record = CardRecord()
+        record.__dict__.update(self.__dict__)
+        record.success = set(self.success)
+        record.failures = set(self.failures)
+        record.keys = {sector: dict(keys) for sector, keys in self.keys.items()}
+        record.found_keys = list(self.found_keys)
+        record.saved_files = list(self.saved_files)
+        return record
+
+    def to_dict(self):
+        return {
+            "type": self.card_type,
+            "subtype": self.subtype,
+            "uid": self.uid,
+            "atqa": self.atqa,
+            "sak": self.sak,
+            "success": sorted(self.success),
+            "failures": sorted(self.failures),
+            "keys": self.keys,
+            "found_keys": self.found_keys,
+            "saved_files": self.saved_files,
+        }
+
+
+def classify(output):
+    """Classify a PM3 output in one pass; results are cached per output text
+
+    Callers get their own copy, so changing a record never leaks into the cache.
+    """
+    return _classify(output).copy()
+
+
+@lru_cache(maxsize=64)
+def _classify(output):
+    record = CardRecord()
+    types_seen = set()
+    subtypes_seen = set()
+    fallback_id = None
+
+    for match in OUTPUT_PATTERN.finditer(output or ""):
+        kind = match.lastgroup
+        if kind == "uid":
+            if record.uid is None:
+                record.uid = re.sub(r"\s", "", match.group("uid_value")).upper()
+        elif kind == "id":
+            if fallback_id is None:
+                fallback_id = re.sub(r"\s", "", match.group("id_value")).upper()
+        elif kind == "atqa":
+            record.atqa = record.atqa or match.group("atqa_value").replace(" ", "")
+        elif kind == "sak":
+            record.sak = record.sak or match.group("sak_value")
+        elif kind == "key_row":
+            sector = int(match.group("row_sector"))
+            for key_type in ("a", "b"):
+                key = match.group(f"row_key_{key_type}")
+                if match.group(f"row_res_{key_type}") != "0" and not key.startswith("-"):
+                    record.keys.setdefault(sector, {})[key_type.upper()] = key.upper()
+                    if key.upper() not in record.found_keys:
+                        record.found_keys.append(key.upper())
+        elif kind == "saved_file":
+            record.saved_files.append(match.group("saved_file_path"))
+            if "saved to file" in match.group(kind).lower():
+                record.success.add("saved to file")
+        elif kind == "valid_key":
+            key = match.group("valid_key_value").upper()
+            if key not in record.found_keys:
+                record.found_keys.append(key)
+            record.success.add("found valid key")
+        elif kind == "success":
+            record.success.add(match.group(kind).lower())
+        elif kind == "failure":
+            record.failures.add(match.group(kind).lower())
+        elif kind.startswith("type_"):
+            types_seen.add(int(kind[5:]))
+        elif kind.startswith("subtype_"):
+            subtypes_seen.add(int(kind[8:]))
+
+    if types_seen:
+        record.card_type = CARD_TYPES[min(types_seen)][0]
+    if record.card_type in DEFAULT_SUBTYPES:
+        record.subtype = DEFAULT_SUBTYPES[record.card_type]
+        for index in sorted(subtypes_seen):
+            card_type, subtype, _ = SUBTYPES[index]
+            if card_type == record.card_type:
+                record.subtype = subtype
+                break
+    if record.uid is None:
+        record.uid = fallback_id
+
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Output Classifier - classify saved PM3 output')
+    parser.add_argument('files', nargs='*', help='Output files to classify (default: stdin)')
+
+    args = parser.parse_args()
+
+    if not args.files:
+        print(json.dumps(classify(sys.stdin.read()).to_dict(), indent=2))
+        return
+
+    for path in args.files:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            record = classify(f.read())
+        print(json.dumps({"file": path, **record.to_dict()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
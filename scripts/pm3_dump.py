@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+PM3 Dump - compact card image model for Ultralight/NTAG and Classic dumps
+One contiguous bytearray (or read-only mmap) per image with memoryview block
+access; loads and saves Proxmark JSON, .bin and .eml without a string
+object per block, so large dump corpora stay cheap to load and compare
+"""
+
+import argparse
+import binascii
+import json
+import mmap
+import re
+import struct
+import sys
+from pathlib import Path
+
+MFC_BLOCK = 16
+MFU_BLOCK = 4
+
+# Classic image sizes in bytes -> subtype
+CLASSIC_SIZES = {320: "mini", 1024: "1k", 2048: "2k", 4096: "4k"}
+
+# Header of a client MFU .bin: version, TBO_0, TBO_1, last page, signature, 3x (counter + tearing)
+MFU_HEADER = struct.Struct("<8s2s1sB32s12s")
+
+# "blocks": { "0": "04ECA1C1", ... } - matched on the raw bytes
+JSON_BLOCK_RE = re.compile(rb'"(\d+)"\s*:\s*"([0-9A-Fa-f]*)"')
+JSON_SECTION_RE = re.compile(rb'"(?P<name>Card|blocks)"\s*:\s*\{(?P<body>[^{}]*)\}', re.DOTALL)
+JSON_FILETYPE_RE = re.compile(rb'"FileType"\s*:\s*"(?P<value>\w+)"')
+
+WHITESPACE = b" \t\r\n"
+
+DUMP_SUFFIXES = (".json", ".bin", ".eml")
+# The client saves the same dump as .json, .bin and .eml; .json carries the card metadata
+SUFFIX_PREFERENCE = {".json": 0, ".bin": 1, ".eml": 2}
+
+
+class DumpError(Exception):
+    """Raised for dump files that cannot be parsed"""
+
+
+def sector_of(block):
+    """Classic sector of a block (4K: sectors 32-39 have 16 blocks)"""
+    return block // 4 if block < 128 else 32 + (block - 128) // 16
+
+
+def sector_blocks(sector):
+    """range of Classic block numbers in a sector"""
+    if sector < 32:
+        return range(sector * 4, sector * 4 + 4)
+    first = 128 + (sector - 32) * 16
+    return range(first, first + 16)
+
+
+def trailer_block(sector):
+    return sector_blocks(sector)[-1]
+
+
+def is_trailer(block):
+    return block == trailer_block(sector_of(block))
+
+
+class Dump:
+    """Card image in one buffer, blocks are memoryview slices of it"""
+
+    def __init__(self, data, block_size, card_type, subtype=None, meta=None, source=None, offset=0):
+        if (len(data) - offset) % block_size:
+            raise DumpError(f"{len(data) - offset} bytes is not a whole number of {block_size}-byte blocks")
+        self.data = data
+        # offset skips a file header without copying the buffer
+        self.view = memoryview(data)[offset:]
+        self.block_size = block_size
+        self.card_type = card_type
+        self.subtype = subtype
+        self.meta = meta or {}
+        self.source = source
+        self._mmap = data if isinstance(data, mmap.mmap) else None
+
+    # --- access -----------------------------------------------------------
+
+    def __len__(self):
+        return len(self.view) // self.block_size
+
+    def block(self, number):
+        if not 0 <= number < len(self):
+            raise IndexError(f"block {number} out of range (0-{len(self) - 1})")
+        start = number * self.block_size
+        return self.view[start:start + self.block_size]
+
+    def __getitem__(self, number):
+        return self.block(number)
+
+    def __setitem__(self, number, value):
+        if self.view.readonly:
+            raise TypeError("dump is memory-mapped read-only, use copy() first")
+        if len(value) != self.block_size:
+            raise ValueError(f"block must be {self.block_size} bytes")
+        start = number * self.block_size
+        self.view[start:start + self.block_size] = value
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self.block(number)
+
+    def __eq__(self, other):
+        return isinstance(other, Dump) and self.block_size == other.block_size and self.view == other.view
+
+    @property
+    def uid(self):
+        """UID from the manufacturer block(s)"""
+        if self.card_type == "mifare_ultralight":
+            if len(self) < 2:
+                return None
+            return (bytes(self.view[0:3]) + bytes(self.view[4:8])).hex().upper()
+        if not len(self):
+            return None
+        # 4-byte NUID unless the BCC says otherwise
+        head = self.view[0:5]
+        if head[0] ^ head[1] ^ head[2] ^ head[3] == head[4]:
+            return bytes(head[:4]).hex().upper()
+        return bytes(self.view[0:7]).hex().upper()
+
+    @property
+    def sectors(self):
+        if self.card_type != "mifare_classic":
+            return 0
+        return sector_of(len(self) - 1) + 1
+
+    def keys(self, sector):
+        """(key A, key B) hex from a Classic sector trailer"""
+        trailer = self.block(trailer_block(sector))
+        return bytes(trailer[0:6]).hex().upper(), bytes(trailer[10:16]).hex().upper()
+
+    def access_bits(self, sector):
+        return bytes(self.block(trailer_block(sector))[6:10]).hex().upper()
+
+    def diff(self, other):
+        """Block numbers whose contents differ (blocks missing on either side included)"""
+        if self.block_size != other.block_size:
+            raise DumpError("cannot compare dumps with different block sizes")
+        common = min(len(self), len(other))
+        changed = [number for number in range(common) if self.block(number) != other.block(number)]
+        changed.extend(range(common, max(len(self), len(other))))
+        return changed
+
+    def copy(self):
+        """Writable in-memory copy (e.g. of a memory-mapped dump)"""
+        return Dump(bytearray(self.view), self.block_size, self.card_type, self.subtype,
+                    dict(self.meta), self.source)
+
+    def close(self):
+        self.view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- saving -----------------------------------------------------------
+
+    def save(self, path):
+        """Save by file extension: .json, .bin or .eml"""
+        path = Path(path)
+        savers = {".json": self.save_json, ".bin": self.save_bin, ".eml": self.save_eml}
+        if path.suffix.lower() not in savers:
+            raise DumpError(f"unknown dump format: {path.suffix}")
+        return savers[path.suffix.lower()](path)
+
+    def save_bin(self, path):
+        with open(path, "wb") as f:
+            if self.card_type == "mifare_ultralight":
+                f.write(self._mfu_header())
+            f.write(self.view)
+        return path
+
+    def save_eml(self, path):
+        text = binascii.hexlify(self.view).upper()
+        width = self.block_size * 2
+        with open(path, "wb") as f:
+            for start in range(0, len(text), width):
+                f.write(text[start:start + width])
+                f.write(b"\n")
+        return path
+
+    def save_json(self, path):
+        text = binascii.hexlify(self.view).upper().decode()
+        width = self.block_size * 2
+        card = dict(self.meta)
+        if self.uid:
+            card.setdefault("UID", self.uid)
+        document = {
+            "Created": "pm3analysis",
+            "FileType": "mfu" if self.card_type == "mifare_ultralight" else "mfcard",
+            "Card": card,
+            "blocks": {str(number): text[number * width:(number + 1) * width] for number in range(len(self))},
+        }
+        if self.card_type == "mifare_classic":
+            document["SectorKeys"] = {
+                str(sector): dict(zip(("KeyA", "KeyB"), self.keys(sector)), AccessConditions=self.access_bits(sector))
+                for sector in range(self.sectors)
+            }
+        Path(path).write_text(json.dumps(document, indent=2))
+        return path
+
+    def _mfu_header(self):
+        meta = self.meta
+
+        def field(name, size):
+            value = bytes.fromhex(meta.get(name) or "")
+            return value.ljust(size, b"\x00")[:size]
+
+        counters = b"".join(field(f"Counter{i}", 3) + field(f"Tearing{i}", 1) for i in range(3))
+        return MFU_HEADER.pack(field("Version", 8), field("TBO_0", 2), field("TBO_1", 1),
+                               max(len(self) - 1, 0), field("Signature", 32), counters)
+
+
+# --- loading ----------------------------------------------------------------
+
+def _card_type_for(block_size, size):
+    if block_size == MFU_BLOCK:
+        return "mifare_ultralight", None
+    return "mifare_classic", CLASSIC_SIZES.get(size)
+
+
+def load(path, use_mmap=False, card_type=None):
+    """Load a dump by file extension; .bin can be memory-mapped read-only"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".json":
+        return load_json(path)
+    if suffix == ".eml":
+        return load_eml(path)
+    if suffix == ".bin":
+        return load_bin(path, use_mmap=use_mmap, card_type=card_type)
+    raise DumpError(f"{path}: unknown dump format")
+
+
+def load_bin(path, use_mmap=False, card_type=None):
+    """Raw .bin image; an MFU client header is split off into meta"""
+    with open(path, "rb") as f:
+        if use_mmap:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file, nothing to map
+                data = b""
+        else:
+            data = bytearray(f.read())
+    size = len(data)
+
+    if card_type == "mifare_classic" or (card_type is None and size in CLASSIC_SIZES):
+        return Dump(data, MFC_BLOCK, "mifare_classic", CLASSIC_SIZES.get(size), source=str(path))
+
+    meta = {}
+    offset = 0
+    if size >= MFU_HEADER.size and (size - MFU_HEADER.size) % MFU_BLOCK == 0:
+        version, tbo0, tbo1, last_page, signature, counters = MFU_HEADER.unpack_from(data)
+        if last_page + 1 == (size - MFU_HEADER.size) // MFU_BLOCK:
+            offset = MFU_HEADER.size
+            meta = {"Version": version.hex().upper(), "TBO_0": tbo0.hex().upper(),
+                    "TBO_1": tbo1.hex().upper(), "Signature": signature.hex().upper()}
+            for i in range(3):
+                meta[f"Counter{i}"] = counters[i * 4:i * 4 + 3].hex().upper()
+                meta[f"Tearing{i}"] = counters[i * 4 + 3:i * 4 + 4].hex().upper()
+    if (size - offset) % MFU_BLOCK:
+        raise DumpError(f"{path}: {size} bytes is neither a Classic nor an Ultralight image")
+
+    return Dump(data, MFU_BLOCK, "mifare_ultralight", meta=meta, source=str(path), offset=offset)
+
+
+def load_eml(path):
+    """One hex block per line; the line length gives the block size"""
+    raw = Path(path).read_bytes()
+    first = raw.split(b"\n", 1)[0].strip()
+    block_size = len(first) // 2
+    if block_size not in (MFU_BLOCK, MFC_BLOCK):
+        raise DumpError(f"{path}: unexpected {block_size}-byte lines")
+    try:
+        data = bytearray(binascii.unhexlify(raw.translate(None, WHITESPACE)))
+    except binascii.Error as e:
+        raise DumpError(f"{path}: {e}") from None
+    card_type, subtype = _card_type_for(block_size, len(data))
+    return Dump(data, block_size, card_type, subtype, source=str(path))
+
+
+def load_json(path):
+    """Proxmark JSON dump; blocks are decoded straight from the file bytes into one buffer"""
+    raw = Path(path).read_bytes()
+    sections = {match.group("name"): match for match in JSON_SECTION_RE.finditer(raw)}
+    if b"blocks" not in sections:
+        raise DumpError(f"{path}: no blocks section")
+    body = sections[b"blocks"]
+    base = body.start("body")
+
+    spans = []
+    block_size = None
+    for match in JSON_BLOCK_RE.finditer(body.group("body")):
+        width = (match.end(2) - match.start(2)) // 2
+        block_size = block_size or width
+        if width != block_size:
+            raise DumpError(f"{path}: block {match.group(1).decode()} has {width} bytes, expected {block_size}")
+        spans.append((int(match.group(1)), base + match.start(2), base + match.end(2)))
+    if not spans:
+        raise DumpError(f"{path}: empty blocks section")
+
+    view = memoryview(raw)
+    data = bytearray(block_size * (max(number for number, _, _ in spans) + 1))
+    for number, start, end in spans:
+        data[number * block_size:(number + 1) * block_size] = binascii.unhexlify(view[start:end])
+
+    meta = {}
+    if b"Card" in sections:
+        try:
+            meta = json.loads(b"{" + sections[b"Card"].group("body") + b"}")
+        except ValueError:
+            meta = {}
+    card_type, subtype = _card_type_for(block_size, len(data))
+    file_type = JSON_FILETYPE_RE.search(raw)
+    if file_type and file_type.group("value").lower().startswith(b"mfu"):
+        card_type, subtype = "mifare_ultralight", None
+    return Dump(data, block_size, card_type, subtype, meta, source=str(path))
+
+
+def find_dumps(root):
+    """Dump files under root, one per saved dump (.json preferred over .bin/.eml)"""
+    root = Path(root)
+    candidates = [root] if root.is_file() else root.rglob("*")
+    chosen = {}
+    for path in candidates:
+        suffix = path.suffix.lower()
+        if suffix not in DUMP_SUFFIXES or path.stem.endswith("-key") or not path.is_file():
+            continue
+        stem = path.with_suffix("")
+        if stem not in chosen or SUFFIX_PREFERENCE[suffix] < SUFFIX_PREFERENCE[chosen[stem].suffix.lower()]:
+            chosen[stem] = path
+    return sorted(chosen.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Dump - inspect, convert and compare card dumps')
+    parser.add_argument('dump', help='Dump file (.json, .bin or .eml)')
+    parser.add_argument('--convert', '-c', metavar='OUTPUT', help='Save in the format of the output extension')
+    parser.add_argument('--diff', metavar='OTHER', help='List blocks that differ from another dump')
+    parser.add_argument('--blocks', action='store_true', help='Print every block')
+
+    args = parser.parse_args()
+
+    try:
+        dump = load(args.dump, use_mmap=not args.convert)
+        print(f"{args.dump}: {dump.card_type} {dump.subtype or ''} UID {dump.uid or '?'}, "
+              f"{len(dump)} blocks of {dump.block_size} bytes")
+        if args.blocks:
+            for number, block in enumerate(dump):
+                print(f"  {number:>3}  {bytes(block).hex(' ').upper()}")
+        if args.diff:
+            with load(args.diff, use_mmap=True) as other:
+                changed = dump.diff(other)
+            print(f"{len(changed)} block(s) differ" + (f": {', '.join(map(str, changed))}" if changed else ""))
+        if args.convert:
+            dump.save(args.convert)
+            print(f"Saved {args.convert}")
+        dump.close()
+    except (OSError, DumpError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+PM3 Session - persistent Proxmark3 client session
+Starts one interactive pm3 client, feeds it commands over stdin and
+splits the combined output back into per-command results
+"""
+
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+from itertools import count
+
+# Prompt printed by the client in interactive mode, e.g. "[usb] pm3 --> "
+PROMPT_RE = re.compile(r"^\s*\[[^\]]*\]\s*pm3\s*-->\s*")
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+MARKER_PREFIX = "PM3SESSION"
+BATCH_MARKER = "PM3BATCH"
+BATCH_MARKER_RE = re.compile(rf"{BATCH_MARKER}_(\d+)")
+
+
+class PM3SessionError(Exception):
+    """Raised when the pm3 client session is not usable"""
+
+
+class PM3Output(str):
+    """Command output that also records how the command ended
+
+    Behaves like the plain output string, so substring checks keep working
+    on whatever the client printed before a timeout.
+    """
+
+    def __new__(cls, stdout="", stderr="", returncode=0, timed_out=False, command=None, duration=None):
+        output = super().__new__(cls, stdout)
+        output.stdout = stdout
+        output.stderr = stderr
+        output.returncode = returncode
+        output.timed_out = timed_out
+        output.command = command
+        output.duration = duration
+        return output
+
+
+def signal_group(process, sig):
+    """Send a signal to the process group of a client started in its own session"""
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def stop_process(process, grace_period):
+    """Interrupt a client with SIGINT, SIGKILL it if it ignores that"""
+    if process.poll() is not None:
+        return
+    signal_group(process, signal.SIGINT)
+    try:
+        process.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        signal_group(process, signal.SIGKILL)
+        process.wait()
+
+
+class PM3Session:
+    """One long-lived pm3 client process shared by all commands of a run"""
+
+    def __init__(self, device=None, pm3_binary="pm3", startup_timeout=30, grace_period=5):
+        self.device = device
+        self.pm3_binary = pm3_binary
+        self.startup_timeout = startup_timeout
+        self.grace_period = grace_period
+        self.process = None
+        self._lines = None
+        self._reader = None
+        self._markers = count(1)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def is_alive(self):
+        """Return True while the client process is running"""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the pm3 client and wait until it accepts commands"""
+        if self.is_alive():
+            return
+
+        command = [self.pm3_binary, '-f']
+        if self.device:
+            command.extend(['-p', self.device])
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            start_new_session=True
+        )
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(
+            target=self._read_output,
+            args=(self.process.stdout, self._lines),
+            daemon=True
+        )
+        self._reader.start()
+
+        # Swallow the startup banner and the device handshake
+        _, pending, _ = self._exchange([], self.startup_timeout)
+        if pending is not None:
+            self._interrupt(None)
+            raise PM3SessionError("pm3 client did not become ready")
+
+    def close(self):
+        """Terminate the client process"""
+        if self.process is None:
+            return
+
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write("quit\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=self.grace_period)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                stop_process(self.process, self.grace_period)
+
+        self.process = None
+        self._lines = None
+        self._reader = None
+
+    def run(self, command, timeout=60):
+        """Execute one command in the session and return its output"""
+        return self.run_batch([command], timeout=timeout)[0]
+
+    def run_batch(self, commands, timeout=60):
+        """Send several commands in one write and return their outputs in order
+
+        A command that runs into the timeout is interrupted and returned as a
+        timed out PM3Output holding everything it printed up to that point.
+        """
+        with self._lock:
+            self.start()
+            started = time.monotonic()
+            results, pending, durations = self._exchange(commands, timeout)
+            outputs = [
+                PM3Output(text, command=command, duration=duration)
+                for command, text, duration in zip(commands, results, durations)
+            ]
+            if pending is None:
+                return outputs
+
+            # The client is still busy: interrupt it and keep what it printed
+            current = commands[len(results)]
+            pending.extend(self._interrupt(current))
+            outputs.append(PM3Output("\n".join(pending), returncode=-1, timed_out=True, command=current,
+                                     duration=time.monotonic() - started - sum(durations)))
+            for command in commands[len(outputs):]:
+                outputs.append(PM3Output("", returncode=-1, timed_out=True, command=command))
+            return outputs
+
+    def _exchange(self, commands, timeout):
+        """Send commands each followed by a marker and collect output up to them
+
+        Returns the finished outputs, the lines collected so far for the
+        command in progress on timeout (None when everything finished) and the
+        run time of every finished command.
+        """
+        markers = [f"{MARKER_PREFIX}_{next(self._markers)}" for _ in commands or [None]]
+        payload = ""
+        for command, marker in zip(commands or [None], markers):
+            if command is not None:
+                payload += f"{command}\n"
+            payload += f"rem {marker}\n"
+
+        try:
+            self.process.stdin.write(payload)
+            self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            self.close()
+            raise PM3SessionError(f"pm3 client closed its input: {e}")
+
+        results = []
+        durations = []
+        lines = []
+        last_marker = time.monotonic()
+        deadline = last_marker + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return results, lines, durations
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+
+            if line is None:
+                output = "\n".join(results + lines)
+                self.close()
+                raise PM3SessionError(f"pm3 client exited unexpectedly:\n{output}")
+            if markers[len(results)] in line:
+                results.append("\n".join(lines))
+                now = time.monotonic()
+                durations.append(now - last_marker)
+                last_marker = now
+                lines = []
+                if len(results) == len(markers):
+                    return results, None, durations
+                continue
+
+            command = commands[len(results)] if commands else None
+            line = self._clean_line(line, command)
+            if line is not None:
+                lines.append(line)
+
+    def _interrupt(self, command):
+        """Stop a busy client and return the output it flushed while exiting"""
+        stop_process(self.process, self.grace_period)
+
+        lines = []
+        while True:
+            try:
+                line = self._lines.get(timeout=self.grace_period)
+            except queue.Empty:
+                break
+            if line is None:
+                break
+            line = self._clean_line(line, command)
+            if line is not None:
+                lines.append(line)
+
+        self.close()
+        return lines
+
+    def _clean_line(self, line, command):
+        """Strip prompts and command echoes, drop marker lines"""
+        line = ANSI_RE.sub("", line.rstrip("\r\n"))
+        if MARKER_PREFIX in line:
+            return None
+        if PROMPT_RE.match(line):
+            rest = PROMPT_RE.sub("", line)
+            if not rest or rest.strip() == (command or "").strip():
+                return None
+            return rest
+        return line
+
+    @staticmethod
+    def _read_output(stream, lines):
+        """Forward client output line by line; None marks end of stream"""
+        for line in iter(stream.readline, ""):
+            lines.put(line)
+        lines.put(None)
+
+
+def build_batch_script(commands):
+    """Join commands into one pm3 -c script with a marker echo after each"""
+    parts = []
+    for index, command in enumerate(commands):
+        parts.append(command)
+        parts.append(f"rem {BATCH_MARKER}_{index}")
+    return "; ".join(parts)
+
+
+def split_batch_output(output, command_count):
+    """Split combined pm3 -c output back into per-command results"""
+    results = [[] for _ in range(command_count)]
+    index = 0
+    for line in output.splitlines():
+        match = BATCH_MARKER_RE.search(line)
+        if match:
+            index = int(match.group(1)) + 1
+            continue
+        line = ANSI_RE.sub("", line)
+        if index >= command_count or PROMPT_RE.match(line):
+            continue
+        results[index].append(line)
+    return ["\n".join(lines) for lines in results]
+
+
+def run_pm3_batch(commands, device=None, timeout=60, pm3_binary="pm3", grace_period=5):
+    """Run a list of commands as a single pm3 -c invocation"""
+    command = [pm3_binary]
+    if device:
+        command.extend(['-p', device])
+    command.extend(['-c', build_batch_script(commands)])
+
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        stop_process(process, grace_period)
+        stdout, stderr = process.communicate()
+        timed_out = True
+
+    # Commands after the last marker that made it out never finished
+    outputs = split_batch_output(stdout, len(commands))
+    finished = len(set(BATCH_MARKER_RE.findall(stdout))) if timed_out else len(commands)
+    return [
+        PM3Output(
+            text,
+            stderr=stderr,
+            returncode=process.returncode,
+            timed_out=index >= finished,
+            command=cmd
+        )
+        for index, (cmd, text) in enumerate(zip(commands, outputs))
+    ]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+PM3 Stream - asyncio streaming runner for long PM3 commands
+Yields client output line by line and ends the command as soon as
+one of the registered success/failure patterns matches
+"""
+
+import asyncio
+import re
+import signal
+
+from pm3_session import ANSI_RE, signal_group
+
+# Card left the field or was never there - no point in waiting for the attack
+CARD_LOST_PATTERNS = {
+    "card_not_found": r"card not found|can't select card|no tag found|iso14443a card select failed"
+}
+
+
+def compile_patterns(patterns):
+    """Compile a {name: regex} mapping into a list of (name, pattern)"""
+    return [(name, re.compile(regex, re.IGNORECASE)) for name, regex in (patterns or {}).items()]
+
+
+class StreamResult:
+    """Output and termination reason of a streamed command"""
+
+    def __init__(self, command):
+        self.command = command
+        self.lines = []
+        self.matched = None
+        self.timed_out = False
+        self.returncode = None
+
+    @property
+    def output(self):
+        return "\n".join(self.lines)
+
+
+class PM3StreamRunner:
+    """Runs one pm3 -c process per command and streams its output"""
+
+    def __init__(self, device=None, pm3_binary="pm3", grace_period=3):
+        self.device = device
+        self.pm3_binary = pm3_binary
+        self.grace_period = grace_period
+
+    def _command_line(self, command):
+        line = [self.pm3_binary, '-f']
+        if self.device:
+            line.extend(['-p', self.device])
+        line.extend(['-c', command])
+        return line
+
+    async def stream(self, command, timeout=60, stop_patterns=None, result=None):
+        """Yield output lines as they arrive, stop at the first matching pattern"""
+        compiled = compile_patterns(stop_patterns)
+        if result is None:
+            result = StreamResult(command)
+
+        process = await asyncio.create_subprocess_exec(
+            *self._command_line(command),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True
+        )
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    result.timed_out = True
+                    break
+                try:
+                    raw = await asyncio.wait_for(process.stdout.readline(), remaining)
+                except asyncio.TimeoutError:
+                    result.timed_out = True
+                    break
+                if not raw:
+                    break
+
+                line = ANSI_RE.sub("", raw.decode(errors="replace").rstrip("\r\n"))
+                result.lines.append(line)
+                yield line
+
+                for name, pattern in compiled:
+                    if pattern.search(line):
+                        result.matched = name
+                        break
+                if result.matched:
+                    break
+        finally:
+            await self._stop(process)
+            # Keep whatever the client flushed while shutting down
+            rest = await process.stdout.read()
+            for raw in rest.decode(errors="replace").splitlines():
+                result.lines.append(ANSI_RE.sub("", raw))
+            result.returncode = process.returncode
+
+    async def run(self, command, timeout=60, stop_patterns=None, on_line=None):
+        """Stream a command to completion and return a StreamResult"""
+        result = StreamResult(command)
+        async for line in self.stream(command, timeout, stop_patterns, result):
+            if on_line:
+                on_line(line)
+        return result
+
+    def run_sync(self, command, timeout=60, stop_patterns=None, on_line=None):
+        """Blocking wrapper around run() for the synchronous analyzers"""
+        return asyncio.run(self.run(command, timeout, stop_patterns, on_line))
+
+    async def _stop(self, process):
+        """Interrupt the client with SIGINT, SIGKILL it after the grace period"""
+        if process.returncode is not None:
+            return
+        signal_group(process, signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), self.grace_period)
+        except asyncio.TimeoutError:
+            signal_group(process, signal.SIGKILL)
+            await process.wait()
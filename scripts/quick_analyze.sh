@@ -12,8 +12,14 @@ BLUE='\033[0;34m'
 NC='\033[0m' # No Color
 
 # Configuration
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PM3_DEVICE="${PM3_DEVICE:-/dev/ttyACM0}"
 TIMEOUT=60
+# Seconds between SIGINT and SIGKILL when a PM3 command times out
+PM3_GRACE=5
+# Reader lease shared with the Python analyzers (see device_lease.py)
+PM3_LEASE_DIR="${PM3_LEASE_DIR:-/tmp/pm3-leases}"
+LEASE_TIMEOUT=600
 OUTPUT_DIR="analysis_$(date +%Y%m%d_%H%M%S)"
 VERBOSE=false
 
@@ -58,6 +64,106 @@ EXAMPLES:
 EOF
 }
 
+# Learned timeout for a command on a card type, never above the given default (see latency_model.py)
+# Usage: adaptive_timeout <command> <card_type> <default>
+adaptive_timeout() {
+    python3 "$SCRIPT_DIR/latency_model.py" timeout "$1" --card-type "$2" --default "$3" 2>/dev/null || echo "$3"
+}
+
+# Usage: record_latency <command> <card_type> <success|failure|timeout> <seconds>
+record_latency() {
+    python3 "$SCRIPT_DIR/latency_model.py" record "$1" --card-type "$2" --outcome "$3" --seconds "$4" &> /dev/null || true
+}
+
+# Outcome of a pm3 -c run from its log: keys or a saved dump, else failure; the status only flags timeouts
+# Usage: log_outcome <log> <exit status>
+log_outcome() {
+    python3 "$SCRIPT_DIR/latency_model.py" outcome "$1" --status "$2" 2>/dev/null || echo failure
+}
+
+# Run several PM3 commands in one pm3 invocation and split the output per command.
+# A "rem PM3BATCH_<n>" marker echo follows every command.
+# Usage: pm3_batch <timeout> <prefix> <cmd>...  (output of command n goes to <prefix>.<n>)
+pm3_batch() {
+    local batch_timeout="$1"
+    local prefix="$2"
+    shift 2
+
+    local script=""
+    local index=0
+    for cmd in "$@"; do
+        script+="$cmd; rem PM3BATCH_$index; "
+        index=$((index + 1))
+    done
+
+    for ((i = 0; i < index; i++)); do
+        : > "$prefix.$i"
+    done
+
+    timeout -s INT -k "$PM3_GRACE" "$batch_timeout" pm3 -c "$script" 2>&1 | awk -v prefix="$prefix" -v count="$index" '
+        BEGIN { current = 0 }
+        match($0, /PM3BATCH_[0-9]+/) {
+            current = substr($0, RSTART + 9, RLENGTH - 9) + 1
+            next
+        }
+        /pm3 -->/ { next }
+        current < count { print > (prefix "." current) }
+    ' || true
+}
+
+# Take the reader lease for the rest of the run so no other analyzer
+# opens the same serial port; the kernel drops it when this script exits.
+# Queues up like device_lease.py: a ticket in <name>.queue/, and the lock
+# is only tried once every older ticket of a live process is gone
+acquire_device_lease() {
+    local name="${PM3_DEVICE#/}"
+    name="${name//\//_}"
+    local queue="$PM3_LEASE_DIR/$name.queue"
+    mkdir -p "$queue"
+    local lock="$PM3_LEASE_DIR/$name.lock"
+    # Opened without truncating, the holder's record stays readable
+    exec 9<> "$lock"
+    
+    local ticket
+    ticket="$queue/$(printf '%020d' "$(date +%s%N)")-$$-1"
+    touch "$ticket"
+    
+    local deadline=$((SECONDS + LEASE_TIMEOUT))
+    local waiting=false
+    while true; do
+        if [[ "$(first_live_ticket "$queue")" == "$ticket" ]] && flock -n 9; then
+            rm -f "$ticket"
+            echo "{\"pid\": $$, \"owner\": \"quick_analyze.sh\", \"device\": \"$PM3_DEVICE\", \"since\": \"$(date +%Y-%m-%dT%H:%M:%S)\"}" > "$lock"
+            return 0
+        fi
+        if (( SECONDS >= deadline )); then
+            rm -f "$ticket"
+            log_error "$PM3_DEVICE is still in use by another analyzer"
+            return 1
+        fi
+        if [[ $waiting == false ]]; then
+            log_info "Waiting for $PM3_DEVICE to become free..."
+            waiting=true
+        fi
+        sleep 0.2
+    done
+}
+
+# Oldest ticket of a live process; tickets of dead processes are removed
+first_live_ticket() {
+    local ticket pid
+    for ticket in "$1"/*; do
+        [[ -e "$ticket" ]] || continue
+        pid="$(basename "$ticket" | cut -d- -f2)"
+        [[ "$pid" =~ ^[0-9]+$ ]] || continue
+        if kill -0 "$pid" 2>/dev/null; then
+            echo "$ticket"
+            return
+        fi
+        rm -f "$ticket"
+    done
+}
+
 check_pm3_connection() {
     log_info "Checking PM3 connection..."
     
@@ -66,45 +172,26 @@ check_pm3_connection() {
         return 1
     fi
     
-    # Test PM3 connection
-    if ! timeout 10 pm3 -c "hw status" &> /dev/null; then
+    # Cached health check: hw ping while the last full check (status, version, tune) is fresh
+    if ! health=$(python3 "$SCRIPT_DIR/hw_health.py" -d "$PM3_DEVICE" --no-lease 2>&1); then
+        [[ -n $health ]] && echo "$health"
         log_error "Cannot connect to PM3 device"
         log_info "Make sure PM3 is connected and accessible at $PM3_DEVICE"
         return 1
     fi
-    
-    log_success "PM3 connection OK"
-    return 0
-}
-
-check_hardware() {
-    log_info "Checking PM3 hardware status..."
-    
-    hw_status=$(pm3 -c "hw status" 2>&1)
-    if [[ $VERBOSE == true ]]; then
-        echo "$hw_status"
-    fi
-    
-    # Check antenna tuning
-    log_info "Checking antenna tuning..."
-    tune_result=$(pm3 -c "hw tune" 2>&1)
     if [[ $VERBOSE == true ]]; then
-        echo "$tune_result"
+        echo "$health"
     fi
     
-    # Basic validation
-    if echo "$hw_status" | grep -q "OK"; then
-        log_success "Hardware status OK"
-    else
-        log_warning "Hardware status may have issues"
-    fi
+    log_success "PM3 connection OK"
+    return 0
 }
 
 detect_card() {
     log_info "Detecting card type..."
     
     # Try automatic detection first
-    auto_result=$(timeout $TIMEOUT pm3 -c "auto" 2>&1 || true)
+    auto_result=$(timeout -s INT -k "$PM3_GRACE" "$TIMEOUT" pm3 -c "auto" 2>&1 || true)
     echo "$auto_result" > "$OUTPUT_DIR/detection.log"
     
     if [[ $VERBOSE == true ]]; then
@@ -137,11 +224,27 @@ test_magic_capabilities() {
     magic_results="$OUTPUT_DIR/magic_test.log"
     echo "=== Magic Card Detection ===" > "$magic_results"
     
-    # Test Gen1A
-    log_info "Testing Gen1A magic..."
-    gen1a_result=$(timeout 10 pm3 -c "hf mf cgetblk 0" 2>&1 || true)
+    # All probes go out in one round trip, results are evaluated in order
+    log_info "Probing Gen1A, Gen2, Gen3 and UFUID magic..."
+    pm3_batch 40 "$OUTPUT_DIR/.magic" \
+        "hf mf cgetblk 0" \
+        "hf 14a info" \
+        "hf 14a raw -a -p -c 90F0CCCC10" \
+        "hf 14a raw -a -p -c 4000"
+    gen1a_result=$(cat "$OUTPUT_DIR/.magic.0")
+    gen2_result=$(cat "$OUTPUT_DIR/.magic.1")
+    gen3_result=$(cat "$OUTPUT_DIR/.magic.2")
+    ufuid_result=$(cat "$OUTPUT_DIR/.magic.3")
+    rm -f "$OUTPUT_DIR"/.magic.*
+    
     echo "Gen1A Test:" >> "$magic_results"
     echo "$gen1a_result" >> "$magic_results"
+    echo "Gen2 Test:" >> "$magic_results"
+    echo "$gen2_result" >> "$magic_results"
+    echo "Gen3 Test:" >> "$magic_results"
+    echo "$gen3_result" >> "$magic_results"
+    echo "UFUID Test:" >> "$magic_results"
+    echo "$ufuid_result" >> "$magic_results"
     
     if echo "$gen1a_result" | grep -q "block data"; then
         log_success "Gen1A magic card detected!"
@@ -149,36 +252,18 @@ test_magic_capabilities() {
         return 0
     fi
     
-    # Test Gen2
-    log_info "Testing Gen2 magic..."
-    gen2_result=$(timeout 10 pm3 -c "hf 14a info" 2>&1 || true)
-    echo "Gen2 Test:" >> "$magic_results"
-    echo "$gen2_result" >> "$magic_results"
-    
     if echo "$gen2_result" | grep -q "Magic capabilities.*Gen 2"; then
         log_success "Gen2 magic card detected!"
         echo "gen2" > "$OUTPUT_DIR/magic_type.txt"
         return 0
     fi
     
-    # Test Gen3
-    log_info "Testing Gen3 magic..."
-    gen3_result=$(timeout 10 pm3 -c "hf 14a raw -a -p -c 90F0CCCC10" 2>&1 || true)
-    echo "Gen3 Test:" >> "$magic_results"
-    echo "$gen3_result" >> "$magic_results"
-    
     if echo "$gen3_result" | grep -q "9000"; then
         log_success "Gen3 magic card detected!"
         echo "gen3" > "$OUTPUT_DIR/magic_type.txt"
         return 0
     fi
     
-    # Test UFUID
-    log_info "Testing UFUID..."
-    ufuid_result=$(timeout 10 pm3 -c "hf 14a raw -a -p -c 4000" 2>&1 || true)
-    echo "UFUID Test:" >> "$magic_results"
-    echo "$ufuid_result" >> "$magic_results"
-    
     if echo "$ufuid_result" | grep -q "0A00"; then
         log_success "UFUID card detected!"
         echo "ufuid" > "$OUTPUT_DIR/magic_type.txt"
@@ -199,7 +284,14 @@ analyze_mifare_classic() {
     
     # Try autopwn first (fastest)
     log_info "Running autopwn attack..."
-    if timeout $TIMEOUT pm3 -c "hf mf autopwn" > "$OUTPUT_DIR/autopwn.log" 2>&1; then
+    local autopwn_timeout autopwn_start autopwn_outcome autopwn_status=0
+    autopwn_timeout=$(adaptive_timeout "hf mf autopwn" mifare_classic "$TIMEOUT")
+    autopwn_start=$SECONDS
+    timeout -s INT -k "$PM3_GRACE" "$autopwn_timeout" pm3 -c "hf mf autopwn" > "$OUTPUT_DIR/autopwn.log" 2>&1 || autopwn_status=$?
+    # autopwn exits 0 even when it found no key, the log tells
+    autopwn_outcome=$(log_outcome "$OUTPUT_DIR/autopwn.log" "$autopwn_status")
+    record_latency "hf mf autopwn" mifare_classic "$autopwn_outcome" $((SECONDS - autopwn_start))
+    if [[ $autopwn_outcome == success ]]; then
         log_success "Autopwn successful!"
         
         # Try to dump
@@ -229,23 +321,14 @@ analyze_mifare_ultralight() {
         fi
     fi
     
-    # Try common passwords
-    log_info "Trying common passwords..."
-    common_passwords=("FFFFFFFF" "00000000" "12345678" "ABCDEFAB")
-    
-    for pwd in "${common_passwords[@]}"; do
-        log_info "Trying password: $pwd"
-        if pm3 -c "hf mfu dump -k $pwd" > "$OUTPUT_DIR/dump_$pwd.log" 2>&1; then
-            if grep -q -E "(MFU dump file information|Reading tag memory|block#|Version\.\.\.\.\.)" "$OUTPUT_DIR/dump_$pwd.log"; then
-                log_success "Dump successful with password: $pwd"
-                return 0
-            fi
-        fi
-    done
-    
-    # Try UID-based password generation
-    log_info "Generating UID-based passwords..."
-    pm3 -c "hf mfu pwdgen -r" > "$OUTPUT_DIR/pwdgen.log" 2>&1
+    # Password sweep: UID-derived passwords and mfu_passwords.dic via cheap PWD_AUTH,
+    # resumable per UID, dumps once with the winning password (lease is already ours)
+    log_info "Running password sweep..."
+    if python3 "$SCRIPT_DIR/mfu_sweep.py" -d "$PM3_DEVICE" -o "$OUTPUT_DIR" --no-lease > "$OUTPUT_DIR/password_sweep.log" 2>&1; then
+        log_success "$(grep -o "Password: [0-9A-F]*" "$OUTPUT_DIR/password_sweep.log") - dump complete"
+        return 0
+    fi
+    log_warning "$(tail -n 1 "$OUTPUT_DIR/password_sweep.log")"
 }
 
 analyze_em410x() {
@@ -255,11 +338,11 @@ analyze_em410x() {
     log_info "Reading EM410x card..."
     pm3 -c "lf em 410x_read" > "$OUTPUT_DIR/em410x_read.log" 2>&1
     
-    if grep -q "EM410x" "$OUTPUT_DIR/em410x_read.log"; then
+    if grep -qiE "EM ?410x" "$OUTPUT_DIR/em410x_read.log"; then
         log_success "EM410x card read successfully!"
         
         # Extract ID for potential cloning
-        card_id=$(grep -oP "EM410x ID:\s*\K[A-F0-9]+" "$OUTPUT_DIR/em410x_read.log" || true)
+        card_id=$(python3 "$SCRIPT_DIR/lf_reader.py" --parse "$OUTPUT_DIR/em410x_read.log" 2>/dev/null | awk '$1 == "em410x" { print $2; exit }' || true)
         if [[ -n "$card_id" ]]; then
             echo "$card_id" > "$OUTPUT_DIR/card_id.txt"
             log_info "Card ID: $card_id"
@@ -364,14 +447,16 @@ main() {
     echo "Timestamp: $(date)"
     echo ""
     
+    # Lease the reader
+    if ! acquire_device_lease; then
+        exit 1
+    fi
+    
     # Check PM3 connection
     if ! check_pm3_connection; then
         exit 1
     fi
     
-    # Check hardware
-    check_hardware
-    
     # Test magic capabilities
     test_magic_capabilities
     
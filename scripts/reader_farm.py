@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+PM3 Reader Farm - parallel batch analysis across several Proxmark3 readers
+Runs one worker process per attached reader, hands each card to whichever
+reader is free and merges all results into one batch output tree
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from multiprocessing.util import Finalize
+from pathlib import Path
+
+from ai_analyzer import PM3AIAnalyzer
+from card_presence import present_uid
+
+READER_GLOB = "/dev/ttyACM*"
+# Times a card whose wait ran out goes back to the end of the queue
+DEFAULT_REQUEUES = 2
+
+# Per-process state, set up once by the pool initializer and the first card
+_worker_reader = None
+_worker_analyzer = None
+_worker_last_uid = None
+
+
+def discover_readers(pattern=READER_GLOB):
+    """Return all attached Proxmark3 serial devices"""
+    return sorted(glob.glob(pattern))
+
+
+def _init_worker(readers):
+    """Bind the worker process to one reader for the lifetime of the pool"""
+    global _worker_reader
+    _worker_reader = readers.get()
+
+
+def _worker_analyzer_for(card_dir, timeout):
+    """The analyzer of this worker, created for its first card and reused after
+
+    Stores, fingerprint index and health record are opened once per reader
+    instead of once per card; the analyzer is closed when the worker exits.
+    """
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = PM3AIAnalyzer(device=_worker_reader, timeout=timeout, output_dir=card_dir)
+        Finalize(None, _worker_analyzer.close, exitpriority=10)
+    else:
+        card_dir.mkdir(parents=True, exist_ok=True)
+        _worker_analyzer.output_dir = card_dir
+        _worker_analyzer.timeout = timeout
+    return _worker_analyzer
+
+
+def _read_uid(analyzer):
+    """Cheap anticollision read, returns the UID or None"""
+    return present_uid(analyzer.poll_presence("hf 14a reader", timeout=5))
+
+
+def _wait_for_card(analyzer, card_wait, poll_interval=1.0):
+    """Wait until a card other than the previously analysed one is on the reader"""
+    deadline = time.monotonic() + card_wait
+    while time.monotonic() < deadline:
+        uid = _read_uid(analyzer)
+        if uid and uid != _worker_last_uid:
+            return uid
+        time.sleep(poll_interval)
+    return None
+
+
+def analyze_card(card_number, output_root, timeout=60, card_wait=120, wait_for_card=True):
+    """Analyse one card on this worker's reader and return its batch record"""
+    global _worker_last_uid
+    reader = _worker_reader
+    card_dir = Path(output_root) / f"card_{card_number:03d}"
+    record = {
+        "card": card_number,
+        "reader": reader,
+        "output_dir": str(card_dir),
+        "started": datetime.now().isoformat()
+    }
+
+    analyzer = _worker_analyzer_for(card_dir, timeout)
+    try:
+        if not analyzer.check_pm3_connection():
+            record["status"] = "reader_error"
+            return record
+
+        if wait_for_card:
+            analyzer.log(f"🎯 Place card {card_number} on {reader}")
+            with analyzer.reader_session():
+                uid = _wait_for_card(analyzer, card_wait)
+            if uid is None:
+                record["status"] = "no_card"
+                return record
+            _worker_last_uid = uid
+            analyzer.cache.new_card(uid)
+
+        card_info, magic_results, analysis_results, recommendations = analyzer.run_analysis()
+        record.update({
+            "status": "done",
+            "uid": card_info.get("uid"),
+            "type": card_info.get("type"),
+            "magic_type": magic_results.get("type"),
+            "attack_success": recommendations.get("attack_success", [])
+        })
+        if not wait_for_card:
+            _worker_last_uid = card_info.get("uid")
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    finally:
+        # The analyzer stays open for the next card, only the reader is given back
+        analyzer.session.close()
+        analyzer.lease.release()
+        record["finished"] = datetime.now().isoformat()
+
+    return record
+
+
+def run_farm(count, output_root, readers=None, timeout=60, card_wait=120, wait_for_card=True,
+             requeues=DEFAULT_REQUEUES):
+    """Process `count` cards across all readers and write the merged summary
+
+    A card nobody placed within card_wait goes back to the end of the queue
+    up to `requeues` times, so the reader moves on to the next card instead
+    of closing the slot.
+    """
+    readers = readers or discover_readers()
+    if not readers:
+        raise RuntimeError(f"No Proxmark3 readers found ({READER_GLOB})")
+
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    print(f"📡 Using {len(readers)} reader(s): {', '.join(readers)}")
+
+    manager = multiprocessing.Manager()
+    reader_queue = manager.Queue()
+    for reader in readers:
+        reader_queue.put(reader)
+
+    records = []
+    attempts = {}
+    with ProcessPoolExecutor(
+        max_workers=len(readers),
+        initializer=_init_worker,
+        initargs=(reader_queue,)
+    ) as pool:
+        def submit(number):
+            attempts[number] = attempts.get(number, 0) + 1
+            return pool.submit(analyze_card, number, str(output_root), timeout, card_wait, wait_for_card)
+
+        pending = {submit(number) for number in range(1, count + 1)}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                number = record["card"]
+                if record["status"] == "no_card" and attempts[number] <= requeues:
+                    print(f"  card {number:03d} on {record['reader']}: no card, requeued")
+                    pending.add(submit(number))
+                    continue
+                record["attempts"] = attempts[number]
+                records.append(record)
+                print(f"  card {number:03d} on {record['reader']}: {record['status']}"
+                      f" {record.get('type', '')} {record.get('uid') or ''}")
+
+    records.sort(key=lambda record: record["card"])
+    write_summary(output_root, readers, records)
+    manager.shutdown()
+    return records
+
+
+def write_summary(output_root, readers, records):
+    """Merge per-card records into batch_summary.json and batch_summary.txt"""
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "readers": readers,
+        "cards": records
+    }
+    with open(output_root / "batch_summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    with open(output_root / "batch_summary.txt", "w") as f:
+        f.write("=== PM3 Batch Summary ===\n")
+        f.write(f"Readers: {', '.join(readers)}\n")
+        f.write(f"Cards: {len(records)}\n\n")
+        for record in records:
+            attacks = ", ".join(record.get("attack_success", [])) or "-"
+            f.write(f"card_{record['card']:03d}  {record['status']:<12} {record['reader']:<14} "
+                    f"{record.get('type') or '-':<18} {record.get('uid') or '-':<16} {attacks}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Reader Farm - parallel multi-reader batch analysis')
+    parser.add_argument('--count', '-n', type=int, required=True, help='Number of cards to process')
+    parser.add_argument('--output', '-o', default='batch_results', help='Batch output directory')
+    parser.add_argument('--readers', nargs='+', help=f'Reader devices (default: all {READER_GLOB})')
+    parser.add_argument('--timeout', '-t', type=int, default=60, help='Command timeout in seconds')
+    parser.add_argument('--card-wait', type=int, default=120, help='Seconds to wait for a card per slot')
+    parser.add_argument('--no-wait', action='store_true', help='Cards are already placed, do not poll')
+    parser.add_argument('--requeue', type=int, default=DEFAULT_REQUEUES,
+                        help=f'Times a card not placed in time is queued again (default: {DEFAULT_REQUEUES})')
+
+    args = parser.parse_args()
+
+    try:
+        run_farm(
+            args.count,
+            args.output,
+            readers=args.readers,
+            timeout=args.timeout,
+            card_wait=args.card_wait,
+            wait_for_card=not args.no_wait,
+            requeues=args.requeue
+        )
+    except KeyboardInterrupt:
+        print("\n⚠️ Batch interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Batch failed: {e}")
+        sys.exit(1)
+
+    print(f"\n✅ Batch complete! Results in: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
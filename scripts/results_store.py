@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+PM3 Results Store - persistent UID-indexed store of analysed cards
+Keeps detection results, magic type, recovered keys/passwords and dump
+paths in SQLite so a known card goes straight to verify-and-dump
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+DATA_DIR = Path(os.environ.get("PM3_DATA_DIR", Path.home() / ".pm3analysis"))
+DEFAULT_DB = DATA_DIR / "pm3analysis.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    uid TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    card_type TEXT,
+    subtype TEXT,
+    atqa TEXT,
+    sak TEXT,
+    magic_type TEXT,
+    keys TEXT,
+    found_keys TEXT,
+    password TEXT,
+    dump_path TEXT,
+    session_dir TEXT,
+    status TEXT,
+    analyses INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (uid, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS cards_uid ON cards (uid);
+"""
+
+# Weakest to strongest; a later run never downgrades a card
+STATUS_RANK = {"inventoried": 0, "analysed": 1, "cracked": 2, "dumped": 3}
+
+
+def status_rank(status):
+    return STATUS_RANK.get(status, -1) if status else -1
+
+
+def card_fingerprint(card_info):
+    """Stable identity of a card model, guards against cloned or random UIDs"""
+    return ":".join(str(card_info.get(field) or "-") for field in ("type", "subtype", "atqa", "sak"))
+
+
+def connect(path=None):
+    """Open a store database, creating it on first use"""
+    path = Path(path or DEFAULT_DB)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+class ResultsStore:
+    """SQLite-backed card results indexed by UID and fingerprint"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB)
+        self.db = connect(self.path)
+
+    def close(self):
+        self.db.close()
+
+    def lookup(self, uid, fingerprint=None):
+        """Previous results for a card, or None if it was never analysed"""
+        if not uid:
+            return None
+        if fingerprint:
+            row = self.db.execute(
+                "SELECT * FROM cards WHERE uid = ? AND fingerprint = ?", (uid, fingerprint)
+            ).fetchone()
+        else:
+            row = self.db.execute(
+                "SELECT * FROM cards WHERE uid = ? ORDER BY last_seen DESC", (uid,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def save(self, uid, fingerprint, card_type=None, subtype=None, atqa=None, sak=None,
+             magic_type=None, keys=None, found_keys=None, password=None, dump_path=None,
+             session_dir=None, status=None):
+        """Insert or update a card; keys are merged with what is already known"""
+        now = datetime.now().isoformat()
+        known = self.lookup(uid, fingerprint) or {}
+
+        merged_keys = known.get("keys") or {}
+        for sector, sector_keys in (keys or {}).items():
+            merged_keys.setdefault(str(sector), {}).update(sector_keys)
+        merged_found = list(known.get("found_keys") or [])
+        for key in found_keys or []:
+            if key not in merged_found:
+                merged_found.append(key)
+
+        # The dump of the strongest run is kept, e.g. a full dump over a later partial one
+        if status_rank(known.get("status")) > status_rank(status):
+            status = known["status"]
+            dump_path = known.get("dump_path") or dump_path
+
+        self.db.execute(
+            """
+            INSERT INTO cards (uid, fingerprint, card_type, subtype, atqa, sak, magic_type, keys,
+                               found_keys, password, dump_path, session_dir, status, analyses,
+                               first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT (uid, fingerprint) DO UPDATE SET
+                card_type = COALESCE(excluded.card_type, card_type),
+                subtype = COALESCE(excluded.subtype, subtype),
+                atqa = COALESCE(excluded.atqa, atqa),
+                sak = COALESCE(excluded.sak, sak),
+                magic_type = COALESCE(excluded.magic_type, magic_type),
+                keys = excluded.keys,
+                found_keys = excluded.found_keys,
+                password = COALESCE(excluded.password, password),
+                dump_path = COALESCE(excluded.dump_path, dump_path),
+                session_dir = COALESCE(excluded.session_dir, session_dir),
+                status = excluded.status,
+                analyses = analyses + 1,
+                last_seen = excluded.last_seen
+            """,
+            (uid, fingerprint, card_type, subtype, atqa, sak, magic_type,
+             json.dumps(merged_keys), json.dumps(merged_found), password,
+             str(dump_path) if dump_path else None, str(session_dir) if session_dir else None,
+             status, now, now)
+        )
+        self.db.commit()
+
+    def known_uids(self):
+        """Every UID in the store"""
+        return {row["uid"] for row in self.db.execute("SELECT DISTINCT uid FROM cards")}
+
+    def magic_counts(self):
+        """{"atqa:sak": {magic type: cards}} over all stored cards with a known magic type"""
+        counts = {}
+        rows = self.db.execute(
+            """
+            SELECT atqa, sak, magic_type, COUNT(*) AS cards FROM cards
+            WHERE magic_type IS NOT NULL GROUP BY atqa, sak, magic_type
+            """
+        )
+        for row in rows:
+            counts.setdefault(f"{row['atqa']}:{row['sak']}", {})[row["magic_type"]] = row["cards"]
+        return counts
+
+    def cards(self):
+        """All stored cards, most recently seen first"""
+        rows = self.db.execute("SELECT * FROM cards ORDER BY last_seen DESC")
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row):
+        card = dict(row)
+        card["keys"] = json.loads(card["keys"] or "{}")
+        card["found_keys"] = json.loads(card["found_keys"] or "[]")
+        return card
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Results Store - list known cards')
+    parser.add_argument('--db', default=None, help=f'Database path (default: {DEFAULT_DB})')
+    parser.add_argument('uid', nargs='?', help='Show one card in detail')
+
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    try:
+        if args.uid:
+            card = store.lookup(args.uid.replace(" ", "").upper())
+            print(json.dumps(card, indent=2) if card else f"Unknown card: {args.uid}")
+            return
+
+        for card in store.cards():
+            print(f"{card['uid']:<16} {card['card_type'] or '-':<18} {card['status'] or '-':<10} "
+                  f"keys={len(card['found_keys'])} analyses={card['analyses']} last={card['last_seen']}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
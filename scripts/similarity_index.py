@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+PM3 Similarity Index - MinHash/LSH search over archived dumps
+Turns dumps, partial reads and known keys into feature sets, indexes their
+MinHash signatures in LSH bands and returns the nearest archived cards with
+their keys/passwords, so a card of an already broken system is tried with
+that system's credentials first
+"""
+
+import argparse
+import hashlib
+import json
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+import pm3_dump
+from dump_store import DumpStore
+from pm3_dump import DumpError
+from results_store import DEFAULT_DB, ResultsStore, card_fingerprint, connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS similarity (
+    digest TEXT PRIMARY KEY,
+    uid TEXT,
+    card_type TEXT,
+    fingerprint TEXT,
+    tokens INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    features BLOB NOT NULL,
+    keys TEXT,
+    password TEXT
+);
+CREATE TABLE IF NOT EXISTS similarity_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, digest)
+);
+CREATE INDEX IF NOT EXISTS similarity_bands_digest ON similarity_bands (digest);
+"""
+
+# 64 hash functions in bands of one row: a partial read sharing a tenth of
+# its features with a card lands in one of its buckets with p > 0.99
+NUM_PERM = 64
+BAND_ROWS = 1
+BANDS = NUM_PERM // BAND_ROWS
+# Each blake2b call yields 16 of the 64 hash values
+_HASH_ROUNDS = NUM_PERM // 16
+_WORDS = struct.Struct("<16I")
+
+# Share of the query's features a card must contain to count as the same system
+MIN_CONTAINMENT = 0.3
+# LSH candidates verified against their feature sets per query
+VERIFY_CANDIDATES = 200
+# Features besides the fingerprint a query needs before it can name a system
+MIN_FEATURES = 3
+EMPTY_BLOCKS = (0x00, 0xFF)
+# Factory keys and transport access bits say nothing about the card system
+DEFAULT_KEYS = {"FFFFFFFFFFFF", "A0A1A2A3A4A5", "B0B1B2B3B4B5", "D3F7D3F7D3F7", "000000000000"}
+TRANSPORT_ACCESS = "FF0780"
+# Card model features (fingerprint, manufacturer data, access bits, version):
+# not searched on, they only rank otherwise equally close cards
+MODEL_PREFIXES = ("fp:", "mf:", "ac", "v:")
+# Dumps indexed per transaction by rebuild()
+REBUILD_BATCH = 200
+
+
+def _is_empty(block):
+    first = block[0]
+    return first in EMPTY_BLOCKS and block.count(first) == len(block)
+
+
+def fingerprint_tokens(card_info):
+    """Features every read has: card model and, if known, the UL version"""
+    tokens = {f"fp:{card_fingerprint(card_info)}"}
+    if card_info.get("version"):
+        tokens.add(f"v:{card_info['version']}")
+    return tokens
+
+
+def key_tokens(keys):
+    """Features from {sector: {"A": key, "B": key}}, as found by fchk or read from trailers"""
+    return {f"k{sector}{key_type}:{key}" for sector, sector_keys in keys.items()
+            for key_type, key in sector_keys.items() if key and key not in DEFAULT_KEYS}
+
+
+def dump_tokens(dump, readable=None):
+    """Layout features of a (partial) dump
+
+    Blocks outside `readable` and empty ones are left out; UID blocks are
+    per card and never features. Positional tokens catch a shared layout,
+    content tokens the same record at another position.
+    """
+    tokens = set()
+    if dump.card_type == "mifare_classic":
+        if len(dump) and (readable is None or 0 in readable):
+            # Manufacturer data after UID/BCC identifies the chip batch
+            tokens.add(f"mf:{bytes(dump.block(0)[5:]).hex().upper()}")
+        for number in range(1, len(dump)):
+            if readable is not None and number not in readable:
+                continue
+            block = bytes(dump.block(number))
+            if pm3_dump.is_trailer(number):
+                sector = pm3_dump.sector_of(number)
+                access = block[6:10].hex().upper()
+                if not access.startswith(TRANSPORT_ACCESS):
+                    tokens.add(f"ac{sector}:{access}")
+                tokens.update(key_tokens({sector: {"A": block[0:6].hex().upper(), "B": block[10:16].hex().upper()}}))
+            elif not _is_empty(block):
+                tokens.add(f"b{number}:{block.hex().upper()}")
+                tokens.add(f"c:{block.hex().upper()}")
+    else:
+        if dump.meta.get("Version"):
+            tokens.add(f"v:{dump.meta['Version']}")
+        for number in range(3, len(dump)):
+            if readable is not None and number not in readable:
+                continue
+            block = bytes(dump.block(number))
+            if not _is_empty(block):
+                tokens.add(f"p{number}:{block.hex().upper()}")
+    return tokens
+
+
+def dump_keys(dump):
+    """Classic keys per sector from the trailers, skipping unread (zero) keys"""
+    if dump.card_type != "mifare_classic":
+        return {}
+    keys = {}
+    for sector in range(dump.sectors):
+        if pm3_dump.trailer_block(sector) >= len(dump):
+            break
+        key_a, key_b = dump.keys(sector)
+        keys[sector] = {key_type: key for key_type, key in (("A", key_a), ("B", key_b)) if key != "000000000000"}
+    return keys
+
+
+def dump_password(dump):
+    """PWD page of an Ultralight EV1/NTAG dump if the client filled it in"""
+    if dump.card_type != "mifare_ultralight" or len(dump) < 20:
+        return None
+    pwd = bytes(dump.block(len(dump) - 2))
+    return pwd.hex().upper() if any(pwd) else None
+
+
+def feature_hashes(tokens):
+    """64-bit hash per token, the exact feature set candidates are verified against"""
+    return {int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little") for token in tokens}
+
+
+def signature(tokens):
+    """MinHash signature (NUM_PERM 32-bit minima) of a feature set"""
+    minima = [0xFFFFFFFF] * NUM_PERM
+    for token in tokens:
+        data = token.encode()
+        for round_ in range(_HASH_ROUNDS):
+            values = _WORDS.unpack(hashlib.blake2b(data, digest_size=64, person=b"pm3mh%d" % round_).digest())
+            offset = round_ * 16
+            for i, value in enumerate(values):
+                if value < minima[offset + i]:
+                    minima[offset + i] = value
+    return minima
+
+
+def band_buckets(sig):
+    """(band, bucket) per LSH band, buckets fit SQLite's signed 64-bit integers"""
+    buckets = []
+    for band in range(BANDS):
+        bucket = 0
+        for value in sig[band * BAND_ROWS:(band + 1) * BAND_ROWS]:
+            bucket = ((bucket << 32) | value) & 0x7FFFFFFFFFFFFFFF
+        buckets.append((band, bucket))
+    return buckets
+
+
+def _lsh_tokens(tokens):
+    # Model features are shared by every card of a model and would put them all in one bucket
+    return [token for token in tokens if not token.startswith(MODEL_PREFIXES)]
+
+
+def _pack(values, typecode="I"):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data, typecode="I"):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class Match:
+    """An archived card near the query"""
+
+    __slots__ = ("digest", "uid", "card_type", "similarity", "containment", "keys", "password")
+
+    def __init__(self, digest, uid, card_type, similarity, containment, keys, password):
+        self.digest = digest
+        self.uid = uid
+        self.card_type = card_type
+        self.similarity = similarity
+        self.containment = containment
+        self.keys = keys
+        self.password = password
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SimilarityIndex:
+    """MinHash signatures of archived dumps with LSH buckets in the shared database"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB)
+        self.db = connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM similarity").fetchone()[0]
+
+    def add(self, digest, tokens, uid=None, card_type=None, fingerprint=None, keys=None, password=None,
+            commit=True):
+        """Index one card's feature set (replaces an earlier entry for the digest)"""
+        sig = signature(_lsh_tokens(tokens))
+        self.db.execute("DELETE FROM similarity_bands WHERE digest = ?", (digest,))
+        self.db.execute(
+            """
+            INSERT OR REPLACE INTO similarity (digest, uid, card_type, fingerprint, tokens, signature, features,
+                                               keys, password)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (digest, uid, card_type, fingerprint, len(tokens), _pack(sig),
+             _pack(sorted(feature_hashes(tokens)), "Q"),
+             json.dumps(keys or {}), password)
+        )
+        self.db.executemany(
+            "INSERT OR IGNORE INTO similarity_bands (band, bucket, digest) VALUES (?, ?, ?)",
+            [(band, bucket, digest) for band, bucket in band_buckets(sig)]
+        )
+        if commit:
+            self.db.commit()
+
+    def add_dump(self, digest, dump, card_info=None, keys=None, password=None, commit=True):
+        """Index an archived dump; keys/password default to what the dump itself holds"""
+        card_info = card_info or {"type": dump.card_type, "subtype": dump.subtype}
+        tokens = dump_tokens(dump) | fingerprint_tokens(card_info)
+        merged = dump_keys(dump)
+        for sector, sector_keys in (keys or {}).items():
+            merged.setdefault(int(sector), {}).update(sector_keys)
+        self.add(digest, tokens, uid=dump.uid, card_type=dump.card_type,
+                 fingerprint=card_fingerprint(card_info), keys=merged,
+                 password=password or dump_password(dump), commit=commit)
+
+    def query(self, tokens, card_type=None, limit=5, exclude_uid=None, min_containment=MIN_CONTAINMENT):
+        """Nearest indexed cards by containment of the query's features
+
+        LSH buckets give the candidates, their stored feature sets the exact
+        containment (share of the query found on the card) and Jaccard
+        similarity used for ranking.
+        """
+        lsh_tokens = _lsh_tokens(tokens)
+        if len(lsh_tokens) < MIN_FEATURES:
+            return []
+        sig = signature(lsh_tokens)
+        features = feature_hashes(lsh_tokens)
+        model = feature_hashes(set(tokens) - set(lsh_tokens))
+        buckets = band_buckets(sig)
+        # Cards sharing the most buckets first, only those are verified
+        rows = self.db.execute(
+            "SELECT s.digest, s.uid, s.card_type, s.features FROM similarity s JOIN ("
+            "SELECT digest, COUNT(*) AS hits FROM similarity_bands WHERE "
+            + " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+            + " GROUP BY digest ORDER BY hits DESC LIMIT ?) c ON c.digest = s.digest",
+            [value for bucket in buckets for value in bucket] + [VERIFY_CANDIDATES]
+        )
+        scored = []
+        for row in rows:
+            if (card_type and row["card_type"] != card_type) or (exclude_uid and row["uid"] == exclude_uid):
+                continue
+            other = set(_unpack(row["features"], "Q"))
+            shared = len(features & other)
+            containment = shared / len(features)
+            similarity = shared / (len(features) + len(other) - shared)
+            if containment >= min_containment:
+                # Model features break ties between equally close cards
+                scored.append((containment, len(model & other), similarity, row["digest"]))
+        scored.sort(reverse=True)
+
+        matches = []
+        for containment, _, similarity, digest in scored[:limit]:
+            row = self.db.execute("SELECT uid, card_type, keys, password FROM similarity WHERE digest = ?",
+                                  (digest,)).fetchone()
+            keys = {int(sector): sector_keys for sector, sector_keys in json.loads(row["keys"] or "{}").items()}
+            matches.append(Match(digest, row["uid"], row["card_type"], round(similarity, 3),
+                                 round(containment, 3), keys, row["password"]))
+        return matches
+
+    def rebuild(self, dump_store, results_store=None):
+        """Index every dump in the dump store, with stored keys/passwords of its UID"""
+        self.db.execute("DELETE FROM similarity")
+        self.db.execute("DELETE FROM similarity_bands")
+        self.db.commit()
+        digests = [entry["digest"] for entry in dump_store.find()]
+        count = 0
+        for first in range(0, len(digests), REBUILD_BATCH):
+            # Read a batch, then write it: no write transaction is open while the stores read
+            batch = []
+            for digest in digests[first:first + REBUILD_BATCH]:
+                try:
+                    dump = dump_store.get(digest)
+                except (KeyError, DumpError):
+                    continue
+                known = results_store.lookup(dump.uid) if results_store and dump.uid else None
+                batch.append((digest, dump, known))
+            for digest, dump, known in batch:
+                card_info = {"type": dump.card_type, "subtype": dump.subtype}
+                if known:
+                    card_info.update(type=known["card_type"] or dump.card_type, subtype=known["subtype"],
+                                     atqa=known["atqa"], sak=known["sak"])
+                self.add_dump(digest, dump, card_info,
+                              keys=known["keys"] if known else None,
+                              password=known["password"] if known else None, commit=False)
+            self.db.commit()
+            count += len(batch)
+        return count
+
+
+def family_keys(matches):
+    """Distinct keys of the matched cards, nearest card first"""
+    keys = []
+    for match in matches:
+        for sector in sorted(match.keys):
+            for key in match.keys[sector].values():
+                if key not in keys:
+                    keys.append(key)
+    return keys
+
+
+def family_passwords(matches):
+    passwords = []
+    for match in matches:
+        if match.password and match.password not in passwords:
+            passwords.append(match.password)
+    return passwords
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PM3 Similarity Index - find archived cards of the same system')
+    parser.add_argument('--db', default=None, help=f'Database path (default: {DEFAULT_DB})')
+    parser.add_argument('--rebuild', action='store_true', help='Index every dump in the dump store')
+    parser.add_argument('--query', metavar='DUMP', help='Nearest archived cards to a (partial) dump file')
+    parser.add_argument('--blocks', metavar='FIRST-LAST', help='Only use these blocks of the query dump')
+    parser.add_argument('--limit', '-n', type=int, default=5, help='Matches to show')
+
+    args = parser.parse_args()
+
+    index = SimilarityIndex(args.db)
+    try:
+        if args.rebuild:
+            dump_store = DumpStore(args.db)
+            results_store = ResultsStore(args.db)
+            try:
+                started = time.monotonic()
+                count = index.rebuild(dump_store, results_store)
+                print(f"✅ Indexed {count} dump(s) in {time.monotonic() - started:.1f}s")
+            finally:
+                dump_store.close()
+                results_store.close()
+        if args.query:
+            readable = None
+            if args.blocks:
+                first, _, last = args.blocks.partition("-")
+                readable = set(range(int(first), int(last or first) + 1))
+            with pm3_dump.load(args.query) as dump:
+                tokens = dump_tokens(dump, readable) | fingerprint_tokens({"type": dump.card_type,
+                                                                           "subtype": dump.subtype})
+                started = time.perf_counter()
+                matches = index.query(tokens, card_type=dump.card_type, limit=args.limit)
+                elapsed = (time.perf_counter() - started) * 1000
+            print(f"{len(matches)} match(es) among {len(index)} indexed card(s) in {elapsed:.1f} ms")
+            for match in matches:
+                credentials = f"{len(family_keys([match]))} key(s)" if match.keys else (match.password or "-")
+                print(f"  {match.digest[:16]}  {match.uid or '-':<16} contains {match.containment:.0%}  "
+                      f"J={match.similarity:.2f}  {credentials}")
+        elif not args.rebuild:
+            print(f"{len(index)} card(s) indexed")
+    except (OSError, DumpError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
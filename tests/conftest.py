@@ -0,0 +1,46 @@
+"""Shared fixtures; the scripts are flat modules, imported from scripts/"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+CARDDATA_DIR = REPO_DIR / "carddata"
+
+sys.path.insert(0, str(REPO_DIR / "scripts"))
+# Keep the stores of the tests out of the user's ~/.pm3analysis
+os.environ.setdefault("PM3_DATA_DIR", tempfile.mkdtemp(prefix="pm3-tests-"))
+os.environ.setdefault("PM3_LEASE_DIR", tempfile.mkdtemp(prefix="pm3-leases-"))
+
+import pm3_dump  # noqa: E402
+
+TRANSPORT_ACCESS = bytes.fromhex("FF078069")
+
+
+def classic_image(sectors=16, key_a="FFFFFFFFFFFF", key_b="FFFFFFFFFFFF", access=TRANSPORT_ACCESS):
+    """1K-style Classic image: UID 01020304, numbered data blocks, one trailer layout"""
+    blocks = []
+    for block in range(sectors * 4):
+        if block == 0:
+            blocks.append(bytes.fromhex("0102030404080400") + bytes(8))
+        elif pm3_dump.is_trailer(block):
+            blocks.append(bytes.fromhex(key_a) + access + bytes.fromhex(key_b))
+        else:
+            blocks.append(bytes([block]) * 16)
+    return bytearray(b"".join(blocks))
+
+
+@pytest.fixture
+def classic_dump():
+    dump = pm3_dump.Dump(classic_image(), pm3_dump.MFC_BLOCK, "mifare_classic", "1k")
+    yield dump
+    dump.close()
+
+
+@pytest.fixture
+def mfu_json():
+    """Client JSON dump of an Ultralight EV1 from carddata/"""
+    return CARDDATA_DIR / "hf-mfu-04ECA16A7B1390-dump.json"
@@ -0,0 +1,61 @@
+import pytest
+
+from ai_analyzer import PM3AIAnalyzer
+from mfu_sweep import SweepCheckpoint, auth_command
+from pm3_session import PM3Output
+from results_store import ResultsStore, card_fingerprint
+
+UID = "041F98EA1E3E81"
+# Amiibo password of UID, the first candidate of the sweep
+PASSWORD = "5FD37ECA"
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    analyzer = PM3AIAnalyzer(output_dir=tmp_path / "analysis", use_store=False)
+    analyzer.results_store = ResultsStore(tmp_path / "results.db")
+    SweepCheckpoint(UID).clear()
+    yield analyzer
+    SweepCheckpoint(UID).clear()
+    analyzer.close()
+
+
+def fake_reader(analyzer, responses):
+    """Answer commands from responses, anything else prints nothing"""
+    def run(command, timeout=None):
+        return PM3Output(responses.get(command, ""), command=command)
+
+    analyzer.run_pm3_command = run
+    analyzer.run_pm3_batch = lambda commands, timeout=None, log_name=None: {
+        command: run(command) for command in commands
+    }
+
+
+def test_sweep_hit_with_failed_dump_stores_the_swept_password(analyzer):
+    fake_reader(analyzer, {
+        "hf mfu info": f"[+]  UID: {UID[:2]} {UID[2:4]} {UID[4:6]} {UID[6:8]} {UID[8:10]} {UID[10:12]} {UID[12:]}",
+        "hf mfu dump": "[!] Authentication failed",
+        auth_command(PASSWORD): "[+] 80 80 F7 F8 [ F7 F8 ]",
+        f"hf mfu dump -k {PASSWORD}": "[!] Authentication failed",
+    })
+    card_info = {"uid": UID, "type": "mifare_ultralight"}
+
+    results = analyzer.analyze_mifare_ultralight(card_info)
+    assert results["attacks"]["password_sweep"]["success"]
+    assert not results["attacks"][f"password_{PASSWORD}"]["success"]
+
+    analyzer.store_results(card_info, {"type": None}, results)
+    stored = analyzer.results_store.lookup(UID, card_fingerprint(card_info))
+    assert stored["password"] == PASSWORD
+    assert stored["status"] == "cracked"
+
+
+def test_failed_sweep_stores_no_password(analyzer):
+    fake_reader(analyzer, {"hf mfu dump": "[!] Authentication failed"})
+    card_info = {"uid": UID, "type": "mifare_ultralight"}
+
+    results = analyzer.analyze_mifare_ultralight(card_info)
+    analyzer.store_results(card_info, {"type": None}, results)
+    stored = analyzer.results_store.lookup(UID, card_fingerprint(card_info))
+    assert stored["password"] is None
+    assert stored["status"] == "analysed"
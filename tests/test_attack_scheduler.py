@@ -0,0 +1,109 @@
+import pytest
+
+from attack_scheduler import (
+    DEFAULT_STEPS,
+    AttackStats,
+    Budget,
+    detect_prng,
+    fully_keyed,
+    learned_key_prior,
+    merge_keys,
+    next_step,
+    plan,
+    reported_keys,
+    write_key_file,
+)
+
+STEPS = {step.name: step for step in DEFAULT_STEPS}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stats(tmp_path):
+    stats = AttackStats(tmp_path / "stats.db")
+    yield stats
+    stats.close()
+
+
+def names(steps):
+    return [step.name for step in steps]
+
+
+def test_detect_prng():
+    assert detect_prng("[+] Prng detection....... weak") == "weak"
+    assert detect_prng("[+] PRNG: HARD") == "hard"
+    assert detect_prng("[=] static nonce detected\n[+] Prng.... static") == "static"
+    assert detect_prng("[+] Magic capabilities... Gen 1a") is None
+
+
+def test_plan_orders_by_payoff_per_second():
+    assert names(plan(DEFAULT_STEPS, "weak")) == \
+        ["learned_keys", "dictionary", "darkside", "autopwn", "client_dictionary"]
+    # No darkside on a hard PRNG, hardnested needs a known key
+    assert names(plan(DEFAULT_STEPS, "hard")) == ["learned_keys", "dictionary", "autopwn", "client_dictionary"]
+    assert "hardnested" in names(plan(DEFAULT_STEPS, "hard", have_key=True))
+
+
+def test_priors_switch_steps_on_and_off():
+    priors = {"family_keys": 0.9, "learned_keys": learned_key_prior({"site": 0, "model": 0, "total": 0})}
+    order = names(plan(DEFAULT_STEPS, "weak", priors=priors))
+    assert order[0] == "family_keys"
+    assert "learned_keys" not in order
+    assert learned_key_prior({"site": 4, "model": 0, "total": 9}) > learned_key_prior({"site": 0, "model": 2, "total": 9})
+
+
+def test_budget_cuts_timeouts_and_skips_steps_that_do_not_fit():
+    clock = Clock()
+    budget = Budget(100, clock=clock)
+    assert budget.timeout_for(STEPS["darkside"]) == 100
+
+    clock.now = 75
+    assert budget.remaining == 25
+    assert not budget.allows(STEPS["darkside"])
+    assert budget.timeout_for(STEPS["dictionary"]) == 25
+    assert names(plan(DEFAULT_STEPS, "weak", budget=budget)) == ["learned_keys", "dictionary", "client_dictionary"]
+
+    clock.now = 120
+    assert budget.remaining == 0
+    assert next_step(DEFAULT_STEPS, set(), "weak", False, budget) is None
+
+
+def test_unlimited_budget():
+    budget = Budget()
+    assert budget.remaining == float("inf")
+    assert budget.timeout_for(STEPS["hardnested"]) == 300
+
+
+def test_recorded_failures_push_a_step_back(stats):
+    for _ in range(3):
+        stats.record("darkside", "weak", False, 100)
+    probability, seconds = stats.estimate(STEPS["darkside"], "weak")
+    assert probability == pytest.approx(0.9 * 2 / 5)
+    assert seconds == 100
+    assert names(plan(DEFAULT_STEPS, "weak", stats=stats))[-1] == "darkside"
+    # History of another PRNG type does not count
+    assert stats.estimate(STEPS["darkside"], "static") == (0.9, 60)
+
+
+def test_keys_from_attacks():
+    keys = merge_keys({0: {"A": "FFFFFFFFFFFF"}}, {0: {"B": "A0A1A2A3A4A5"}, 1: {"A": "FFFFFFFFFFFF"}})
+    assert keys == {0: {"A": "FFFFFFFFFFFF", "B": "A0A1A2A3A4A5"}, 1: {"A": "FFFFFFFFFFFF"}}
+    assert not fully_keyed(keys, 2)
+    assert fully_keyed(merge_keys(keys, {1: {"B": "B0B1B2B3B4B5"}}), 2)
+
+    darkside = "[+] found valid key [ a0a1a2a3a4a5 ]"
+    assert reported_keys(darkside, 3, "B") == {3: {"B": "A0A1A2A3A4A5"}}
+    assert reported_keys("[-] darkside failed", 3, "B") == {}
+
+
+def test_key_file_holds_all_a_keys_then_all_b_keys(tmp_path):
+    path = write_key_file(tmp_path / "keys.bin", {0: {"A": "A0A1A2A3A4A5"}, 1: {"B": "B0B1B2B3B4B5"}}, 2)
+    assert path.read_bytes() == bytes.fromhex(
+        "A0A1A2A3A4A5" "FFFFFFFFFFFF" "FFFFFFFFFFFF" "B0B1B2B3B4B5")
@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+
+from card_presence import CardPresence, present_uid, run_auto_batch
+from pm3_cache import CommandCache
+from pm3_session import PM3Output
+
+CARD_A = "[+]  UID: 04 EC A1 6A 7B 13 90\n[+] ATQA: 00 44\n[+]  SAK: 00 [2]"
+CARD_B = "[+]  UID: 01 02 03 04\n[+] ATQA: 00 04\n[+]  SAK: 08 [2]"
+EMPTY = "[!] No known/supported 13.56 MHz tags found"
+UID_A = "04ECA16A7B1390"
+UID_B = "01020304"
+
+
+class Script:
+    """Replays presence reads in order, repeating the last one"""
+
+    def __init__(self, *outputs):
+        self.outputs = list(outputs)
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        return self.outputs.pop(0) if len(self.outputs) > 1 else self.outputs[0]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def presence(*outputs, **kwargs):
+    clock = Clock()
+    return CardPresence(Script(*outputs), clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_present_uid():
+    assert present_uid(CARD_A) == UID_A
+    assert present_uid(EMPTY) is None
+    assert present_uid("ERROR: device not found") is None
+    assert present_uid(PM3Output(CARD_A, returncode=-1, timed_out=True)) is None
+
+
+def test_arrival_and_removal_after_two_empty_reads():
+    tracker = presence(EMPTY, CARD_A, CARD_A, EMPTY, CARD_A, EMPTY, EMPTY)
+    events = [tracker.poll() for _ in range(7)]
+    assert events == [None, ("arrived", UID_A), None, None, None, None, ("removed", UID_A)]
+    assert tracker.uid is None
+    assert tracker.read.commands[0] == "hf 14a reader"
+
+
+def test_errors_do_not_count_as_empty_reads():
+    tracker = presence(CARD_A, "ERROR: timeout", "ERROR: timeout", "ERROR: timeout", CARD_A)
+    assert [tracker.poll() for _ in range(5)] == [("arrived", UID_A), None, None, None, None]
+
+
+def test_a_different_card_is_an_arrival():
+    tracker = presence(CARD_A, CARD_B, band="lf")
+    assert tracker.poll() == ("arrived", UID_A)
+    assert tracker.poll() == ("arrived", UID_B)
+    assert tracker.read.commands == ["lf search", "lf search"]
+
+
+def test_wait_skips_cards_that_are_not_accepted():
+    tracker = presence(CARD_A, EMPTY, EMPTY, CARD_B)
+    events = []
+    assert tracker.wait(lambda uid: uid != UID_A, on_event=lambda *event: events.append(event)) == UID_B
+    assert events == [("arrived", UID_A), ("removed", UID_A), ("arrived", UID_B)]
+
+
+def test_wait_times_out():
+    tracker = presence(EMPTY, interval=0.5)
+    assert tracker.wait(timeout=2) is None
+    assert len(tracker.read.commands) == 4
+
+
+class FakeAnalyzer:
+    """Reader phase and report phase of the analyzer for two cards"""
+
+    def __init__(self, reads):
+        self.poll_presence = Script(*reads)
+        self.cache = CommandCache()
+        self.device = "/dev/ttyACM0"
+        self.output_dir = None
+        self.logs = []
+        self.analysed = []
+        self.sessions = 0
+
+    def log(self, message, level="INFO"):
+        self.logs.append((level, message))
+
+    @contextmanager
+    def reader_session(self):
+        self.sessions += 1
+        yield
+
+    def analyze_card(self):
+        uid = self.cache.uid
+        self.analysed.append(uid)
+        if uid == UID_B:
+            raise RuntimeError("card lost during analysis")
+        return {"uid": uid, "type": "mifare_ultralight"}, {"type": None}, {"attacks": {}}
+
+    def report_card(self, card_info, magic_results, analysis_results, card_dir):
+        (card_dir / "report.txt").write_text(card_info["uid"])
+        return {"attack_success": ["dump"]}
+
+
+def test_auto_batch_analyses_each_new_card_once(tmp_path):
+    analyzer = FakeAnalyzer([CARD_A, CARD_A, EMPTY, EMPTY, CARD_A, EMPTY, EMPTY, CARD_B])
+    records = run_auto_batch(analyzer, tmp_path / "batch", count=2, interval=0)
+    assert analyzer.analysed == [UID_A, UID_B]
+    assert [record["uid"] for record in records] == [UID_A, UID_B]
+    assert records[0]["status"] == "done"
+    assert records[0]["attack_success"] == ["dump"]
+    assert (tmp_path / "batch" / "card_001" / "report.txt").read_text() == UID_A
+    assert records[1]["status"] == "error"
+    assert records[1]["error"] == "card lost during analysis"
+    assert analyzer.sessions == 2
+    assert ("WARNING", f"Card {UID_A} already processed in this batch") in analyzer.logs
+
+
+def test_auto_batch_ends_when_no_new_card_shows_up(tmp_path):
+    analyzer = FakeAnalyzer([EMPTY])
+    assert run_auto_batch(analyzer, tmp_path / "batch", idle_timeout=0.2, interval=0.05) == []
+    assert ("WARNING", "No new card, ending batch") in analyzer.logs
@@ -0,0 +1,110 @@
+import os
+import re
+import time
+
+import pytest
+
+import pm3_dump
+from clone_writer import CloneError, CloneWriter, TargetImage, latest_dump
+from conftest import classic_image
+
+
+def table(blocks):
+    return "\n".join(f"[=] {number:3} | {' '.join(f'{b:02X}' for b in data)} | ................"
+                     for number, data in sorted(blocks.items()))
+
+
+class Gen1aCard:
+    """Backdoor-writable card answering cgetblk/cgetsc/csetblk"""
+
+    def __init__(self, image):
+        self.image = bytearray(image)
+        self.commands = []
+
+    def block(self, number):
+        return bytes(self.image[number * 16:(number + 1) * 16])
+
+    def run_batch(self, commands):
+        self.commands.extend(commands)
+        outputs = []
+        for command in commands:
+            if match := re.match(r"hf mf cgetblk --blk (\d+)", command):
+                number = int(match.group(1))
+                outputs.append(table({number: self.block(number)}))
+            elif match := re.match(r"hf mf cgetsc -s (\d+)", command):
+                sector = int(match.group(1))
+                outputs.append(table({number: self.block(number) for number in pm3_dump.sector_blocks(sector)}))
+            elif match := re.match(r"hf mf csetblk --blk (\d+) -d ([0-9A-F]{32})", command):
+                number = int(match.group(1))
+                self.image[number * 16:(number + 1) * 16] = bytes.fromhex(match.group(2))
+                outputs.append("[+] Write ( ok )")
+            else:
+                outputs.append("[!] unexpected command")
+        return outputs
+
+
+def test_plan_orders_block0_data_then_trailers(classic_dump):
+    writer = CloneWriter(classic_dump, run_batch=None, mode="gen1a")
+    target = TargetImage()
+    target.blocks = {number: bytes(classic_dump[number]) for number in range(len(classic_dump))}
+    for number in (11, 0, 7, 9, 3):
+        target.blocks[number] = bytes(16)
+    del target.blocks[62]
+    assert writer.plan(target) == [0, 9, 62, 3, 7, 11]
+
+
+def test_plan_keyed_trailer_needs_both_keys_confirmed(classic_dump):
+    writer = CloneWriter(classic_dump, run_batch=None, mode="keyed")
+    target = TargetImage()
+    target.blocks = {number: bytes(classic_dump[number]) for number in range(len(classic_dump))}
+    target.confirmed_keys = {sector: {"A", "B"} for sector in range(16)}
+    target.confirmed_keys[2] = {"A"}
+    assert writer.plan(target) == [11]
+
+
+def test_gen1a_delta_clone_writes_only_differing_blocks(classic_dump):
+    image = classic_image()
+    image[5 * 16:6 * 16] = bytes(16)
+    image[0:16] = bytes.fromhex("DEADBEEF22080400") + bytes(8)
+    card = Gen1aCard(image)
+    writer = CloneWriter(classic_dump, card.run_batch)
+
+    result = writer.clone()
+    assert result["mode"] == "gen1a"
+    assert result["plan"] == [0, 5]
+    assert result["written"] == [0, 5]
+    assert result["remaining"] == []
+    assert [command for command in card.commands if "csetblk" in command] == [
+        f"hf mf csetblk --blk 0 -d {bytes(classic_dump[0]).hex().upper()}",
+        f"hf mf csetblk --blk 5 -d {bytes(classic_dump[5]).hex().upper()}",
+    ]
+    assert bytes(card.image) == bytes(classic_dump.view)
+
+
+def test_dry_run_writes_nothing(classic_dump):
+    card = Gen1aCard(bytes(1024))
+    result = CloneWriter(classic_dump, card.run_batch, mode="gen1a").clone(dry_run=True)
+    assert len(result["plan"]) == 64
+    assert not any("csetblk" in command for command in card.commands)
+
+
+def test_only_classic_dumps(mfu_json):
+    with pm3_dump.load(mfu_json) as dump:
+        with pytest.raises(CloneError):
+            CloneWriter(dump, run_batch=None)
+
+
+def test_latest_dump_picks_newest_numbered_dump(tmp_path, classic_dump):
+    older = classic_dump.save(tmp_path / "hf-mf-01020304-dump.bin")
+    newer = classic_dump.save(tmp_path / "hf-mf-01020304-dump-001.bin")
+    key_file = tmp_path / "hf-mf-01020304-key.bin"
+    key_file.write_bytes(bytes(96))
+    now = time.time()
+    os.utime(older, (now - 60, now - 60))
+    os.utime(newer, (now - 30, now - 30))
+    assert latest_dump(tmp_path) == newer
+
+
+def test_latest_dump_without_dumps(tmp_path):
+    with pytest.raises(CloneError):
+        latest_dump(tmp_path)
@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import device_lease
+from device_lease import DeviceLease, LeaseTimeout, acquire_any, lease_name
+
+DEVICE = "/dev/ttyACM7"
+
+
+@pytest.fixture(autouse=True)
+def lease_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(device_lease, "LEASE_DIR", tmp_path)
+    return tmp_path
+
+
+def queue_ticket(lease, pid, age=10):
+    """Ticket of another waiter that arrived age seconds ago"""
+    lease.queue_dir.mkdir(parents=True, exist_ok=True)
+    ticket = lease.queue_dir / f"{time.time_ns() - age * 10**9:020d}-{pid}-1"
+    ticket.touch()
+    return ticket
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_lease_name_is_shared_with_the_shell_script():
+    assert lease_name("/dev/ttyACM0") == "dev_ttyACM0"
+
+
+def test_lease_is_exclusive_until_released():
+    first = DeviceLease(DEVICE, owner="first")
+    second = DeviceLease(DEVICE, owner="second")
+    first.acquire()
+    try:
+        assert first.held
+        assert not second.try_acquire()
+        with pytest.raises(LeaseTimeout, match=f"pid {os.getpid()} \\(first\\)"):
+            second.acquire(timeout=0.3)
+    finally:
+        first.release()
+    assert not first.held
+    assert second.try_acquire()
+    second.release()
+
+
+def test_waiting_ticket_of_a_live_process_goes_first():
+    lease = DeviceLease(DEVICE, poll_interval=0.05)
+    ticket = queue_ticket(lease, os.getpid())
+    # The lock itself is free, but an older waiter is queued
+    assert not lease.try_acquire()
+    with pytest.raises(LeaseTimeout):
+        lease.acquire(timeout=0.3)
+    assert ticket.exists()
+
+    ticket.unlink()
+    lease.acquire(timeout=1)
+    assert lease.held
+    lease.release()
+
+
+def test_tickets_of_dead_processes_are_dropped():
+    lease = DeviceLease(DEVICE, poll_interval=0.05)
+    ticket = queue_ticket(lease, dead_pid())
+    lease.acquire(timeout=1)
+    lease.release()
+    assert not ticket.exists()
+    assert list(lease.queue_dir.iterdir()) == []
+
+
+def test_own_ticket_is_removed_on_timeout():
+    holder = DeviceLease(DEVICE)
+    holder.acquire()
+    try:
+        with pytest.raises(LeaseTimeout):
+            DeviceLease(DEVICE, poll_interval=0.05).acquire(timeout=0.2)
+    finally:
+        holder.release()
+    assert list(holder.queue_dir.iterdir()) == []
+
+
+def test_acquire_any_takes_the_free_device():
+    busy = DeviceLease("/dev/ttyACM1")
+    busy.acquire()
+    try:
+        lease = acquire_any(["/dev/ttyACM1", "/dev/ttyACM2"], timeout=1, poll_interval=0.05)
+        assert lease.device == "/dev/ttyACM2"
+        lease.release()
+        with pytest.raises(LeaseTimeout):
+            acquire_any(["/dev/ttyACM1"], timeout=0.2, poll_interval=0.05)
+    finally:
+        busy.release()
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import dict_compiler
+from dict_compiler import (
+    CompiledDictionary,
+    DictionaryError,
+    compile_dictionary,
+    guess_width,
+    load,
+)
+from key_store import KeyStore
+
+KEYS = """# site keys
+ffffffffffff
+A0A1 A2A3 A4A5
+D3F7D3F7D3F7  # NDEF
+FFFFFFFFFFFF
+12345
+ZZZZZZZZZZZZ
+B0B1B2B3B4B5
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "site.dic"
+    path.write_text(KEYS)
+    return path
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "hits.db"
+    monkeypatch.setattr(dict_compiler, "DEFAULT_DB", path)
+    return path
+
+
+def test_guess_width():
+    assert guess_width("mfu_passwords.dic", "") == 4
+    assert guess_width("site.dic", KEYS) == 6
+    with pytest.raises(DictionaryError):
+        guess_width("empty.dic", "# nothing here\n")
+
+
+def test_compile_drops_invalid_and_duplicate_entries(source, tmp_path):
+    report = compile_dictionary(source, tmp_path / "out", hits={})
+    assert report["width"] == 6
+    assert report["entries"] == 4
+    assert report["invalid"] == [(6, "12345"), (7, "ZZZZZZZZZZZZ")]
+    assert report["duplicates"] == [(5, "FFFFFFFFFFFF")]
+    assert (tmp_path / "out" / "site.dic").read_text().split() == \
+        ["FFFFFFFFFFFF", "A0A1A2A3A4A5", "D3F7D3F7D3F7", "B0B1B2B3B4B5"]
+
+
+def test_hits_rank_entries_and_keep_file_order_on_ties(source, tmp_path):
+    report = compile_dictionary(source, tmp_path / "out", hits={"B0B1B2B3B4B5": 5, "D3F7D3F7D3F7": 1})
+    assert report["ranked"] == 2
+    compiled = CompiledDictionary(tmp_path / "out" / "site.bin")
+    assert compiled.keys() == ["B0B1B2B3B4B5", "D3F7D3F7D3F7", "FFFFFFFFFFFF", "A0A1A2A3A4A5"]
+    assert compiled.keys(limit=1) == ["B0B1B2B3B4B5"]
+    assert compiled.text_path.read_text().split() == compiled.keys()
+
+
+def test_membership_uses_the_sorted_index(source, tmp_path):
+    compile_dictionary(source, tmp_path / "out", hits={})
+    compiled = CompiledDictionary(tmp_path / "out" / "site.bin")
+    assert len(compiled) == 4
+    assert "a0a1a2a3a4a5" in compiled
+    assert "D3F7 D3F7 D3F7" in compiled
+    assert "000000000000" not in compiled
+    assert "FFFFFFFF" not in compiled
+    assert "not hex" not in compiled
+
+
+def test_corrupt_compiled_dictionary_is_rejected(source, tmp_path):
+    compile_dictionary(source, tmp_path / "out", hits={})
+    path = tmp_path / "out" / "site.bin"
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(DictionaryError, match="size does not match"):
+        CompiledDictionary(path)
+    path.write_bytes(b"JUNK" + path.read_bytes()[4:])
+    with pytest.raises(DictionaryError, match="not a compiled dictionary"):
+        CompiledDictionary(path)
+
+
+def test_load_recompiles_when_the_source_changes(source, tmp_path, db_path):
+    out = tmp_path / "out"
+    assert len(load(source, out)) == 4
+    source.write_text(KEYS + "C0C1C2C3C4C5\n")
+    os.utime(source, (source.stat().st_atime, source.stat().st_mtime + 10))
+    assert "C0C1C2C3C4C5" in load(source, out)
+
+
+def test_load_reranks_when_new_hits_are_learned(source, tmp_path, db_path):
+    out = tmp_path / "out"
+    assert load(source, out).keys(limit=1) == ["FFFFFFFFFFFF"]
+    store = KeyStore(db_path)
+    store.record("B0B1B2B3B4B5", site="office")
+    store.close()
+    assert load(source, out).keys(limit=1) == ["B0B1B2B3B4B5"]
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import pm3_dump  # noqa: E402
+from conftest import classic_image  # noqa: E402
+from dump_analytics import Corpus, analyse, load_corpus  # noqa: E402
+
+
+def classic(image):
+    return pm3_dump.Dump(image, pm3_dump.MFC_BLOCK, "mifare_classic", "1k")
+
+
+@pytest.fixture
+def corpus():
+    keyed = classic_image(key_b="B0B1B2B3B4B5")
+    # Sector 1: data blocks key B only, trailer key B only (78 77 88)
+    keyed[7 * 16 + 6:7 * 16 + 10] = bytes.fromhex("78778869")
+    # Sector 2: inverted nibbles do not match
+    keyed[11 * 16 + 6:11 * 16 + 10] = bytes.fromhex("00000069")
+    return Corpus("mifare_classic", pm3_dump.MFC_BLOCK, [classic(classic_image()), classic(keyed)])
+
+
+def test_access_conditions_decoding(corpus):
+    access = corpus.access_conditions()
+    assert access["trailers"] == 32
+    assert access["invalid"] == 1
+    # Transport configuration: C1C2C3 = 000 for the data blocks, 001 for the trailer
+    assert access["slots"][:, 0].tolist() == [30, 30, 30, 0]
+    assert access["slots"][3, 1] == 30
+    assert access["slots"][:3, 4].tolist() == [1, 1, 1]
+    assert access["slots"][3, 3] == 1
+    assert access["slots"].sum() == 4 * 31
+    assert access["patterns"] == [("FF0780", 30), ("787788", 1), ("000000", 1)]
+
+
+def test_default_keys(corpus):
+    assert corpus.default_keys() == (32, 16)
+
+
+def test_regions(corpus):
+    stats = corpus.block_stats()
+    assert stats["dumps"].tolist() == [2] * 64
+    # Key B and the three access bytes, the user byte is shared
+    assert stats["varying_bytes"][7] == 9
+    assert stats["varying_bytes"][4] == 0
+    assert (3, 3, "changing") in corpus.regions(stats)
+
+
+def test_load_corpus_groups_by_family(tmp_path, mfu_json):
+    classic(classic_image()).save(tmp_path / "hf-mf-01020304-dump.bin")
+    (tmp_path / "broken-dump.eml").write_text("0102\n")
+    errors = []
+    corpora, skipped = load_corpus(
+        [tmp_path / "hf-mf-01020304-dump.bin", tmp_path / "broken-dump.eml", mfu_json],
+        on_error=lambda path, error: errors.append(path)
+    )
+    assert skipped == 1 and errors == [tmp_path / "broken-dump.eml"]
+    assert [(corpus.card_type, len(corpus)) for corpus in corpora] == [
+        ("mifare_classic", 1), ("mifare_ultralight", 1)
+    ]
+    result = analyse(corpora[0])
+    assert result["dumps"] == 1
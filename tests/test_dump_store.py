@@ -0,0 +1,116 @@
+import shutil
+
+import pytest
+
+import pm3_dump
+from dump_store import MANIFEST_NAME, DumpStore, digest_of, ingest, restore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DumpStore(tmp_path / "store.db")
+    yield store
+    store.close()
+
+
+def snapshot(directory):
+    return {path.relative_to(directory).as_posix(): path.read_bytes()
+            for path in sorted(directory.rglob("*")) if path.is_file() and path.name != MANIFEST_NAME}
+
+
+def test_put_get_round_trip(store, classic_dump):
+    digest = store.put(classic_dump)
+    assert digest == digest_of(classic_dump)
+    with store.get(digest) as rebuilt:
+        assert rebuilt == classic_dump
+        assert rebuilt.uid == "01020304"
+    # Equal dumps are stored once
+    assert store.put(classic_dump.copy()) == digest
+    assert store.stats()["dumps"] == 1
+
+
+def test_blocks_are_deduplicated(store, classic_dump):
+    changed = classic_dump.copy()
+    changed[1] = b"\xAA" * 16
+    store.put(classic_dump)
+    store.put(changed)
+    stats = store.stats()
+    assert stats["dumps"] == 2
+    assert stats["block_refs"] == 128
+    # All sixteen trailers share one block, the changed block is the only new one
+    assert stats["unique_blocks"] == len({bytes(block) for block in classic_dump}) + 1
+
+
+def test_missing_digest(store):
+    with pytest.raises(KeyError):
+        store.get("0" * 32)
+
+
+def test_ingest_remove_restore_is_byte_exact(store, tmp_path, classic_dump, mfu_json):
+    session = tmp_path / "analysis_20250928_120000"
+    session.mkdir()
+    for suffix in (".bin", ".eml", ".json"):
+        classic_dump.save(session / f"hf-mf-01020304-dump{suffix}")
+    # Client JSON with fields the store does not model ("Created": "proxmark3")
+    shutil.copy(mfu_json, session / mfu_json.name)
+    (session / "cmd_hf_mf_dump.log").write_text("[+] Dumping complete\n")
+    (session / "hf-mf-01020304-key.bin").write_bytes(bytes.fromhex("FFFFFFFFFFFF") * 32)
+    before = snapshot(session)
+
+    entries = ingest(store, session, remove=True)
+    assert set(entries) == set(before)
+    assert snapshot(session) == {}
+    assert (session / MANIFEST_NAME).exists()
+
+    assert sorted(restore(store, session)) == sorted(before)
+    assert snapshot(session) == before
+
+
+def test_ingest_keeps_files_it_cannot_verify(store, tmp_path):
+    session = tmp_path / "session"
+    session.mkdir()
+    (session / "broken-dump.eml").write_text("0102\n")
+    ingest(store, session, remove=True)
+    assert (session / "broken-dump.eml").exists()
+
+
+def test_restore_needs_a_manifest(store, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        restore(store, tmp_path)
+
+
+def test_find_by_uid(store, tmp_path, mfu_json):
+    digest = store.put_file(mfu_json)
+    found = store.find("04eca16a7b1390")
+    assert [dump["digest"] for dump in found] == [digest]
+    assert found[0]["sources"] == [str(mfu_json.resolve())]
+    assert store.find("01020304") == []
+    with pm3_dump.load(mfu_json) as dump:
+        assert digest_of(dump) == digest
+
+
+def test_dumps_differing_only_in_card_fields_are_kept_apart(store, tmp_path, mfu_json):
+    with pm3_dump.load(mfu_json) as original:
+        clone = original.copy()
+        clone.meta["Signature"] = "00" * 32
+        clone.meta["Counter0"] = "000005"
+        assert bytes(clone.view) == bytes(original.view)
+        assert digest_of(clone) != digest_of(original)
+        signature = original.meta["Signature"]
+
+    digest = store.put_file(mfu_json)
+    assert store.put(clone) != digest
+    assert len(store.find("04ECA16A7B1390")) == 2
+    with store.get(digest) as rebuilt:
+        assert rebuilt.meta["Signature"] == signature
+
+
+def test_card_fields_are_compared_in_canonical_form(tmp_path, mfu_json):
+    with pm3_dump.load(mfu_json) as original:
+        spaced = original.copy()
+        spaced.meta["Signature"] = " ".join(
+            original.meta["Signature"][i:i + 2].lower() for i in range(0, 64, 2))
+        assert digest_of(spaced) == digest_of(original)
+        # The .bin header carries the same fields, the digest survives the round trip
+        with pm3_dump.load(original.save_bin(tmp_path / "dump.bin")) as binary:
+            assert digest_of(binary) == digest_of(original)
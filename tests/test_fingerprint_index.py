@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from fingerprint_index import INDEX_VERSION, FingerprintIndex, fingerprint_of, load_magic_probes, magic_name
+from inventory import Tag
+
+CLASSIC_INFO = """
+[+]  UID: 01 02 03 04
+[+] ATQA: 00 04
+[+]  SAK: 08 [2]
+[+] Possible types:
+[+]    MIFARE Classic 1K
+"""
+MFU_INFO = """
+[+]  UID: 04 EC A1 6A 7B 13 90
+[+] ATQA: 00 44
+[+]  SAK: 00 [2]
+[=] --- Tag Version
+[=]        Raw bytes: 00 04 04 02 01 00 11 03
+[=] --- Tag Signature
+[=]  IC signature public key name: NXP NTAG21x (2013)
+[=]     Signature: 4A 5B 6C 7D 8E 9F A0 B1 C2 D3 E4 F5 06 17 28 39 4A 5B 6C 7D 8E 9F A0 B1 C2 D3 E4 F5 06 17 28 39
+"""
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FingerprintIndex.build()
+
+
+def test_fingerprint_of_info_output():
+    assert fingerprint_of(MFU_INFO) == {
+        "atqa": "0044",
+        "sak": "00",
+        "ats": None,
+        "version": "0004040201001103",
+        "signature": True,
+        "magic": None,
+    }
+    assert fingerprint_of("[+] Magic capabilities : Gen 2 / CUID")["magic"] == "gen2"
+    assert magic_name("Gen 4 GTU") == "gen4"
+    assert magic_name("none") is None
+
+
+def test_identify_prefers_get_version_over_atqa_sak(index):
+    assert index.identify(fingerprint_of(CLASSIC_INFO)) == ("mifare_classic", "1k")
+    assert index.identify(fingerprint_of(MFU_INFO)) == ("mifare_ultralight", "ntag215")
+    assert index.identify({"atqa": "0044", "sak": "00"}) == ("mifare_ultralight", None)
+    assert index.identify({"atqa": "9999", "sak": "77"}) == ("unknown", None)
+    assert index.identify({}) == ("unknown", None)
+
+
+def test_carddata_dumps_are_indexed(index):
+    entry = index.entries["version:0004030101000B03"]
+    assert (entry["card_type"], entry["subtype"]) == ("mifare_ultralight", "ev1")
+    assert entry["source"].endswith(".json")
+
+
+def test_magic_probes_come_from_the_document_without_write_tests():
+    probes = {probe["name"]: probe for probe in load_magic_probes()}
+    assert list(probes)[:4] == ["gen1a", "gen2", "gen3", "ufuid"]
+    assert probes["gen4"]["command"].startswith("hf 14a raw")
+    # Only reported by the client, no probe command
+    assert probes["magic_ntag"]["command"] is None
+    assert all("wrbl" not in (probe["command"] or "") for probe in probes.values())
+
+
+def test_probe_plan_per_card_type(index):
+    classic = fingerprint_of(CLASSIC_INFO)
+    assert index.probes_for(classic, "mifare_classic") == ["gen1a", "gen3", "ufuid", "gen4"]
+    assert "gen2" in index.probes_for(classic, "mifare_classic", info_checked=False)
+    assert index.probes_for(fingerprint_of(MFU_INFO), "mifare_ultralight") == ["gen4"]
+    assert index.probes_for({"atqa": "0344", "sak": "20"}, "desfire") == []
+    assert index.probes_for({"magic": "gen1a"}, "mifare_classic") == []
+
+
+def test_store_statistics_put_the_likeliest_probe_first(index):
+    ranked = FingerprintIndex(index.entries, index.probes, {"0004:08": {"gen3": 5, "ufuid": 1}})
+    assert ranked.probes_for(fingerprint_of(CLASSIC_INFO), "mifare_classic") == ["gen3", "ufuid", "gen1a", "gen4"]
+
+
+def test_saved_index_is_reused_and_rebuilt_on_version_change(index, tmp_path):
+    path = index.save(tmp_path / "fingerprints.json")
+    data = json.loads(path.read_text())
+    data["entries"] = {"0004:08": {"card_type": "custom", "subtype": None}}
+    path.write_text(json.dumps(data))
+    assert FingerprintIndex.load(path).identify({"atqa": "0004", "sak": "08"}) == ("custom", None)
+
+    data["version"] = INDEX_VERSION + 1
+    path.write_text(json.dumps(data))
+    assert FingerprintIndex.load(path).identify({"atqa": "0004", "sak": "08"}) == ("mifare_classic", "1k")
+
+
+def test_inventory_tags_are_typed_by_atqa_and_sak(index):
+    assert Tag("01020304", "0004", "08", index=index).card_type == "mifare_classic"
+    # SAK 08 alone would say Classic, ATQA 0344 does not match any entry
+    assert Tag("01020304", "0344", "08", index=index).card_type == "unknown"
@@ -0,0 +1,109 @@
+import pytest
+
+from hw_health import FULL_COMMANDS, PING_COMMAND, HealthCheck, describe, parse_full_check, ping_ok
+from pm3_session import PM3Output
+
+STATUS = "[#] Memory\n[#]   BigBuf_size............. 42672"
+VERSION = "[ Proxmark3 RFID instrument ]\n [ ARM ]\n  bootrom: master/v4.17768 2023-11-13\n       os: master/v4.17768 2023-11-13"
+TUNE = """
+[+] LF antenna: 44.36 V - 125.00 kHz
+[+] LF antenna........ OK
+[+] HF antenna: 12.07 V - 13.56 MHz
+[!] HF antenna........ marginal
+"""
+PONG = "[+] Ping response received and content ( ok )"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeReader:
+    def __init__(self, ping=PONG, status=STATUS):
+        self.ping = ping
+        self.status = status
+        self.batches = []
+
+    def run_batch(self, commands):
+        self.batches.append(commands)
+        answers = {PING_COMMAND: self.ping, "hw status": self.status, "hw version": VERSION, "hw tune": TUNE}
+        return [answers[command] for command in commands]
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def health(tmp_path, clock):
+    health = HealthCheck("/dev/ttyACM0", ttl=3600, path=tmp_path / "health.db", clock=clock)
+    yield health
+    health.close()
+
+
+def test_parse_full_check():
+    record = parse_full_check(STATUS, VERSION, TUNE)
+    assert record["healthy"]
+    assert record["firmware"] == "master/v4.17768"
+    assert (record["lf_voltage"], record["lf_status"]) == (44.36, "ok")
+    assert (record["hf_voltage"], record["hf_status"]) == (12.07, "marginal")
+    assert not parse_full_check(PM3Output("", returncode=-1, timed_out=True), VERSION, TUNE)["healthy"]
+
+
+def test_ping_ok():
+    assert ping_ok(PONG)
+    assert not ping_ok("[!] Ping response timeout")
+    assert not ping_ok(PM3Output(PONG, returncode=1))
+    assert not ping_ok("ERROR: device not found")
+
+
+def test_first_check_is_a_full_one(health):
+    reader = FakeReader()
+    record = health.check(reader.run_batch)
+    assert record["full"]
+    assert record["healthy"]
+    assert reader.batches == [FULL_COMMANDS]
+    assert "master/v4.17768" in describe(record)
+
+
+def test_fresh_result_costs_only_a_ping(health, clock):
+    health.check(FakeReader().run_batch)
+    clock.now += 3599
+    reader = FakeReader()
+    record = health.check(reader.run_batch)
+    assert not record["full"]
+    assert record["firmware"] == "master/v4.17768"
+    assert reader.batches == [[PING_COMMAND]]
+
+
+def test_stale_result_or_failed_ping_runs_the_full_check(health, clock):
+    health.check(FakeReader().run_batch)
+    clock.now += 3600
+    reader = FakeReader()
+    assert health.check(reader.run_batch)["full"]
+
+    reader = FakeReader(ping="[!] Ping response timeout")
+    assert health.check(reader.run_batch)["full"]
+    assert reader.batches == [[PING_COMMAND], FULL_COMMANDS]
+
+
+def test_unhealthy_or_invalidated_result_is_not_trusted(health):
+    health.check(FakeReader(status=PM3Output("", returncode=-1, timed_out=True)).run_batch)
+    assert not health.fresh()
+    assert health.check(FakeReader().run_batch)["full"]
+    assert health.fresh()
+    health.invalidate()
+    assert not health.fresh()
+    assert health.check(FakeReader().run_batch, force=False)["full"]
+
+
+def test_force_skips_the_ping(health):
+    health.check(FakeReader().run_batch)
+    reader = FakeReader()
+    assert health.check(reader.run_batch, force=True)["full"]
+    assert reader.batches == [FULL_COMMANDS]
@@ -0,0 +1,103 @@
+import pytest
+
+from inventory import INVENTORY_COMMAND, Inventory, ReaderParser, Tag, run_inventory
+from results_store import ResultsStore
+
+READS = """
+[usb] pm3 --> hf 14a reader -@
+[+]  UID: 04 EC A1 6A 7B 13 90
+[+] ATQA: 00 44
+[+]  SAK: 00 [2]
+[+]  UID: 01 02 03 04
+[+] ATQA: 00 04
+[+]  SAK: 08 [2]
+[+]  UID: 04 EC A1 6A 7B 13 90
+[+] ATQA: 00 44
+[+]  SAK: 00 [2]
+[+]  UID: 0A 0B 0C 0D
+[+] ATQA: 00 04
+[+]  UID: AA BB CC DD
+""".strip().splitlines()
+
+
+class FakeRunner:
+    def __init__(self, lines):
+        self.lines = lines
+        self.calls = []
+
+    def run_sync(self, command, timeout=60, stop_patterns=None, on_line=None):
+        self.calls.append((command, timeout))
+        for line in self.lines:
+            on_line(line)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(tmp_path / "results.db")
+    yield store
+    store.close()
+
+
+def test_parser_emits_a_tag_per_complete_read():
+    parser = ReaderParser()
+    tags = [tag for tag in map(parser.feed, READS[:7]) if tag]
+    assert [(tag.uid, tag.atqa, tag.sak) for tag in tags] == [
+        ("04ECA16A7B1390", "0044", "00"),
+        ("01020304", "0004", "08"),
+    ]
+    assert tags[0].card_type == "unknown"
+
+
+def test_incomplete_read_is_flushed_by_the_next_uid():
+    parser = ReaderParser()
+    assert parser.feed("[+]  UID: 0A 0B 0C 0D") is None
+    assert parser.feed("[+] ATQA: 00 04") is None
+    tag = parser.feed("[+]  UID: AA BB CC DD")
+    assert (tag.uid, tag.atqa, tag.sak) == ("0A0B0C0D", "0004", None)
+    assert parser.flush().uid == "AABBCCDD"
+    assert parser.flush() is None
+
+
+def test_run_inventory_logs_each_uid_once(tmp_path):
+    inventory = Inventory(tmp_path / "inventory.tsv")
+    runner = FakeRunner(READS)
+    new = []
+    run_inventory(inventory, runner, duration=30, on_tag=new.append)
+    inventory.close()
+
+    assert runner.calls == [(INVENTORY_COMMAND, 30)]
+    assert [tag.uid for tag in new] == ["04ECA16A7B1390", "01020304", "0A0B0C0D", "AABBCCDD"]
+    assert inventory.reads == 5
+    lines = (tmp_path / "inventory.tsv").read_text().splitlines()
+    assert [line.split("\t")[1:] for line in lines] == [
+        ["04ECA16A7B1390", "0044", "00", "unknown"],
+        ["01020304", "0004", "08", "unknown"],
+        ["0A0B0C0D", "0004", "-", "unknown"],
+        ["AABBCCDD", "-", "-", "unknown"],
+    ]
+
+
+def test_uids_from_an_earlier_log_are_not_logged_again(tmp_path):
+    log = tmp_path / "inventory.tsv"
+    log.write_text(Tag("01020304", "0004", "08", seen_at=1.0).log_line())
+    inventory = Inventory(log)
+    assert not inventory.add(Tag("01020304", "0004", "08"))
+    assert inventory.add(Tag("AABBCCDD", "0004", "08"))
+    inventory.close()
+    assert len(log.read_text().splitlines()) == 2
+
+
+def test_store_cards_are_skipped_and_new_ones_saved(tmp_path, store):
+    store.save("01020304", "mifare_classic:1k:0004:08", status="dumped")
+    inventory = Inventory(tmp_path / "inventory.tsv", store)
+    assert not inventory.add(Tag("01020304", "0004", "08"))
+    assert inventory.known_reads == 1
+    assert inventory.add(Tag("AABBCCDD", "0044", "00"))
+    inventory.close()
+
+    assert "01020304" not in (tmp_path / "inventory.tsv").read_text()
+    card = store.lookup("AABBCCDD")
+    assert card["status"] == "inventoried"
+    assert (card["atqa"], card["sak"]) == ("0044", "00")
+    # The dumped card keeps its status
+    assert store.lookup("01020304")["status"] == "dumped"
@@ -0,0 +1,63 @@
+from functools import partial
+
+import pytest
+
+import dict_compiler
+import key_store
+from key_store import KeyStore, normalize_key
+
+MODEL = "mifare_classic:1k:0004:08"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = KeyStore(tmp_path / "keys.db")
+    yield store
+    store.close()
+
+
+def test_normalize_key():
+    assert normalize_key(" a0a1 a2a3a4a5 ") == "A0A1A2A3A4A5"
+    assert normalize_key("A0A1A2A3A4") is None
+    assert normalize_key("G0A1A2A3A4A5") is None
+    assert normalize_key(None) is None
+
+
+def test_site_hits_rank_first(store):
+    for _ in range(3):
+        store.record("FFFFFFFFFFFF", 0, "A")
+    store.record("A0A1A2A3A4A5", 1, "A", site="office")
+    store.record("B0B1B2B3B4B5", 1, "B", fingerprint=MODEL)
+    store.record("not a key")
+    assert store.candidates(site="office", fingerprint=MODEL, dictionary=None) == \
+        ["A0A1A2A3A4A5", "B0B1B2B3B4B5", "FFFFFFFFFFFF"]
+    # Equal hits: the most recently seen key first
+    assert store.candidates(dictionary=None) == ["FFFFFFFFFFFF", "B0B1B2B3B4B5", "A0A1A2A3A4A5"]
+    assert store.candidates(dictionary=None, limit=1) == ["FFFFFFFFFFFF"]
+
+
+def test_record_card_counts_each_key_once(store):
+    store.record_card(keys={0: {"A": "FFFFFFFFFFFF", "B": "A0A1A2A3A4A5"}},
+                      found_keys=["FFFFFFFFFFFF", "B0B1B2B3B4B5"], site="office", fingerprint=MODEL)
+    assert {row["key"]: row["hits"] for row in store.stats()} == \
+        {"FFFFFFFFFFFF": 1, "A0A1A2A3A4A5": 1, "B0B1B2B3B4B5": 1}
+    assert store.hit_summary(site="office", fingerprint=MODEL) == {"site": 3, "model": 3, "total": 3}
+    assert store.hit_summary(site="lab") == {"site": 0, "model": 0, "total": 3}
+
+
+def test_dictionary_fills_up_after_learned_keys(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(key_store, "load_dictionary", partial(dict_compiler.load, output_dir=tmp_path / "compiled"))
+    dictionary = tmp_path / "site.dic"
+    dictionary.write_text("ffffffffffff\nD3F7D3F7D3F7\n# comment\n000000000000\n")
+    store.record("A0A1A2A3A4A5", site="office")
+    assert store.candidates(site="office", dictionary=dictionary) == \
+        ["A0A1A2A3A4A5", "FFFFFFFFFFFF", "D3F7D3F7D3F7", "000000000000"]
+
+    written = store.write_candidates(tmp_path / "candidates.dic", site="office", limit=2, dictionary=dictionary)
+    assert written == 2
+    assert (tmp_path / "candidates.dic").read_text() == "A0A1A2A3A4A5\nFFFFFFFFFFFF\n"
+
+
+def test_unreadable_dictionary_is_skipped(store, tmp_path):
+    store.record("A0A1A2A3A4A5")
+    assert store.candidates(dictionary=tmp_path / "missing.dic") == ["A0A1A2A3A4A5"]
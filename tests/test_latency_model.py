@@ -0,0 +1,114 @@
+import pytest
+
+import latency_model
+from latency_model import (
+    FAIL_FAST_TIMEOUT,
+    LatencyModel,
+    command_family,
+    log_outcome,
+    model_key,
+    outcome_of,
+    percentile,
+)
+from pm3_session import PM3Output
+
+
+@pytest.fixture
+def model(tmp_path):
+    model = LatencyModel(tmp_path / "latency.db")
+    yield model
+    model.close()
+
+
+def test_command_family_drops_arguments():
+    assert command_family("hf mfu dump -k FFFFFFFF") == "hf mfu dump"
+    assert command_family("hf mf chk *1 ? d") == "hf mf chk"
+    assert command_family("hf mf autopwn") == "hf mf autopwn"
+    assert command_family("lf em 410x_read") == "lf em 410x_read"
+    assert command_family("hf mf fchk --1k -f keys.dic") == "hf mf fchk"
+
+
+def test_model_key_keeps_prng_types_apart():
+    assert model_key("mifare_classic", "weak") == "mifare_classic:weak"
+    assert model_key(None) == "unknown"
+
+
+def test_outcome_of_outputs():
+    assert outcome_of(PM3Output("[+] found valid key [ FFFFFFFFFFFF ]", duration=3)) == "success"
+    assert outcome_of(PM3Output("[-] Can't select card")) == "failure"
+    # A success indicator wins over failure lines on the way
+    assert outcome_of(PM3Output("[-] timeout\n[+] found keys:")) == "success"
+    assert outcome_of(PM3Output("[=] partial", returncode=-1, timed_out=True)) == "timeout"
+    assert outcome_of(PM3Output("[!] error", returncode=1)) == "failure"
+    assert outcome_of("ERROR: pm3 not found") is None
+    assert outcome_of(None) is None
+
+
+def test_percentile():
+    assert percentile([5, 1, 3, 2, 4], 0.5) == 3
+    assert percentile([5, 1, 3, 2, 4], 0.95) == 5
+    assert percentile([7], 0.95) == 7
+
+
+def test_default_until_enough_samples(model):
+    for seconds in (2, 3, 2, 4):
+        model.record("hf mfu dump -k FFFFFFFF", "mifare_ultralight", "success", seconds)
+    assert model.timeout_for("hf mfu dump", "mifare_ultralight", 60) == 60
+
+
+def test_timeout_from_successful_runs(model):
+    for seconds in (2, 3, 2, 4, 3, 10):
+        model.record("hf mfu dump -k FFFFFFFF", "mifare_ultralight", "success", seconds)
+    assert model.timeout_for("hf mfu dump", "mifare_ultralight", 60) == 15
+    assert model.timeout_for("hf mfu dump", "mifare_ultralight", 12) == 12
+    # Other card types have their own samples
+    assert model.timeout_for("hf mfu dump", "ntag", 60) == 60
+
+
+def test_prng_types_are_learned_separately(model):
+    for _ in range(5):
+        model.record("hf mf autopwn", "mifare_classic", "success", 8, prng="weak")
+    assert model.timeout_for("hf mf autopwn", "mifare_classic", 180, prng="weak") == 12
+    assert model.timeout_for("hf mf autopwn", "mifare_classic", 180, prng="hard") == 180
+
+
+def test_three_timeouts_in_a_row_restore_the_default(model):
+    for _ in range(5):
+        model.record("hf mf autopwn", "mifare_classic", "success", 8)
+    for _ in range(3):
+        model.record("hf mf autopwn", "mifare_classic", "timeout", 12)
+    assert model.timeout_for("hf mf autopwn", "mifare_classic", 180) == 180
+
+
+def test_probes_that_never_succeed_fail_fast(model):
+    for _ in range(5):
+        model.record("hf mf cgetblk --blk 0", "mifare_ultralight", "timeout", 30)
+    assert model.timeout_for("hf mf cgetblk --blk 0", "mifare_ultralight", 30) == FAIL_FAST_TIMEOUT
+    for _ in range(5):
+        model.record("hf mfdes info", "mifare_ultralight", "failure", 1)
+    assert model.timeout_for("hf mfdes info", "mifare_ultralight", 30) == 3
+
+
+def test_window_keeps_the_latest_samples(model, monkeypatch):
+    monkeypatch.setattr(latency_model, "WINDOW", 3)
+    for seconds in (1, 2, 3, 4, 5):
+        model.record("hw ping", None, "success", seconds)
+    assert sorted(model.samples("hw ping", None, "success")) == [3, 4, 5]
+
+
+def test_record_output_uses_the_measured_duration(model):
+    model.record_output("hf 14a info", "mifare_classic", PM3Output("[+]  UID: 01 02 03 04", duration=1.5))
+    model.record_output("hf 14a info", "mifare_classic", "ERROR: no client")
+    assert model.samples("hf 14a info", "mifare_classic", "success") == [1.5]
+    assert len(model.table()) == 1
+
+
+def test_log_outcome_needs_keys_or_a_dump():
+    keys = "[+] found keys:\n[+]  000 | 003 | FFFFFFFFFFFF | D | FFFFFFFFFFFF | D"
+    assert log_outcome(keys) == "success"
+    assert log_outcome("[+] Saved 1024 bytes to binary file `hf-mf-01020304-dump.bin`") == "success"
+    # autopwn exits 0 after a run that found nothing
+    assert log_outcome("[=] MIFARE Classic autopwn\n[!] Darkside failed, no valid keys") == "failure"
+    assert log_outcome("[-] Can't select card", status=1) == "failure"
+    assert log_outcome(keys, status=124) == "timeout"
+    assert log_outcome("", status=137) == "timeout"
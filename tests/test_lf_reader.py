@@ -0,0 +1,110 @@
+from lf_reader import (
+    READER_COMMANDS,
+    SINGLE_READ_COMMANDS,
+    LFParser,
+    LFPipeline,
+    RepeatWindow,
+    parse_output,
+    run_pipeline,
+)
+
+EM_READ = "[+] EM 410x ID 0F0368568B"
+HID_READ = """[+] [H10301  ] HID H10301 26-bit   FC: 118  CN: 1603  parity ( ok )
+[=] found 1 matching format
+[=] raw: 000000000000002006ec0c86"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_em410x_and_hid():
+    reads = parse_output(f"{EM_READ}\n[=] EM410x ID: 1122334455\n{HID_READ}\n[+] HID Prox - 2004263f8b (7621)")
+    assert [(read.family, read.id) for read in reads] == [
+        ("em410x", "0F0368568B"),
+        ("em410x", "1122334455"),
+        ("hid", "2006EC0C86"),
+        ("hid", "2004263F8B"),
+    ]
+    assert (reads[2].fc, reads[2].cn, reads[2].format) == (118, 1603, "H10301")
+    # No format line before the older client's raw line: no FC/CN
+    assert reads[3].fc is None
+
+
+def test_stale_hid_fields_are_not_lent_to_the_next_badge():
+    clock = Clock()
+    parser = LFParser(max_age=1.0, clock=clock)
+    assert parser.feed("[+] [H10301  ] HID H10301 26-bit   FC: 118  CN: 1603") is None
+    clock.now = 5
+    read = parser.feed("[=] raw: 2004263f8b")
+    assert read.id == "2004263F8B"
+    assert read.fc is None
+
+
+def test_repeat_window_drops_a_badge_held_in_the_field():
+    clock = Clock()
+    window = RepeatWindow(seconds=2, clock=clock)
+    assert window.is_new("badge")
+    for now in (1, 2.5, 4):
+        clock.now = now
+        assert not window.is_new("badge")
+    clock.now = 6.5
+    assert window.is_new("badge")
+
+
+def test_repeat_window_is_bounded():
+    window = RepeatWindow(seconds=60, size=2, clock=Clock())
+    for key in ("a", "b", "c"):
+        assert window.is_new(key)
+    assert list(window.last_seen) == ["b", "c"]
+    # "a" was evicted, it counts as new again
+    assert window.is_new("a")
+
+
+def test_pipeline_emits_one_record_per_presentation(tmp_path):
+    emitted = []
+    pipeline = LFPipeline(RepeatWindow(seconds=60, clock=Clock()), emitted.append, tmp_path / "lf.tsv")
+    for line in [EM_READ, EM_READ, "[=] noise", *HID_READ.splitlines(), EM_READ]:
+        pipeline.feed(line)
+    pipeline.close()
+    assert pipeline.reads == 4
+    assert [read.id for read in emitted] == ["0F0368568B", "2006EC0C86"]
+    lines = (tmp_path / "lf.tsv").read_text().splitlines()
+    assert [line.split("\t")[1:] for line in lines] == [
+        ["em410x", "0F0368568B", "-", "-", "-"],
+        ["hid", "2006EC0C86", "118", "1603", "H10301"],
+    ]
+
+
+def test_single_family_streams_the_continuous_reader():
+    class Runner:
+        def run_sync(self, command, timeout=60, stop_patterns=None, on_line=None):
+            self.call = (command, timeout)
+            on_line(EM_READ)
+
+    runner = Runner()
+    pipeline = LFPipeline()
+    run_pipeline(pipeline, runner, ["hid"], duration=10)
+    assert runner.call == (READER_COMMANDS["hid"], 10)
+    assert [read.id for read in pipeline.records] == ["0F0368568B"]
+
+
+def test_several_families_take_turns_in_one_session():
+    class Session:
+        def __init__(self):
+            self.batches = []
+
+        def run_batch(self, commands, timeout=60):
+            self.batches.append(commands)
+            # A format line without its raw value must not stick to the EM read
+            return ["[+] [H10301  ] HID H10301 26-bit   FC: 1  CN: 2", EM_READ]
+
+    session = Session()
+    pipeline = LFPipeline()
+    run_pipeline(pipeline, None, ["hid", "em410x"], duration=0.05, session=session)
+    assert session.batches[0] == [SINGLE_READ_COMMANDS["hid"], SINGLE_READ_COMMANDS["em410x"]]
+    assert [(read.family, read.fc) for read in pipeline.records] == [("em410x", None)]
@@ -0,0 +1,44 @@
+import pytest
+
+import mfu_pwdgen
+
+# Vectors from the client's hf mfu pwdgen self test
+VECTORS = [
+    (mfu_pwdgen.amiibo, "041F98EA1E3E81", "5FD37ECA"),
+    (mfu_pwdgen.lego_dimensions, "0462B68AB44280", "5A349515"),
+    (mfu_pwdgen.xiaomi, "04A03CAA1E7080", "CD91AFCC"),
+]
+
+
+@pytest.mark.parametrize("generator, uid, password", VECTORS)
+def test_published_vectors(generator, uid, password):
+    assert generator(uid) == password
+
+
+def test_uid_formats():
+    assert mfu_pwdgen.amiibo("04 1F 98 EA 1E 3E 81") == "5FD37ECA"
+    assert mfu_pwdgen.amiibo("04:1f:98:ea:1e:3e:81") == "5FD37ECA"
+    assert mfu_pwdgen.amiibo(bytes.fromhex("041F98EA1E3E81")) == "5FD37ECA"
+
+
+def test_generate_in_sweep_order():
+    candidates = mfu_pwdgen.generate("041F98EA1E3E81")
+    assert [name for name, _ in candidates] == ["amiibo", "lego_dimensions", "xiaomi"]
+    assert candidates[0] == ("amiibo", "5FD37ECA")
+    assert mfu_pwdgen.passwords("041F98EA1E3E81") == [password for _, password in candidates]
+
+
+@pytest.mark.parametrize("uid", ["01020304", "", None, "zz"])
+def test_no_candidates_for_other_uids(uid):
+    assert mfu_pwdgen.generate(uid) == []
+
+
+def test_uid_bytes_rejects_wrong_length():
+    with pytest.raises(ValueError):
+        mfu_pwdgen.uid_bytes("01020304")
+
+
+def test_generate_batch():
+    batch = mfu_pwdgen.generate_batch(["041F98EA1E3E81", "01020304"])
+    assert batch["01020304"] == []
+    assert batch["041F98EA1E3E81"] == mfu_pwdgen.generate("041F98EA1E3E81")
@@ -0,0 +1,125 @@
+import pytest
+
+from mfu_sweep import (
+    DEFAULT_PASSWORDS,
+    PasswordSweep,
+    SweepCheckpoint,
+    auth_command,
+    default_candidates,
+    parse_auth,
+)
+from pm3_session import PM3Output
+
+UID = "041F98EA1E3E81"
+AMIIBO = "5FD37ECA"
+ACK = "[+] 80 80 F7 F8 [ F7 F8 ]"
+NAK = "[+] 04 [ 04 ]"
+LOST = "[-] Can't select card"
+
+
+class FakeCard:
+    """Answers PWD_AUTH batches; the card leaves the field after `present` commands"""
+
+    def __init__(self, password, pack=ACK, present=None):
+        self.password = password
+        self.pack = pack
+        self.present = present
+        self.commands = []
+
+    def run_batch(self, commands):
+        outputs = []
+        for command in commands:
+            self.commands.append(command)
+            if self.present is not None and len(self.commands) > self.present:
+                outputs.append(LOST)
+            elif command == auth_command(self.password):
+                outputs.append(self.pack)
+            else:
+                outputs.append(NAK)
+        return outputs
+
+
+@pytest.fixture
+def sweep_dir(tmp_path):
+    return tmp_path / "sweeps"
+
+
+def test_parse_auth():
+    assert parse_auth(ACK) == "8080"
+    assert parse_auth(NAK) is None
+    assert parse_auth(None) is None
+
+
+def test_uid_derived_passwords_come_first(tmp_path):
+    candidates = default_candidates(UID, tmp_path / "missing.dic")
+    assert candidates[0] == AMIIBO
+    assert candidates[-len(DEFAULT_PASSWORDS):] == DEFAULT_PASSWORDS
+    assert len(candidates) == len(set(candidates))
+
+
+def test_sweep_stops_at_the_first_hit(sweep_dir):
+    candidates = ["00000000", "11111111", "22222222", "33333333", "44444444"]
+    card = FakeCard("22222222")
+    result = PasswordSweep(UID, candidates, chunk_size=2, checkpoint_dir=sweep_dir).run(card.run_batch)
+    assert result["password"] == "22222222"
+    assert result["pack"] == "8080"
+    assert result["tried"] == 3
+    assert result["remaining"] == 0
+    assert not result["resumed"]
+    # The chunk holding the hit is the last one sent
+    assert len(card.commands) == 4
+    checkpoint = SweepCheckpoint(UID, sweep_dir)
+    assert (checkpoint.password, checkpoint.pack) == ("22222222", "8080")
+
+
+def test_lost_card_resumes_where_it_stopped(sweep_dir):
+    candidates = ["00000000", "11111111", "22222222", "33333333"]
+    result = PasswordSweep(UID, candidates, chunk_size=4, checkpoint_dir=sweep_dir).run(
+        FakeCard("33333333", present=2).run_batch)
+    assert result["card_lost"]
+    assert result["password"] is None
+    assert result["tried"] == 2
+    assert result["remaining"] == 2
+
+    card = FakeCard("33333333")
+    sweep = PasswordSweep(UID, candidates, chunk_size=4, checkpoint_dir=sweep_dir)
+    assert sweep.remaining() == ["22222222", "33333333"]
+    result = sweep.run(card.run_batch)
+    assert result["resumed"]
+    assert result["password"] == "33333333"
+    assert card.commands == [auth_command("22222222"), auth_command("33333333")]
+
+
+def test_timed_out_command_is_not_counted_as_tried(sweep_dir):
+    def run_batch(commands):
+        return [NAK, PM3Output("", returncode=-1, timed_out=True)][:len(commands)]
+
+    result = PasswordSweep(UID, ["00000000", "11111111"], checkpoint_dir=sweep_dir).run(run_batch)
+    assert result["card_lost"]
+    assert SweepCheckpoint(UID, sweep_dir).tried == ["00000000"]
+
+
+def test_stored_password_is_rechecked(sweep_dir):
+    candidates = ["00000000", "11111111"]
+    PasswordSweep(UID, candidates, checkpoint_dir=sweep_dir).run(FakeCard("11111111").run_batch)
+
+    card = FakeCard("11111111")
+    result = PasswordSweep(UID, candidates, checkpoint_dir=sweep_dir).run(card.run_batch)
+    assert result["password"] == "11111111"
+    assert card.commands == [auth_command("11111111")]
+
+    # PWD changed on the card since: the checkpoint is dropped and the sweep runs again
+    card = FakeCard("00000000")
+    result = PasswordSweep(UID, candidates, checkpoint_dir=sweep_dir).run(card.run_batch)
+    assert result["password"] == "00000000"
+    assert card.commands[:2] == [auth_command("11111111"), auth_command("00000000")]
+    assert SweepCheckpoint(UID, sweep_dir).tried == ["00000000"]
+
+
+def test_exhausted_sweep(sweep_dir):
+    result = PasswordSweep(UID, ["00000000", "11111111"], chunk_size=1, checkpoint_dir=sweep_dir).run(
+        FakeCard("FFFFFFFF").run_batch)
+    assert result["password"] is None
+    assert not result["card_lost"]
+    assert result["tried"] == 2
+    assert result["remaining"] == 0
@@ -0,0 +1,93 @@
+import pytest
+
+from pm3_cache import CommandCache, is_cacheable, is_write
+from pm3_session import PM3Output
+
+INFO = "[+]  UID: 04 EC A1 6A 7B 13 90\n[+] ATQA: 00 44\n[+]  SAK: 00 [2]"
+OTHER_INFO = "[+]  UID: 01 02 03 04\n[+] ATQA: 00 04\n[+]  SAK: 08 [2]"
+NO_CARD = "[-] Can't select card"
+VERSION = "[=] Proxmark3 RFID instrument"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    cache = CommandCache(ttl=300, clock=clock)
+    cache.record("hf 14a info", INFO)
+    return cache
+
+
+def test_command_kinds():
+    assert is_cacheable("hf  14a   info")
+    assert is_cacheable("hw version")
+    assert not is_cacheable("hf mf autopwn")
+    assert not is_cacheable("hw versions")
+    assert is_write("hf mfu wrbl -b 4 -d 01020304")
+    assert not is_write("hf mf rdbl --blk 0")
+
+
+def test_read_only_output_is_served_for_the_same_card(cache):
+    assert cache.uid == "04ECA16A7B1390"
+    assert cache.get("hf 14a  info") == INFO
+    assert cache.hits == 1
+    assert cache.get("hf mfu info") is None
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    clock.now = 300
+    assert cache.get("hf 14a info") == INFO
+    clock.now = 300.5
+    assert cache.get("hf 14a info") is None
+
+
+def test_write_command_invalidates_card_entries(cache):
+    cache.record("hw version", VERSION)
+    cache.record("hf mfu wrbl -b 4 -d 01020304", "[+] Write ( ok )")
+    assert cache.get("hf 14a info") is None
+    # Reader-only output does not depend on the card contents
+    assert cache.get("hw version") == VERSION
+    assert cache.uid == "04ECA16A7B1390"
+
+
+def test_different_card_drops_the_old_entries(cache):
+    cache.record("hf mf info", OTHER_INFO)
+    assert cache.uid == "01020304"
+    assert cache.get("hf 14a info") is None
+    assert cache.get("hf mf info") == OTHER_INFO
+
+
+def test_lost_card_serves_nothing_until_a_uid_is_seen(cache):
+    cache.record("hw version", VERSION)
+    cache.record("hf mfu dump", NO_CARD)
+    assert cache.uid is None
+    assert cache.get("hf 14a info") is None
+    assert cache.get("hw version") == VERSION
+    cache.record("hf 14a info", INFO)
+    assert cache.get("hf 14a info") == INFO
+
+
+def test_failed_or_timed_out_output_is_not_stored(clock):
+    cache = CommandCache(ttl=300, clock=clock)
+    cache.record("hw version", PM3Output(VERSION, returncode=-1, timed_out=True))
+    cache.record("hw status", "ERROR: device not found")
+    assert cache.get("hw version") is None
+    assert cache.get("hw status") is None
+
+
+def test_zero_ttl_disables_the_cache(clock):
+    cache = CommandCache(ttl=0, clock=clock)
+    cache.record("hf 14a info", INFO)
+    assert cache.uid == "04ECA16A7B1390"
+    assert cache.get("hf 14a info") is None
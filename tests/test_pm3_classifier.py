@@ -0,0 +1,109 @@
+from pm3_classifier import classify
+
+HF_14A_INFO = """
+[+]  UID: 04 EC A1 6A 7B 13 90
+[+] ATQA: 00 44
+[+]  SAK: 00 [2]
+[+] MIFARE Ultralight EV1 48bytes (MF0UL1101)
+"""
+
+CLASSIC_INFO = """
+[+]  UID: 01 02 03 04
+[+] ATQA: 00 04
+[+]  SAK: 08 [2]
+[+] Possible types:
+[+]    MIFARE Classic 1K
+"""
+
+FCHK = """
+[+] found keys:
+
+[+] -----+-----+--------------+---+--------------+----
+[+]  Sec | Blk | key A        |res| key B        |res
+[+] -----+-----+--------------+---+--------------+----
+[+]  000 | 003 | FFFFFFFFFFFF | 1 | ------------ | 0
+[+]  001 | 007 | a0a1a2a3a4a5 | 1 | B0B1B2B3B4B5 | 1
+[+] -----+-----+--------------+---+--------------+----
+"""
+
+
+def test_classify_ultralight_info():
+    record = classify(HF_14A_INFO)
+    assert record.card_type == "mifare_ultralight"
+    assert record.subtype == "ev1"
+    assert record.uid == "04ECA16A7B1390"
+    assert (record.atqa, record.sak) == ("0044", "00")
+
+
+def test_classify_classic_subtype():
+    record = classify(CLASSIC_INFO)
+    assert record.card_type == "mifare_classic"
+    assert record.subtype == "1k"
+    assert record.uid == "01020304"
+
+
+def test_classify_key_table_skips_unfound_keys():
+    record = classify(FCHK)
+    assert record.keys == {0: {"A": "FFFFFFFFFFFF"}, 1: {"A": "A0A1A2A3A4A5", "B": "B0B1B2B3B4B5"}}
+    assert record.found_keys == ["FFFFFFFFFFFF", "A0A1A2A3A4A5", "B0B1B2B3B4B5"]
+    assert record.key_found
+
+
+def test_classify_records_do_not_share_the_cached_one():
+    record = classify(FCHK)
+    record.keys[0]["B"] = "000000000000"
+    record.found_keys.append("000000000000")
+    record.success.clear()
+    again = classify(FCHK)
+    assert again is not record
+    assert again.keys[0] == {"A": "FFFFFFFFFFFF"}
+    assert "000000000000" not in again.found_keys
+    assert again.key_found
+
+
+def test_classify_older_key_table_layout():
+    record = classify("|000|  ffffffffffff   | 1 |  ffffffffffff   | 1 |\n"
+                      "|001|  ------------   | 0 |  a0a1a2a3a4a5   | 1 |\n")
+    assert record.keys == {0: {"A": "FFFFFFFFFFFF", "B": "FFFFFFFFFFFF"}, 1: {"B": "A0A1A2A3A4A5"}}
+
+
+def test_classify_autopwn_methods_count_as_found():
+    record = classify("[+]  000 | 003 | FFFFFFFFFFFF | D | 4D3A99C351DD | N\n")
+    assert record.keys == {0: {"A": "FFFFFFFFFFFF", "B": "4D3A99C351DD"}}
+
+
+def test_classify_darkside_valid_key():
+    record = classify("[+] found valid key: [ FFFFFFFFFFFF ]\n")
+    assert record.found_keys == ["FFFFFFFFFFFF"]
+    assert "found valid key" in record.success
+
+
+def test_classify_saved_files():
+    record = classify("[+] Saved 1024 bytes to binary file `hf-mf-01020304-dump.bin`\n"
+                      "[+] Saved to json file `hf-mf-01020304-dump.json`\n")
+    assert record.saved_files == ["hf-mf-01020304-dump.bin", "hf-mf-01020304-dump.json"]
+
+
+def test_classify_dump_success():
+    assert classify("[=] Dumping complete\n").dump_success
+    assert classify("[+] Dump saved to file `hf-mfu-04ECA16A7B1390-dump.bin`\n").dump_success
+    assert not classify("[+] found valid key: [ FFFFFFFFFFFF ]\n").dump_success
+
+
+def test_classify_failures():
+    record = classify("[!] iso14443a card select failed\n")
+    assert record.failures == {"iso14443a card select failed"}
+    assert record.card_type == "unknown"
+    assert not record.success
+
+
+def test_classify_lf_id_with_and_without_colon():
+    assert classify("[+] EM 410x ID 0F0368568B\n").uid == "0F0368568B"
+    assert classify("[+] EM410x ID: 0F0368568B\n").uid == "0F0368568B"
+
+
+def test_classify_empty_output():
+    record = classify("")
+    assert record.card_type == "unknown"
+    assert record.uid is None
+    assert record.keys == {}
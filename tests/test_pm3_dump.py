@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import pm3_dump
+from conftest import classic_image
+from pm3_dump import DumpError
+
+
+@pytest.mark.parametrize("suffix", [".json", ".bin", ".eml"])
+def test_classic_round_trip(tmp_path, classic_dump, suffix):
+    path = classic_dump.save(tmp_path / f"hf-mf-01020304-dump{suffix}")
+    with pm3_dump.load(path) as loaded:
+        assert loaded == classic_dump
+        assert (loaded.card_type, loaded.subtype) == ("mifare_classic", "1k")
+        assert loaded.uid == "01020304"
+        assert loaded.keys(15) == ("FFFFFFFFFFFF", "FFFFFFFFFFFF")
+
+
+@pytest.mark.parametrize("suffix", [".json", ".bin", ".eml"])
+def test_ultralight_round_trip(tmp_path, mfu_json, suffix):
+    with pm3_dump.load(mfu_json) as original:
+        path = original.save(tmp_path / f"hf-mfu-04ECA16A7B1390-dump{suffix}")
+        with pm3_dump.load(path) as loaded:
+            assert loaded == original
+            assert loaded.card_type == "mifare_ultralight"
+            assert loaded.uid == "04ECA16A7B1390"
+            if suffix != ".eml":
+                # .eml has no room for the header fields
+                assert loaded.meta["Version"] == original.meta["Version"]
+                assert loaded.meta["Signature"] == original.meta["Signature"]
+
+
+def test_load_client_json(mfu_json):
+    with pm3_dump.load(mfu_json) as dump:
+        assert len(dump) == 20
+        assert bytes(dump[16]).hex().upper() == "040000FF"
+        assert dump.meta["UID"] == "04ECA16A7B1390"
+
+
+def test_memory_mapped_bin_is_read_only(tmp_path, classic_dump):
+    path = classic_dump.save(tmp_path / "dump.bin")
+    with pm3_dump.load(path, use_mmap=True) as dump:
+        with pytest.raises(TypeError):
+            dump[1] = bytes(16)
+        writable = dump.copy()
+    writable[1] = bytes(16)
+    assert writable.diff(classic_dump) == [1]
+
+
+def test_json_sector_keys(tmp_path, classic_dump):
+    document = json.loads(classic_dump.save(tmp_path / "dump.json").read_text())
+    assert document["SectorKeys"]["0"] == {"KeyA": "FFFFFFFFFFFF", "KeyB": "FFFFFFFFFFFF",
+                                          "AccessConditions": "FF078069"}
+
+
+def test_sector_layout_of_4k():
+    assert pm3_dump.sector_of(127) == 31
+    assert pm3_dump.sector_of(128) == 32
+    assert pm3_dump.trailer_block(31) == 127
+    assert pm3_dump.trailer_block(32) == 143
+    assert list(pm3_dump.sector_blocks(32))[0] == 128
+    assert pm3_dump.is_trailer(255)
+
+
+def test_bad_dumps(tmp_path):
+    (tmp_path / "odd.eml").write_text("0102\n")
+    with pytest.raises(DumpError):
+        pm3_dump.load(tmp_path / "odd.eml")
+    with pytest.raises(DumpError):
+        pm3_dump.load(tmp_path / "dump.txt")
+    (tmp_path / "empty.json").write_text('{"blocks": {}}')
+    with pytest.raises(DumpError):
+        pm3_dump.load(tmp_path / "empty.json")
+
+
+def test_find_dumps_prefers_json(tmp_path):
+    dump = pm3_dump.Dump(classic_image(), pm3_dump.MFC_BLOCK, "mifare_classic", "1k")
+    for suffix in (".bin", ".eml", ".json"):
+        dump.save(tmp_path / f"hf-mf-01020304-dump{suffix}")
+    (tmp_path / "session").mkdir()
+    dump.save(tmp_path / "session" / "hf-mf-01020304-dump-001.bin")
+    (tmp_path / "hf-mf-01020304-key.bin").write_bytes(bytes(96))
+    assert [path.relative_to(tmp_path).as_posix() for path in pm3_dump.find_dumps(tmp_path)] == [
+        "hf-mf-01020304-dump.json", "session/hf-mf-01020304-dump-001.bin"
+    ]
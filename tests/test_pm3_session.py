@@ -0,0 +1,150 @@
+import pytest
+
+from pm3_session import (
+    BATCH_MARKER,
+    MARKER_PREFIX,
+    PM3Session,
+    PM3SessionError,
+    build_batch_script,
+    run_pm3_batch,
+    split_batch_output,
+)
+
+# Stand-in for the pm3 client: echoes the prompt, answers "rem" with its text;
+# with -c it runs the "; "-separated script instead of reading stdin.
+# "hang" prints some progress and stalls until SIGINT
+FAKE_CLIENT = """#!/usr/bin/env python3
+import signal
+import sys
+import time
+signal.signal(signal.SIGINT, lambda *_: (print("[=] interrupted", flush=True), sys.exit(130)))
+print("[=] Session log /tmp/fake.log", flush=True)
+script = sys.argv[sys.argv.index("-c") + 1].split("; ") if "-c" in sys.argv else None
+for line in script or sys.stdin:
+    command = line.strip()
+    print(f"[usb] pm3 --> {command}", flush=True)
+    if command == "quit":
+        break
+    if command == "crash":
+        sys.exit(1)
+    if command == "hang":
+        print("[+] found key 0", flush=True)
+        time.sleep(30)
+    if command.startswith("rem "):
+        print(f"[#] {command[4:]}", flush=True)
+    else:
+        print(f"[+] ran {command}", flush=True)
+"""
+
+
+@pytest.fixture
+def fake_client(tmp_path):
+    client = tmp_path / "pm3"
+    client.write_text(FAKE_CLIENT)
+    client.chmod(0o755)
+    return str(client)
+
+
+def test_session_lines_drop_markers_prompts_and_echoes():
+    session = PM3Session()
+    clean = session._clean_line
+    assert clean(f"[#] {MARKER_PREFIX}_3\n", "hf search") is None
+    assert clean("[usb] pm3 --> hf search\n", "hf search") is None
+    assert clean("[usb] pm3 --> \n", "hf search") is None
+    assert clean("[usb] pm3 --> [+] late output\n", "hf search") == "[+] late output"
+    assert clean("\x1b[33m[!]\x1b[0m No known/supported 13.56 MHz tags found\r\n", "hf search") == \
+        "[!] No known/supported 13.56 MHz tags found"
+
+
+def test_one_client_serves_every_command(fake_client):
+    with PM3Session(pm3_binary=fake_client) as session:
+        process = session.process
+        assert session.run("hw ping", timeout=5) == "[+] ran hw ping"
+        assert session.run("hw version", timeout=5) == "[+] ran hw version"
+        assert session.process is process
+    assert not session.is_alive()
+
+
+def test_session_restarts_after_close(fake_client):
+    session = PM3Session(pm3_binary=fake_client)
+    try:
+        assert session.run("hw ping", timeout=5) == "[+] ran hw ping"
+        session.close()
+        assert session.run("hw ping", timeout=5) == "[+] ran hw ping"
+    finally:
+        session.close()
+
+
+def test_client_exit_raises(fake_client):
+    with PM3Session(pm3_binary=fake_client) as session:
+        with pytest.raises(PM3SessionError):
+            session.run("crash", timeout=5)
+        assert not session.is_alive()
+
+
+def test_batch_script_has_a_marker_after_each_command():
+    script = build_batch_script(["hw version", "hf 14a info"])
+    assert script == f"hw version; rem {BATCH_MARKER}_0; hf 14a info; rem {BATCH_MARKER}_1"
+
+
+def test_split_batch_output_by_markers():
+    output = "\n".join([
+        "[usb] pm3 --> hw version",
+        "[=] Proxmark3 RFID instrument",
+        f"[usb] pm3 --> rem {BATCH_MARKER}_0",
+        f"[#] {BATCH_MARKER}_0",
+        "[usb] pm3 --> hf 14a info",
+        "\x1b[32m[+]\x1b[0m  UID: 04 EC A1 6A 7B 13 90",
+        f"[#] {BATCH_MARKER}_1",
+    ])
+    assert split_batch_output(output, 2) == [
+        "[=] Proxmark3 RFID instrument",
+        "[+]  UID: 04 EC A1 6A 7B 13 90",
+    ]
+
+
+def test_split_batch_output_missing_marker_leaves_later_commands_empty():
+    output = "[+] first\n" f"[#] {BATCH_MARKER}_0\n" "[+] second, cut off"
+    assert split_batch_output(output, 3) == ["[+] first", "[+] second, cut off", ""]
+
+
+def test_split_batch_output_drops_output_after_the_last_marker():
+    output = "[+] only\n" f"[#] {BATCH_MARKER}_0\n" "[=] client exiting"
+    assert split_batch_output(output, 1) == ["[+] only"]
+
+
+def test_session_run_batch_returns_outputs_in_order(fake_client):
+    with PM3Session(pm3_binary=fake_client) as session:
+        outputs = session.run_batch(["hw ping", "hf 14a info", "hw version"], timeout=5)
+    assert outputs == ["[+] ran hw ping", "[+] ran hf 14a info", "[+] ran hw version"]
+    assert [output.command for output in outputs] == ["hw ping", "hf 14a info", "hw version"]
+    assert not any(output.timed_out for output in outputs)
+
+
+def test_one_shot_batch_demultiplexes_the_script_output(fake_client):
+    outputs = run_pm3_batch(["hw ping", "hf 14a info"], timeout=5, pm3_binary=fake_client)
+    # The client banner stays with the first command
+    assert outputs[0].splitlines()[-1] == "[+] ran hw ping"
+    assert outputs[1] == "[+] ran hf 14a info"
+    assert [output.returncode for output in outputs] == [0, 0]
+
+
+def test_session_timeout_keeps_partial_output(fake_client):
+    with PM3Session(pm3_binary=fake_client, grace_period=2) as session:
+        outputs = session.run_batch(["hw ping", "hang", "hw version"], timeout=2)
+        assert not session.is_alive()
+    assert outputs[0] == "[+] ran hw ping"
+    assert not outputs[0].timed_out
+    assert outputs[1].timed_out
+    assert outputs[1].returncode == -1
+    assert outputs[1].splitlines() == ["[+] found key 0", "[=] interrupted"]
+    assert outputs[2] == ""
+    assert outputs[2].timed_out
+
+
+def test_one_shot_batch_timeout_marks_unfinished_commands(fake_client):
+    outputs = run_pm3_batch(["hw ping", "hang"], timeout=2, pm3_binary=fake_client, grace_period=2)
+    assert not outputs[0].timed_out
+    assert outputs[1].timed_out
+    assert "[+] found key 0" in outputs[1]
+    assert outputs[1].returncode == 130
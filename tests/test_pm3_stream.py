@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from pm3_stream import CARD_LOST_PATTERNS, PM3StreamRunner
+
+# Stand-in for pm3 -c: "lines" prints and exits, "autopwn" finds a key and keeps
+# running, "hang" prints one line and stalls; SIGINT ends both long commands
+FAKE_CLIENT = """#!/usr/bin/env python3
+import signal
+import sys
+import time
+signal.signal(signal.SIGINT, lambda *_: (print("[=] interrupted", flush=True), sys.exit(130)))
+command = sys.argv[sys.argv.index("-c") + 1]
+if command == "lines":
+    for index in range(3):
+        print(f"\\x1b[32m[+]\\x1b[0m line {index}", flush=True)
+elif command == "autopwn":
+    print("[=] running strategy 1", flush=True)
+    print("[+] found valid key [ FFFFFFFFFFFF ]", flush=True)
+    time.sleep(30)
+elif command == "hang":
+    print("[=] waiting for card", flush=True)
+    time.sleep(30)
+elif command == "nocard":
+    print("[-] Can't select card", flush=True)
+    time.sleep(30)
+"""
+
+
+@pytest.fixture
+def runner(tmp_path):
+    client = tmp_path / "pm3"
+    client.write_text(FAKE_CLIENT)
+    client.chmod(0o755)
+    return PM3StreamRunner(pm3_binary=str(client), grace_period=2)
+
+
+def test_stream_runs_to_completion(runner):
+    seen = []
+    result = runner.run_sync("lines", timeout=10, on_line=seen.append)
+    assert seen == ["[+] line 0", "[+] line 1", "[+] line 2"]
+    assert result.output == "[+] line 0\n[+] line 1\n[+] line 2"
+    assert result.matched is None
+    assert not result.timed_out
+    assert result.returncode == 0
+
+
+def test_stop_pattern_ends_the_command_early(runner):
+    started = time.monotonic()
+    result = runner.run_sync("autopwn", timeout=20, stop_patterns={"key_found": r"found valid key"})
+    assert time.monotonic() - started < 10
+    assert result.matched == "key_found"
+    assert not result.timed_out
+    # Output flushed by the client while it was interrupted is kept
+    assert result.lines[-1] == "[=] interrupted"
+
+
+def test_card_lost_pattern_matches(runner):
+    result = runner.run_sync("nocard", timeout=20, stop_patterns=CARD_LOST_PATTERNS)
+    assert result.matched == "card_not_found"
+
+
+def test_timeout_keeps_partial_output(runner):
+    result = runner.run_sync("hang", timeout=1)
+    assert result.timed_out
+    assert result.matched is None
+    assert result.lines[0] == "[=] waiting for card"
+    assert result.returncode == 130
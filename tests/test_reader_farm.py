@@ -0,0 +1,129 @@
+import json
+import multiprocessing
+from contextlib import contextmanager
+
+import pytest
+
+import reader_farm
+from pm3_cache import CommandCache
+
+CARD_A = "[+]  UID: 04 EC A1 6A 7B 13 90\n[+] ATQA: 00 44\n[+]  SAK: 00 [2]"
+CARD_B = "[+]  UID: 01 02 03 04\n[+] ATQA: 00 04\n[+]  SAK: 08 [2]"
+EMPTY = "[!] No known/supported 13.56 MHz tags found"
+UID_A = "04ECA16A7B1390"
+UID_B = "01020304"
+
+
+class ReaderHandle:
+    """Client session and lease of the fake analyzer, counts hand-backs"""
+
+    def __init__(self):
+        self.released = 0
+
+    def close(self):
+        pass
+
+    def release(self):
+        self.released += 1
+
+
+class FakeAnalyzer:
+    """Reader worker's analyzer: presence reads from a script, analysis of the cached UID"""
+
+    reads = [CARD_A]
+
+    def __init__(self, device=None, timeout=60, output_dir=None):
+        self.device = device
+        self.timeout = timeout
+        self.output_dir = output_dir
+        self.cache = CommandCache()
+        self.session = self.lease = ReaderHandle()
+        self.reads = list(self.reads)
+        self.analysed = []
+        self.closed = False
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # Visible to the parent process when the farm runs in workers
+        with open(output_dir.parent / "analyzers.log", "a") as f:
+            f.write(f"{device}\n")
+
+    def log(self, message, level="INFO"):
+        pass
+
+    def check_pm3_connection(self):
+        return True
+
+    @contextmanager
+    def reader_session(self):
+        yield
+
+    def poll_presence(self, command, timeout=5):
+        return self.reads.pop(0) if len(self.reads) > 1 else self.reads[0]
+
+    def run_analysis(self):
+        self.analysed.append((self.cache.uid, self.output_dir.name))
+        return {"uid": self.cache.uid, "type": "mifare_ultralight"}, {"type": None}, {}, {"attack_success": []}
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setattr(reader_farm, "PM3AIAnalyzer", FakeAnalyzer)
+    monkeypatch.setattr(reader_farm, "_worker_reader", "/dev/ttyACM0")
+    monkeypatch.setattr(reader_farm, "_worker_analyzer", None)
+    monkeypatch.setattr(reader_farm, "_worker_last_uid", None)
+
+
+def test_uid_comes_from_the_classifier(worker, tmp_path):
+    analyzer = FakeAnalyzer(output_dir=tmp_path / "card")
+    analyzer.reads = [EMPTY, CARD_A]
+    assert reader_farm._read_uid(analyzer) is None
+    assert reader_farm._read_uid(analyzer) == UID_A
+
+
+def test_one_analyzer_serves_every_card_of_a_worker(worker, tmp_path):
+    first = reader_farm.analyze_card(1, tmp_path, card_wait=5)
+    analyzer = reader_farm._worker_analyzer
+    # Card A is still on the reader until card B replaces it
+    analyzer.reads = [CARD_A, CARD_B]
+    second = reader_farm.analyze_card(2, tmp_path, card_wait=5)
+
+    assert reader_farm._worker_analyzer is analyzer
+    assert (first["status"], first["uid"]) == ("done", UID_A)
+    assert (second["status"], second["uid"]) == ("done", UID_B)
+    assert analyzer.analysed == [(UID_A, "card_001"), (UID_B, "card_002")]
+    # The reader is handed back after each card, the stores stay open
+    assert analyzer.lease.released == 2
+    assert not analyzer.closed
+    assert (tmp_path / "analyzers.log").read_text().splitlines() == ["/dev/ttyACM0"]
+
+
+def test_card_not_placed_in_time(worker, tmp_path):
+    record = reader_farm.analyze_card(1, tmp_path, card_wait=0)
+    assert record["status"] == "no_card"
+    assert reader_farm._worker_analyzer.analysed == []
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="workers inherit the fake analyzer through fork")
+def test_farm_requeues_a_card_that_was_not_placed(worker, monkeypatch, tmp_path):
+    # One reader: card 1 is not placed in time, card 2 is, then card 1 comes back
+    placed = [None, UID_B, UID_A]
+    monkeypatch.setattr(reader_farm, "_wait_for_card", lambda analyzer, card_wait: placed.pop(0))
+    records = reader_farm.run_farm(2, tmp_path / "batch", readers=["/dev/ttyACM0"], requeues=1)
+
+    assert [(record["card"], record["status"], record["uid"], record["attempts"]) for record in records] == [
+        (1, "done", UID_A, 2),
+        (2, "done", UID_B, 1),
+    ]
+    assert (tmp_path / "batch" / "analyzers.log").read_text().splitlines() == ["/dev/ttyACM0"]
+    summary = json.loads((tmp_path / "batch" / "batch_summary.json").read_text())
+    assert [card["card"] for card in summary["cards"]] == [1, 2]
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="workers inherit the fake analyzer through fork")
+def test_farm_gives_up_after_the_requeue_limit(worker, tmp_path):
+    records = reader_farm.run_farm(1, tmp_path / "batch", readers=["/dev/ttyACM0"], card_wait=0, requeues=2)
+    assert [(record["status"], record["attempts"]) for record in records] == [("no_card", 3)]
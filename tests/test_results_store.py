@@ -0,0 +1,80 @@
+import pytest
+
+from results_store import ResultsStore, card_fingerprint, status_rank
+
+UID = "01020304"
+CARD = {"type": "mifare_classic", "subtype": "1k", "atqa": "0004", "sak": "08"}
+FINGERPRINT = card_fingerprint(CARD)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(tmp_path / "results.db")
+    yield store
+    store.close()
+
+
+def test_fingerprint_of_partial_card_info():
+    assert FINGERPRINT == "mifare_classic:1k:0004:08"
+    assert card_fingerprint({"type": "desfire"}) == "desfire:-:-:-"
+
+
+def test_save_and_lookup_round_trip(store):
+    store.save(UID, FINGERPRINT, card_type="mifare_classic", subtype="1k", atqa="0004", sak="08",
+               magic_type="gen1a", keys={0: {"A": "FFFFFFFFFFFF"}}, found_keys=["FFFFFFFFFFFF"],
+               dump_path="/tmp/dump.bin", status="dumped")
+    card = store.lookup(UID, FINGERPRINT)
+    assert card["card_type"] == "mifare_classic"
+    assert card["magic_type"] == "gen1a"
+    assert card["keys"] == {"0": {"A": "FFFFFFFFFFFF"}}
+    assert card["found_keys"] == ["FFFFFFFFFFFF"]
+    assert card["dump_path"] == "/tmp/dump.bin"
+    assert card["status"] == "dumped"
+    assert card["analyses"] == 1
+    assert store.lookup(UID) == card
+    assert store.known_uids() == {UID}
+
+
+def test_unknown_card_or_fingerprint(store):
+    store.save(UID, FINGERPRINT, status="analysed")
+    assert store.lookup("AABBCCDD") is None
+    assert store.lookup(UID, "mifare_ultralight:ev1:0044:00") is None
+    assert store.lookup(None) is None
+
+
+def test_keys_are_merged_across_runs(store):
+    store.save(UID, FINGERPRINT, keys={0: {"A": "FFFFFFFFFFFF"}}, found_keys=["FFFFFFFFFFFF"], status="analysed")
+    store.save(UID, FINGERPRINT, keys={0: {"B": "A0A1A2A3A4A5"}, 1: {"A": "FFFFFFFFFFFF"}},
+               found_keys=["A0A1A2A3A4A5", "FFFFFFFFFFFF"], status="cracked")
+    card = store.lookup(UID, FINGERPRINT)
+    assert card["keys"] == {"0": {"A": "FFFFFFFFFFFF", "B": "A0A1A2A3A4A5"}, "1": {"A": "FFFFFFFFFFFF"}}
+    assert card["found_keys"] == ["FFFFFFFFFFFF", "A0A1A2A3A4A5"]
+    assert card["analyses"] == 2
+
+
+def test_a_weaker_run_never_downgrades_the_card(store):
+    assert status_rank("dumped") > status_rank("cracked") > status_rank("analysed") > status_rank(None)
+    store.save(UID, FINGERPRINT, card_type="mifare_classic", dump_path="/tmp/full.bin", status="dumped")
+    store.save(UID, FINGERPRINT, card_type=None, password=None, dump_path="/tmp/partial.bin", status="analysed")
+    card = store.lookup(UID, FINGERPRINT)
+    assert card["status"] == "dumped"
+    assert card["dump_path"] == "/tmp/full.bin"
+    # Fields a later run did not see are kept
+    assert card["card_type"] == "mifare_classic"
+
+
+def test_same_uid_with_another_fingerprint_is_a_separate_card(store):
+    store.save(UID, FINGERPRINT, status="dumped")
+    other = card_fingerprint({"type": "mifare_ultralight", "subtype": "ev1", "atqa": "0044", "sak": "00"})
+    store.save(UID, other, password="5FD37ECA", status="cracked")
+    assert store.lookup(UID, FINGERPRINT)["password"] is None
+    assert store.lookup(UID, other)["password"] == "5FD37ECA"
+    assert len(store.cards()) == 2
+
+
+def test_magic_counts_by_atqa_and_sak(store):
+    store.save("01020304", FINGERPRINT, atqa="0004", sak="08", magic_type="gen1a")
+    store.save("05060708", FINGERPRINT, atqa="0004", sak="08", magic_type="gen1a")
+    store.save("090A0B0C", FINGERPRINT, atqa="0004", sak="08", magic_type="gen2")
+    store.save("0D0E0F10", FINGERPRINT, atqa="0004", sak="08")
+    assert store.magic_counts() == {"0004:08": {"gen1a": 2, "gen2": 1}}
@@ -0,0 +1,140 @@
+import pytest
+from conftest import classic_image
+
+import pm3_dump
+from dump_store import DumpStore, digest_of
+from results_store import ResultsStore, card_fingerprint
+from similarity_index import (
+    SimilarityIndex,
+    dump_keys,
+    dump_password,
+    dump_tokens,
+    family_keys,
+    family_passwords,
+    fingerprint_tokens,
+)
+
+CARD_INFO = {"type": "mifare_classic", "subtype": "1k", "atqa": "0004", "sak": "08"}
+HOTEL_KEY = "4B0B20107CCB"
+TRANSIT_KEY = "A0B0C0D0E0F0"
+
+
+def system_card(uid, key, records):
+    """Classic card of one system: its key on every sector, its records, blank elsewhere"""
+    image = classic_image(key_a=key, key_b=key)
+    for block in range(1, 64):
+        if not pm3_dump.is_trailer(block):
+            image[block * 16:(block + 1) * 16] = bytes(16)
+    image[0:4] = bytes.fromhex(uid)
+    image[4] = image[0] ^ image[1] ^ image[2] ^ image[3]
+    for block, data in records.items():
+        image[block * 16:(block + 1) * 16] = data
+    return pm3_dump.Dump(image, pm3_dump.MFC_BLOCK, "mifare_classic", "1k")
+
+
+def hotel_card(uid, room):
+    return system_card(uid, HOTEL_KEY, {
+        4: bytes.fromhex("48544C0100000000000000000000AA55"),
+        5: bytes([room]) * 16,
+        8: bytes.fromhex("0102030405060708090A0B0C0D0E0F10"),
+    })
+
+
+def transit_card(uid):
+    return system_card(uid, TRANSIT_KEY, {
+        4: bytes.fromhex("54524E5300000000000000000000C3C3"),
+        6: bytes.fromhex("00000000000000000000000000001234"),
+    })
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SimilarityIndex(tmp_path / "similarity.db")
+    for card in (hotel_card("11111111", 1), hotel_card("22222222", 2), transit_card("33333333")):
+        index.add_dump(digest_of(card), card, CARD_INFO)
+        card.close()
+    yield index
+    index.close()
+
+
+def query_tokens(dump, readable=None):
+    return dump_tokens(dump, readable) | fingerprint_tokens(CARD_INFO)
+
+
+def test_tokens_skip_uid_empty_blocks_and_default_keys(classic_dump):
+    tokens = dump_tokens(classic_dump)
+    assert not any(token.startswith("b0:") for token in tokens)
+    assert not any(token.startswith("k") for token in tokens)
+    assert "b1:" + "01" * 16 in tokens
+    assert dump_keys(classic_dump)[15] == {"A": "FFFFFFFFFFFF", "B": "FFFFFFFFFFFF"}
+    assert fingerprint_tokens({"type": "mifare_ultralight", "version": "0004030101000B03"}) == \
+        {"fp:mifare_ultralight:-:-:-", "v:0004030101000B03"}
+
+
+def test_partial_read_finds_the_cards_of_its_system(index):
+    with hotel_card("44444444", 7) as new_card:
+        # Only sectors 1 and 2 could be read
+        matches = index.query(query_tokens(new_card, set(range(4, 12))), card_type="mifare_classic")
+    assert {match.uid for match in matches} == {"11111111", "22222222"}
+    assert all(match.containment >= 0.5 for match in matches)
+    assert family_keys(matches) == [HOTEL_KEY]
+
+
+def test_known_card_is_excluded_and_other_types_filtered(index):
+    with hotel_card("11111111", 1) as card:
+        tokens = query_tokens(card)
+    assert [match.uid for match in index.query(tokens, exclude_uid="11111111")] == ["22222222"]
+    assert index.query(tokens, card_type="mifare_ultralight") == []
+
+
+def test_too_few_features_name_no_system(index):
+    with hotel_card("44444444", 7) as card:
+        # Manufacturer block only: a model feature, nothing to search on
+        assert index.query(query_tokens(card, {0}), card_type="mifare_classic") == []
+
+
+def test_unrelated_read_has_no_match(index):
+    with system_card("55555555", "010203040506", {4: b"\x77" * 16, 5: b"\x78" * 16}) as card:
+        assert index.query(query_tokens(card), card_type="mifare_classic") == []
+
+
+def test_ultralight_password_comes_from_the_pwd_page(mfu_json):
+    with pm3_dump.load(mfu_json) as dump:
+        image = bytearray(dump.view)
+        meta = dict(dump.meta)
+    image[-8:-4] = bytes.fromhex("5FD37ECA")
+    with pm3_dump.Dump(image, pm3_dump.MFU_BLOCK, "mifare_ultralight", meta=meta) as dump:
+        assert dump_password(dump) == "5FD37ECA"
+        assert dump_keys(dump) == {}
+
+
+def test_family_passwords_are_distinct_in_match_order():
+    class Found:
+        def __init__(self, password):
+            self.password = password
+
+    assert family_passwords([Found("5FD37ECA"), Found(None), Found("5FD37ECA"), Found("CD91AFCC")]) == \
+        ["5FD37ECA", "CD91AFCC"]
+
+
+def test_rebuild_indexes_the_dump_store_with_stored_credentials(tmp_path):
+    path = tmp_path / "shared.db"
+    dumps = DumpStore(path)
+    results = ResultsStore(path)
+    index = SimilarityIndex(path)
+    try:
+        for uid, room in (("11111111", 1), ("22222222", 2)):
+            with hotel_card(uid, room) as card:
+                dumps.put(card)
+        results.save("11111111", card_fingerprint(CARD_INFO), card_type="mifare_classic", subtype="1k",
+                      atqa="0004", sak="08", keys={0: {"B": "0A0B0C0D0E0F"}}, status="dumped")
+        assert index.rebuild(dumps, results) == 2
+        assert len(index) == 2
+        with hotel_card("44444444", 7) as new_card:
+            matches = index.query(query_tokens(new_card), card_type="mifare_classic")
+        stored = next(match for match in matches if match.uid == "11111111")
+        assert stored.keys[0] == {"A": HOTEL_KEY, "B": "0A0B0C0D0E0F"}
+    finally:
+        index.close()
+        results.close()
+        dumps.close()